@@ -0,0 +1,141 @@
+"""
+Motor de inserción masiva para la tabla ExcelData.
+Escribe los datos en bloques de tamaño configurable, con un commit por bloque,
+usando executemany de SQLAlchemy Core o LOAD DATA LOCAL INFILE en MySQL.
+"""
+
+import csv
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from app import dictionaries, metrics, models, search, totals
+
+# Filas por bloque (cada bloque se confirma en su propia transacción)
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 5000))
+# Método de inserción: "executemany" o "load_data" (solo MySQL, requiere MYSQL_LOCAL_INFILE=true)
+BULK_INSERT_METHOD = os.getenv("BULK_INSERT_METHOD", "executemany").lower()
+
+# Columnas de excel_data en el orden en que se escriben (producto y hoja como códigos, ver app.dictionaries)
+INSERT_COLUMNS = ["nombre", "direccion", "telefono", "producto_id", "cantidad", "hoja_id", "archivo_id", "fingerprint"]
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------ Métodos de escritura por bloque ------------------
+
+def columns_to_rows(columns: dict) -> list[dict]:
+    """Convierte arreglos por columna en una lista de filas (diccionarios)."""
+    keys = list(columns.keys())
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def _insert_executemany(db: Session, chunk: dict):
+    """Inserta un bloque con un único INSERT ejecutado en modo executemany."""
+    columns = {col: chunk[col] for col in INSERT_COLUMNS if col in chunk}
+    db.execute(insert(models.ExcelData.__table__), columns_to_rows(columns))
+
+
+def _insert_load_data(db: Session, chunk: dict):
+    """Escribe el bloque en un CSV temporal y lo carga con LOAD DATA LOCAL INFILE."""
+    columns = [col for col in INSERT_COLUMNS if col in chunk]
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".csv", newline="", encoding="utf-8", delete=False
+    ) as tmp:
+        writer = csv.writer(tmp, lineterminator="\n")
+        writer.writerows(zip(*(chunk[col] for col in columns)))
+        csv_path = tmp.name
+
+    try:
+        db.execute(
+            text(
+                "LOAD DATA LOCAL INFILE :path INTO TABLE excel_data "
+                "CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+                "LINES TERMINATED BY '\\n' "
+                f"({', '.join(columns)})"
+            ),
+            {"path": csv_path},
+        )
+    finally:
+        os.remove(csv_path)
+
+
+def _iter_chunks(columns: dict, batch_size: int):
+    """Divide los arreglos por columna en bloques de como máximo batch_size filas."""
+    total = len(columns["archivo_id"])
+    for start in range(0, total, batch_size):
+        yield {col: values[start:start + batch_size] for col, values in columns.items()}
+
+
+# ------------------ API pública ------------------
+
+def insert_columns(db: Session, columns: dict, batch_size: int = None, method: str = None, on_chunk=None):
+    """
+    Inserta arreglos por columna en excel_data, confirmando cada bloque.
+
+    Parámetros:
+        db (Session): sesión de base de datos
+        columns (dict): columna -> lista de valores (ver ingest.dataframe_to_columns)
+        batch_size (int, opcional): filas por bloque, por defecto BULK_BATCH_SIZE
+        method (str, opcional): "executemany" o "load_data", por defecto BULK_INSERT_METHOD
+        on_chunk (callable, opcional): se llama con el número de filas de cada bloque confirmado
+
+    Retorna:
+        dict con filas insertadas, bloques, segundos transcurridos y filas por segundo
+    """
+    batch_size = batch_size or BULK_BATCH_SIZE
+    method = (method or BULK_INSERT_METHOD).lower()
+
+    # LOAD DATA solo existe en MySQL; en otros motores se usa executemany
+    if method == "load_data" and db.get_bind().dialect.name != "mysql":
+        method = "executemany"
+
+    inserted = 0
+    chunks = 0
+    start = time.perf_counter()
+
+    for chunk in _iter_chunks(columns, batch_size):
+        size = len(chunk["archivo_id"])
+        # Códigos de producto y hoja, antes de escribir en la transacción del bloque
+        with metrics.stage("encode"):
+            dictionaries.encode_columns(db, chunk)
+        with metrics.stage("db_write"):
+            if method == "load_data":
+                try:
+                    _insert_load_data(db, chunk)
+                except DBAPIError as e:
+                    # El servidor puede tener local_infile deshabilitado
+                    db.rollback()
+                    logger.warning(f"LOAD DATA no disponible, se usa executemany: {e.orig}")
+                    method = "executemany"
+                    _insert_executemany(db, chunk)
+            else:
+                _insert_executemany(db, chunk)
+
+        # Actualizar los totales por producto en la misma transacción del bloque
+        with metrics.stage("totals"):
+            totals.apply_deltas(db, totals.deltas_from_columns(chunk))
+        # Indexar el bloque para la búsqueda de texto (solo SQLite, ver app.search)
+        with metrics.stage("search_index"):
+            search.index_new_rows(db)
+        with metrics.stage("commit"):
+            db.commit()
+        metrics.INGEST_ROWS.inc(size)
+        inserted += size
+        chunks += 1
+        if on_chunk:
+            on_chunk(size)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "inserted": inserted,
+        "chunks": chunks,
+        "method": method,
+        "elapsed": round(elapsed, 4),
+        "rows_per_sec": round(inserted / elapsed, 1) if elapsed > 0 else None,
+    }
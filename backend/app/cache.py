@@ -0,0 +1,63 @@
+"""
+Caché LRU en memoria con límite por tamaño.
+Se usa para guardar respuestas ya calculadas (por ejemplo, las previsualizaciones)
+y descarta las entradas usadas hace más tiempo cuando se supera el límite de bytes.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+
+def _estimate_size(value) -> int:
+    """Tamaño aproximado de un valor, medido como su representación JSON."""
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+class LRUCache:
+    """
+    Caché LRU segura entre hilos.
+
+    Parámetros:
+        max_bytes (int): tamaño total máximo de las entradas guardadas
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # clave -> (valor, tamaño)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Devuelve el valor guardado para la clave (o None) y lo marca como recién usado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        """Guarda un valor y descarta las entradas más antiguas si se supera el límite."""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def discard(self, predicate):
+        """Elimina todas las entradas cuya clave cumple la condición."""
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def __len__(self):
+        return len(self._entries)
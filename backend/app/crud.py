@@ -1,142 +1,568 @@
-"""
-Operaciones CRUD sobre la base de datos.
-Encapsula toda la lógica de acceso a datos usando SQLAlchemy.
-"""
-
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app import models, schemas
-
-
-# ------------------ ExcelFile CRUD ------------------
-
-# Crea un nuevo registro en la tabla ExcelFile con los metadatos del archivo subido
-def create_excel_file(db: Session, file: schemas.ExcelFileCreate):
-    """
-    Inserta un registro de metadatos de archivo Excel en la base de datos.
-    """
-    db_file = models.ExcelFile(**file.dict())
-    db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
-    return db_file
-
-
-# Obtiene todos los archivos Excel registrados en la base de datos, ordenados por fecha de carga
-def get_all_excel_files(db: Session):
-    """
-    Devuelve todos los registros de archivos Excel cargados.
-    """
-    return db.query(models.ExcelFile).order_by(models.ExcelFile.upload_date.desc()).all()
-
-
-# Busca un archivo Excel específico por su ID
-def get_excel_file(db: Session, file_id: int):
-    """
-    Devuelve un archivo Excel por ID.
-    """
-    return db.query(models.ExcelFile).filter(models.ExcelFile.id == file_id).first()
-
-
-# Elimina un archivo Excel y todos sus datos asociados en la tabla ExcelData
-def delete_excel_file(db: Session, file_id: int):
-    """
-    Elimina un archivo Excel y sus datos asociados.
-    """
-    file = db.query(models.ExcelFile).filter(models.ExcelFile.id == file_id).first()
-    if file:
-        db.query(models.ExcelData).filter(models.ExcelData.archivo_id == file_id).delete()
-        db.delete(file)
-        db.commit()
-        return True
-    return False
-
-
-# ------------------ ExcelData CRUD ------------------
-
-# Inserta múltiples registros de datos provenientes del archivo Excel
-def insert_excel_data(db: Session, data_list: list[schemas.ExcelDataCreate]):
-    """
-    Inserta múltiples filas de datos desde un Excel.
-    """
-    objects = [models.ExcelData(**data.dict()) for data in data_list]
-    db.bulk_save_objects(objects)
-    db.commit()
-    return len(objects)
-
-
-# Obtiene todos los registros cargados en la tabla ExcelData
-def get_all_excel_data(db: Session):
-    """
-    Obtiene todos los datos cargados desde los Excels.
-    """
-    return db.query(models.ExcelData).all()
-
-
-# ------------------  NUEVA FUNCIÓN PARA EL GRÁFICO ------------------
-
-# Obtiene datos agrupados por producto sumando la cantidad total de cada uno (para gráficos)
-def get_chart_data(db: Session):
-    """
-    Devuelve datos agregados por producto para el gráfico.
-    Agrupa por 'producto' y suma las cantidades.
-    """
-    results = (
-        db.query(
-            models.ExcelData.producto.label("producto"),
-            func.sum(models.ExcelData.cantidad).label("total")
-        )
-        .group_by(models.ExcelData.producto)
-        .all()
-    )
-
-    # Convierte los resultados en una lista de diccionarios legibles
-    return [{"producto": r.producto, "total": r.total} for r in results]
-
-# ------------------ CRUD manual para ExcelData ------------------
-
-def get_excel_data_by_id(db: Session, data_id: int):
-    """
-    Obtiene un registro específico de ExcelData por su ID.
-    """
-    return db.query(models.ExcelData).filter(models.ExcelData.id == data_id).first()
-
-
-def create_excel_data(db: Session, data: schemas.ExcelDataCreate):
-    """
-    Crea un nuevo registro en ExcelData.
-    """
-    db_data = models.ExcelData(**data.dict())
-    db.add(db_data)
-    db.commit()
-    db.refresh(db_data)
-    return db_data
-
-
-def update_excel_data(db: Session, data_id: int, data: schemas.ExcelDataCreate):
-    """
-    Actualiza un registro existente en ExcelData.
-    """
-    db_data = db.query(models.ExcelData).filter(models.ExcelData.id == data_id).first()
-    if not db_data:
-        return None
-
-    for key, value in data.dict().items():
-        setattr(db_data, key, value)
-
-    db.commit()
-    db.refresh(db_data)
-    return db_data
-
-
-def delete_excel_data(db: Session, data_id: int):
-    """
-    Elimina un registro de ExcelData por su ID.
-    """
-    db_data = db.query(models.ExcelData).filter(models.ExcelData.id == data_id).first()
-    if not db_data:
-        return False
-
-    db.delete(db_data)
-    db.commit()
-    return True
+"""
+Operaciones CRUD sobre la base de datos.
+Encapsula toda la lógica de acceso a datos usando SQLAlchemy.
+"""
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import bulk, dictionaries, fingerprints, models, schemas, search, totals
+
+# Columnas de ExcelFile que se devuelven en los listados
+EXCEL_FILE_FIELDS = list(schemas.ExcelFileResponse.model_fields)
+
+# Columnas de ExcelData que se pueden pedir en los listados
+EXCEL_DATA_FIELDS = ["id", "nombre", "direccion", "telefono", "producto", "cantidad", "hoja", "archivo_id"]
+
+
+# ------------------ ExcelFile CRUD ------------------
+
+# Crea un nuevo registro en la tabla ExcelFile con los metadatos del archivo subido
+def create_excel_file(db: Session, file: schemas.ExcelFileCreate):
+    """
+    Inserta un registro de metadatos de archivo Excel en la base de datos.
+    """
+    db_file = models.ExcelFile(**file.dict())
+    db.add(db_file)
+    db.commit()
+    db.refresh(db_file)
+    return db_file
+
+
+# Inserta los metadatos de varios archivos (subida en lote) en una sola transacción
+def create_excel_files(db: Session, files: list):
+    """
+    Inserta varios registros de archivos Excel y confirma una sola vez.
+    Si alguno viola una restricción (por ejemplo, un hash repetido) no se inserta ninguno.
+    """
+    db_files = [models.ExcelFile(**file.dict()) for file in files]
+    db.add_all(db_files)
+    db.commit()
+    for db_file in db_files:
+        db.refresh(db_file)
+    return db_files
+
+
+# Obtiene todos los archivos Excel registrados en la base de datos, ordenados por fecha de carga
+def get_all_excel_files(db: Session):
+    """
+    Devuelve todos los registros de archivos Excel cargados como diccionarios simples,
+    con las mismas columnas (y en el mismo orden) que schemas.ExcelFileResponse.
+    """
+    return [dict(row) for row in db.execute(excel_files_query()).mappings()]
+
+
+def excel_files_query():
+    """SELECT del listado de archivos, sin los marcados como eliminados."""
+    table = models.ExcelFile.__table__
+    return (
+        select(*[table.c[f] for f in EXCEL_FILE_FIELDS])
+        .where(table.c.deleted_at.is_(None))
+        .order_by(table.c.upload_date.desc())
+    )
+
+
+def deleted_files_query():
+    """IDs de los archivos marcados como eliminados cuyas filas aún no se purgan."""
+    table = models.ExcelFile.__table__
+    return select(table.c.id).where(table.c.deleted_at.is_not(None))
+
+
+# Busca un archivo Excel por el hash de su contenido (para evitar duplicados)
+def get_excel_file_by_hash(db: Session, sha256: str):
+    """
+    Devuelve el archivo Excel con el hash SHA-256 indicado, si ya fue subido.
+    """
+    return db.query(models.ExcelFile).filter(models.ExcelFile.sha256 == sha256).first()
+
+
+# Busca en una sola consulta los archivos ya subidos con alguno de los hashes indicados
+def get_excel_files_by_hashes(db: Session, hashes: list) -> dict:
+    """
+    Devuelve un diccionario hash SHA-256 -> archivo Excel con los hashes que ya existen.
+    """
+    if not hashes:
+        return {}
+    rows = db.query(models.ExcelFile).filter(models.ExcelFile.sha256.in_(set(hashes))).all()
+    return {row.sha256: row for row in rows}
+
+
+# Registra cuántas filas se cargaron desde un archivo
+def mark_excel_file_inserted(db: Session, file_id: int, rows_inserted: int):
+    """
+    Marca un archivo Excel como cargado guardando el total de filas insertadas.
+    """
+    db.query(models.ExcelFile).filter(models.ExcelFile.id == file_id).update(
+        {models.ExcelFile.rows_inserted: rows_inserted}
+    )
+    db.commit()
+
+
+# Reemplaza el libro de un archivo ya registrado por una nueva versión
+def replace_excel_file(db: Session, file_id: int, file: schemas.ExcelFileCreate):
+    """
+    Actualiza los metadatos de un archivo con los de su nueva versión y lo marca como
+    pendiente de carga. Sus registros en ExcelData se conservan hasta la siguiente carga.
+    """
+    db.query(models.ExcelFile).filter(models.ExcelFile.id == file_id).update(
+        {**file.dict(), "rows_inserted": None}
+    )
+    db.commit()
+    return get_excel_file(db, file_id)
+
+
+# Busca un archivo Excel específico por su ID
+def get_excel_file(db: Session, file_id: int):
+    """
+    Devuelve un archivo Excel por ID (None si no existe o fue eliminado).
+    """
+    return (
+        db.query(models.ExcelFile)
+        .filter(models.ExcelFile.id == file_id, models.ExcelFile.deleted_at.is_(None))
+        .first()
+    )
+
+
+# Marca un archivo como eliminado; sus registros se purgan después en segundo plano (ver app.purge)
+def mark_excel_file_deleted(db: Session, file_id: int, filepath: str):
+    """
+    Oculta un archivo de los listados y descuenta sus registros de product_totals en una
+    sola transacción corta. Libera su hash, para que el mismo contenido se pueda volver a
+    subir, y guarda la ruta a la que se movió el archivo físico.
+    Retorna la cantidad de registros por purgar, o None si el archivo no existe o ya estaba marcado.
+    """
+    marked = db.query(models.ExcelFile).filter(
+        models.ExcelFile.id == file_id, models.ExcelFile.deleted_at.is_(None)
+    ).update(
+        {models.ExcelFile.deleted_at: func.now(), models.ExcelFile.sha256: None, models.ExcelFile.filepath: filepath},
+        synchronize_session=False,
+    )
+    if not marked:
+        db.rollback()
+        return None
+
+    deltas = totals.deltas_for_file(db, file_id)
+    totals.apply_deltas(db, deltas)
+    db.commit()
+    return -sum(count for _, count in deltas.values())
+
+
+# Archivos marcados como eliminados que aún esperan su purga (por ejemplo, tras reiniciar el servidor)
+def get_deleted_excel_files(db: Session):
+    """
+    Devuelve los archivos marcados como eliminados, del más antiguo al más reciente.
+    """
+    return (
+        db.query(models.ExcelFile)
+        .filter(models.ExcelFile.deleted_at.is_not(None))
+        .order_by(models.ExcelFile.deleted_at)
+        .all()
+    )
+
+
+# Elimina el registro de un archivo ya purgado
+def delete_purged_excel_file(db: Session, file_id: int):
+    """
+    Elimina el registro de un archivo marcado como eliminado (sus filas ya se purgaron).
+    """
+    db.query(models.ExcelFile).filter(
+        models.ExcelFile.id == file_id, models.ExcelFile.deleted_at.is_not(None)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+# ------------------ ExcelData CRUD ------------------
+
+# Inserta múltiples registros de datos provenientes del archivo Excel
+def insert_excel_data(db: Session, columns: dict, batch_size: int = None, on_chunk=None):
+    """
+    Inserta múltiples filas de datos desde un Excel.
+    Recibe arreglos por columna y los escribe en bloques con un commit por bloque.
+    Retorna las estadísticas de la inserción (filas, bloques, filas por segundo).
+    """
+    return bulk.insert_columns(db, columns, batch_size=batch_size, on_chunk=on_chunk)
+
+
+# Elimina las filas de un archivo que ya no aparecen en su libro (recarga incremental)
+def delete_excel_data_by_fingerprints(db: Session, file_id: int, fingerprints, batch_size: int = 1000) -> int:
+    """
+    Elimina por bloques las filas de un archivo con las huellas indicadas, descontándolas
+    de product_totals en la misma transacción de cada bloque. Retorna las filas eliminadas.
+    """
+    table = models.ExcelData.__table__
+    fingerprints = list(fingerprints)
+    deleted = 0
+    for start in range(0, len(fingerprints), batch_size):
+        condition = (table.c.archivo_id == file_id) & table.c.fingerprint.in_(fingerprints[start:start + batch_size])
+        deltas = totals.deltas_for_rows(db, condition)
+        deleted += db.execute(delete(table).where(condition)).rowcount
+        totals.apply_deltas(db, deltas)
+        db.commit()
+    return deleted
+
+
+# Cuenta los registros de un archivo
+def count_excel_data(db: Session, file_id: int) -> int:
+    """
+    Devuelve la cantidad de filas de un archivo en ExcelData.
+    """
+    table = models.ExcelData.__table__
+    return db.execute(select(func.count()).where(table.c.archivo_id == file_id)).scalar()
+
+
+# Elimina un bloque de filas de un archivo marcado como eliminado
+def purge_excel_data_batch(db: Session, file_id: int, after_id: int, batch_size: int):
+    """
+    Elimina, en una transacción corta, hasta batch_size filas de un archivo: las siguientes
+    a after_id, acotadas por rango de llave primaria. No modifica product_totals porque
+    las filas ya se descontaron al marcar el archivo.
+    Retorna (ID donde continúa el siguiente bloque, o None si no quedan filas; filas eliminadas).
+    """
+    table = models.ExcelData.__table__
+    pending = (table.c.archivo_id == file_id) & (table.c.id > after_id)
+    upper = db.execute(
+        select(table.c.id).where(pending).order_by(table.c.id).offset(batch_size - 1).limit(1)
+    ).scalar()
+    condition = pending if upper is None else pending & (table.c.id <= upper)
+    deleted = db.execute(delete(table).where(condition)).rowcount
+    db.commit()
+    return upper, deleted
+
+
+def excel_data_query(fields: list = None, archivo_id: int = None, hoja: str = None, producto: str = None):
+    """
+    Arma el SELECT de ExcelData con las columnas y filtros indicados, ordenado por ID.
+    'producto' y 'hoja' se leen de sus diccionarios (ver app.dictionaries), con un JOIN
+    solo si se piden o se filtran. Las filas de los archivos marcados como eliminados no se incluyen.
+    """
+    table = models.ExcelData.__table__
+    fields = fields or EXCEL_DATA_FIELDS
+    filters = {"producto": producto, "hoja": hoja}
+
+    source, names = table, {}
+    for name, (dictionary, code_column) in dictionaries.ENCODED_COLUMNS.items():
+        if name in fields or filters[name] is not None:
+            source = source.join(dictionary.table, dictionary.table.c.id == table.c[code_column])
+            names[name] = dictionary.table.c.nombre
+
+    query = select(*[names[f].label(f) if f in names else table.c[f] for f in fields]).select_from(source)
+    query = query.where(table.c.archivo_id.not_in(deleted_files_query()))
+    if archivo_id is not None:
+        query = query.where(table.c.archivo_id == archivo_id)
+    for name, value in filters.items():
+        if value is not None:
+            query = query.where(names[name] == value)
+    return query.order_by(table.c.id)
+
+
+# Obtiene una página de registros de ExcelData usando el ID como cursor
+def get_excel_data_page(
+    db: Session,
+    limit: int,
+    after_id: int = None,
+    archivo_id: int = None,
+    hoja: str = None,
+    producto: str = None,
+    fields: list = None,
+):
+    """
+    Obtiene una página de datos cargados desde los Excels, ordenada por ID.
+    La paginación es por cursor (id > after_id), de modo que el costo no crece con
+    el número de página. Se leen filas simples con solo las columnas pedidas.
+    Retorna (registros, cursor de la página siguiente o None si no hay más).
+    """
+    fields = fields or EXCEL_DATA_FIELDS
+    if "id" not in fields:
+        fields = ["id"] + list(fields)
+
+    query = excel_data_query(fields, archivo_id, hoja, producto)
+    if after_id is not None:
+        query = query.where(models.ExcelData.__table__.c.id > after_id)
+
+    # Se pide una fila extra para saber si existe una página siguiente
+    rows = db.execute(query.limit(limit + 1)).mappings().all()
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return items, next_cursor
+
+
+# Recorre los registros de ExcelData en bloques, sin cargarlos todos en memoria
+def iter_excel_data(
+    db: Session,
+    chunk_size: int,
+    archivo_id: int = None,
+    hoja: str = None,
+    producto: str = None,
+    fields: list = None,
+):
+    """
+    Genera bloques de filas (tuplas en el orden de las columnas pedidas).
+    Usa un cursor del lado del servidor (stream_results), por lo que la memoria
+    usada depende del tamaño del bloque y no del total de filas.
+    """
+    query = excel_data_query(fields, archivo_id, hoja, producto)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+# ------------------  NUEVA FUNCIÓN PARA EL GRÁFICO ------------------
+
+# Obtiene datos agrupados por producto sumando la cantidad total de cada uno (para gráficos)
+def get_chart_data(db: Session):
+    """
+    Devuelve datos agregados por producto para el gráfico.
+    Lee la suma de cantidades por producto ya materializada en product_totals.
+    """
+    results = (
+        db.query(models.ProductTotal.producto, models.ProductTotal.total)
+        .order_by(models.ProductTotal.producto)
+        .all()
+    )
+
+    # Convierte los resultados en una lista de diccionarios legibles
+    return [{"producto": r.producto, "total": r.total} for r in results]
+
+# ------------------ CRUD manual para ExcelData ------------------
+
+def excel_data_by_id_query(data_id: int):
+    """SELECT de un registro de ExcelData por ID, si su archivo no fue eliminado."""
+    return select(models.ExcelData).where(
+        models.ExcelData.id == data_id,
+        models.ExcelData.archivo_id.not_in(deleted_files_query()),
+    )
+
+
+def get_excel_data_by_id(db: Session, data_id: int):
+    """
+    Obtiene un registro específico de ExcelData por su ID.
+    """
+    return db.execute(excel_data_by_id_query(data_id)).scalar()
+
+
+def create_excel_data(db: Session, data: schemas.ExcelDataCreate):
+    """
+    Crea un nuevo registro en ExcelData.
+    Retorna None si el archivo indicado no existe o fue eliminado.
+    """
+    if not get_excel_file(db, data.archivo_id):
+        return None
+
+    db_data = models.ExcelData(**dictionaries.encode_rows(db, [data.dict()])[0])
+    db.add(db_data)
+    db.flush()
+    totals.apply_deltas(db, {data.producto: (data.cantidad, 1)})
+    search.index_new_rows(db)
+    db.commit()
+    db.refresh(db_data)
+    return db_data
+
+
+def update_excel_data(db: Session, data_id: int, data: schemas.ExcelDataCreate):
+    """
+    Actualiza un registro existente en ExcelData.
+    """
+    db_data = get_excel_data_by_id(db, data_id)
+    if not db_data or not get_excel_file(db, data.archivo_id):
+        return None
+
+    values = data.dict()
+    if fingerprints.edit_changes_fingerprint({col: getattr(db_data, col) for col in values}, values):
+        db_data.fingerprint = None
+
+    deltas = {}
+    totals.add_delta(deltas, db_data.producto, db_data.cantidad, -1)
+    for key, value in dictionaries.encode_rows(db, [values])[0].items():
+        setattr(db_data, key, value)
+    totals.add_delta(deltas, data.producto, data.cantidad, 1)
+    totals.apply_deltas(db, deltas)
+
+    db.commit()
+    db.refresh(db_data)
+    return db_data
+
+
+def delete_excel_data(db: Session, data_id: int):
+    """
+    Elimina un registro de ExcelData por su ID.
+    """
+    db_data = get_excel_data_by_id(db, data_id)
+    if not db_data:
+        return False
+
+    totals.apply_deltas(db, {db_data.producto: (-db_data.cantidad, -1)})
+    db.delete(db_data)
+    db.commit()
+    return True
+
+
+# ------------------ Edición en lote de ExcelData ------------------
+
+# Filas por sentencia en la edición en lote (acota los parámetros de cada consulta)
+DATA_BATCH_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int = DATA_BATCH_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _live_file_ids(db: Session, file_ids: set) -> set:
+    """IDs de los archivos indicados que existen y no fueron eliminados."""
+    table = models.ExcelFile.__table__
+    found = set()
+    for chunk in _chunks(list(file_ids)):
+        found.update(
+            db.execute(select(table.c.id).where(table.c.id.in_(chunk), table.c.deleted_at.is_(None))).scalars()
+        )
+    return found
+
+
+def _lock_excel_data(db: Session, data_ids: set) -> dict:
+    """
+    Lee y bloquea (SELECT ... FOR UPDATE) los registros indicados cuyos archivos no fueron
+    eliminados, para que los totales se calculen sobre los valores que se van a reemplazar.
+    Se leen los códigos de producto y hoja, sin JOIN, y se traducen con la caché de los
+    diccionarios. Retorna ID -> diccionario con las columnas del registro (con los códigos
+    y también los nombres de producto y hoja).
+    """
+    table = models.ExcelData.__table__
+    columns = [c for c in table.c if c.name != "fingerprint"]
+    rows = []
+    for chunk in _chunks(list(data_ids)):
+        query = (
+            select(*columns)
+            .where(table.c.id.in_(chunk), table.c.archivo_id.not_in(deleted_files_query()))
+            .with_for_update()
+        )
+        rows.extend(dict(row) for row in db.execute(query).mappings())
+    return {raw["id"]: {**raw, **row} for raw, row in zip(rows, dictionaries.decode_rows(db, rows))}
+
+
+def _insert_returning_ids(db: Session, rows: list) -> list:
+    """Inserta los registros y retorna sus IDs en el mismo orden."""
+    table = models.ExcelData.__table__
+    if not rows:
+        return []
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        ids = []
+        for chunk in _chunks(rows):
+            ids.extend(db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), chunk).scalars())
+        return ids
+    # MySQL no devuelve los IDs de un INSERT de varias filas: se insertan de a uno en la misma transacción
+    return [db.execute(insert(table).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+def apply_excel_data_batch(db: Session, creates: list, updates: list, deletes: list) -> dict:
+    """
+    Aplica una edición en lote de ExcelData en una sola transacción, con unas pocas
+    sentencias por conjunto (un SELECT de los registros afectados, un UPDATE con CASE,
+    un DELETE y un INSERT por cada DATA_BATCH_CHUNK_SIZE filas) y una sola actualización
+    de product_totals.
+
+    Parámetros:
+        creates (list): columnas de cada registro nuevo
+        updates (list): "id" y las columnas a modificar de cada registro
+        deletes (list): IDs de los registros a eliminar
+
+    Los elementos que no se pueden aplicar (registro o archivo inexistente, o un ID que ya
+    apareció antes en el lote) no detienen a los demás. Retorna, en el orden recibido, el
+    estado de cada elemento: {"create": [...], "update": [...], "delete": [...]}.
+
+    Un registro modificado en el archivo o en las columnas de la huella pierde su huella (ver
+    fingerprints.edit_changes_fingerprint), de modo que moverlo a un archivo que ya tiene una
+    fila igual no choca con uq_excel_data_archivo_fingerprint. Si aun así la base rechaza la
+    escritura (por ejemplo, porque otra transacción purgó un archivo de destino), no se aplica
+    nada y los elementos válidos se reportan con el estado "conflict".
+    """
+    table = models.ExcelData.__table__
+    # Códigos de los productos y hojas nuevos, antes de escribir en la transacción
+    encoded_creates = dictionaries.encode_rows(db, creates)
+    encoded_updates = dictionaries.encode_rows(db, updates)
+    file_ids = {item["archivo_id"] for item in creates} | {item["archivo_id"] for item in updates if "archivo_id" in item}
+    live_files = _live_file_ids(db, file_ids)
+    current = _lock_excel_data(db, {item["id"] for item in updates} | set(deletes))
+
+    deltas = {}
+    claimed = set()  # IDs ya usados por otro elemento del lote
+
+    def _check(data_id: int):
+        if data_id in claimed:
+            return "duplicate"
+        claimed.add(data_id)
+        return None if data_id in current else "not_found"
+
+    update_status, changed = [], []
+    for item, encoded in zip(updates, encoded_updates):
+        status = _check(item["id"])
+        if status is None and "archivo_id" in item and item["archivo_id"] not in live_files:
+            status = "file_not_found"
+        update_status.append({"id": item["id"], "status": status or "updated"})
+        if status is None:
+            old = current[item["id"]]
+            new = {**old, **item}
+            totals.add_delta(deltas, old["producto"], old["cantidad"], -1)
+            totals.add_delta(deltas, new["producto"], new["cantidad"], 1)
+            row, fields = {**old, **encoded}, set(encoded) - {"id"}
+            if fingerprints.edit_changes_fingerprint(old, item):
+                row["fingerprint"] = None
+                fields.add("fingerprint")
+            changed.append((row, fields))
+
+    delete_status, removed = [], []
+    for data_id in deletes:
+        status = _check(data_id)
+        delete_status.append({"id": data_id, "status": status or "deleted"})
+        if status is None:
+            totals.add_delta(deltas, current[data_id]["producto"], current[data_id]["cantidad"], -1)
+            removed.append(data_id)
+
+    valid = []
+    for item, encoded in zip(creates, encoded_creates):
+        if item["archivo_id"] in live_files:
+            totals.add_delta(deltas, item["producto"], item["cantidad"], 1)
+            valid.append(encoded)
+
+    try:
+        # Un UPDATE por bloque: cada columna modificada toma su nuevo valor según el ID, y
+        # conserva el actual en las filas del bloque que no la modifican
+        for chunk in _chunks(changed):
+            columns = set().union(*(fields for _, fields in chunk))
+            if not columns:
+                continue
+            values = {
+                col: case(
+                    {row["id"]: row[col] for row, fields in chunk if col in fields},
+                    value=table.c.id,
+                    else_=table.c[col],
+                )
+                for col in columns
+            }
+            db.execute(update(table).where(table.c.id.in_([row["id"] for row, _ in chunk])).values(values))
+
+        for chunk in _chunks(removed):
+            db.execute(delete(table).where(table.c.id.in_(chunk)))
+
+        new_ids = _insert_returning_ids(db, valid)
+        totals.apply_deltas(db, deltas)
+        search.index_new_rows(db)
+        db.commit()
+        created = "created"
+    except IntegrityError:
+        db.rollback()
+        new_ids, created = [None] * len(valid), "conflict"
+        for status in update_status + delete_status:
+            if status["status"] in ("updated", "deleted"):
+                status["status"] = "conflict"
+
+    new_ids = iter(new_ids)
+    create_status = [
+        {"index": i, "id": next(new_ids), "status": created}
+        if item["archivo_id"] in live_files
+        else {"index": i, "id": None, "status": "file_not_found"}
+        for i, item in enumerate(creates)
+    ]
+    return {"create": create_status, "update": update_status, "delete": delete_status}
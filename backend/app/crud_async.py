@@ -0,0 +1,188 @@
+"""
+Versiones asíncronas de las operaciones CRUD de crud.py.
+Usan una AsyncSession para que los endpoints de consulta no ocupen un hilo del
+threadpool mientras esperan a la base de datos. Las consultas y la actualización
+de product_totals se comparten con la versión síncrona.
+"""
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, dictionaries, fingerprints, models, schemas, search, totals
+
+
+# ------------------ ExcelFile CRUD ------------------
+
+async def get_all_excel_files(db: AsyncSession):
+    """
+    Devuelve todos los archivos Excel cargados como diccionarios simples (ver crud.get_all_excel_files).
+    """
+    result = await db.execute(crud.excel_files_query())
+    return [dict(row) for row in result.mappings()]
+
+
+async def get_excel_file(db: AsyncSession, file_id: int):
+    """
+    Devuelve un archivo Excel por ID (None si no existe o fue eliminado).
+    """
+    file = await db.get(models.ExcelFile, file_id)
+    return file if file is not None and file.deleted_at is None else None
+
+
+# ------------------ ExcelData CRUD ------------------
+
+async def get_excel_data_page(
+    db: AsyncSession,
+    limit: int,
+    after_id: int = None,
+    archivo_id: int = None,
+    hoja: str = None,
+    producto: str = None,
+    fields: list = None,
+):
+    """
+    Obtiene una página de datos ordenada por ID (ver crud.get_excel_data_page).
+    Retorna (registros, cursor de la página siguiente o None si no hay más).
+    """
+    fields = fields or crud.EXCEL_DATA_FIELDS
+    if "id" not in fields:
+        fields = ["id"] + list(fields)
+
+    query = crud.excel_data_query(fields, archivo_id, hoja, producto)
+    if after_id is not None:
+        query = query.where(models.ExcelData.__table__.c.id > after_id)
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.mappings().all()
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return items, next_cursor
+
+
+async def search_excel_data(db: AsyncSession, words: list, limit: int, offset: int = 0, archivo_id: int = None):
+    """
+    Busca registros por nombre, dirección y producto, del más al menos relevante (ver app.search).
+    Retorna (registros con su 'score', offset de la página siguiente o None si no hay más).
+    """
+    dialect = db.bind.dialect.name
+    fts = dialect != "sqlite" or await db.run_sync(lambda session: search.has_fts_table(session.connection()))
+    productos = models.Producto.__table__
+    products = (await db.execute(select(productos.c.id, productos.c.nombre))).all()
+    table = models.ExcelData.__table__
+    condition = table.c.archivo_id.not_in(crud.deleted_files_query())
+    if archivo_id is not None:
+        condition = and_(condition, table.c.archivo_id == archivo_id)
+    matches = search.matches_query(dialect, words, products, fts=fts, condition=condition).subquery()
+
+    # Primero la página de IDs por relevancia; las columnas (y los nombres de producto
+    # y hoja) se leen solo para las filas de esa página
+    page = (
+        select(matches.c.id, matches.c.score)
+        .order_by(matches.c.score.desc(), matches.c.id)
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery()
+    )
+    query = (
+        crud.excel_data_query()
+        .join(page, page.c.id == table.c.id)
+        .add_columns(page.c.score)
+        .order_by(None)
+        .order_by(page.c.score.desc(), table.c.id)
+    )
+    result = await db.execute(query)
+    rows = result.mappings().all()
+    items = [dict(row) for row in rows[:limit]]
+    next_offset = offset + limit if len(rows) > limit else None
+    return items, next_offset
+
+
+async def get_chart_data(db: AsyncSession):
+    """
+    Devuelve la suma de cantidades por producto ya materializada en product_totals.
+    """
+    result = await db.execute(
+        select(models.ProductTotal.producto, models.ProductTotal.total).order_by(models.ProductTotal.producto)
+    )
+    return [{"producto": r.producto, "total": r.total} for r in result]
+
+
+# ------------------ CRUD manual para ExcelData ------------------
+
+async def _apply_deltas(db: AsyncSession, deltas: dict):
+    """Aplica las diferencias a product_totals con la sesión síncrona subyacente."""
+    await db.run_sync(lambda session: totals.apply_deltas(session, deltas))
+
+
+async def _encode(db: AsyncSession, values: dict) -> dict:
+    """Reemplaza producto y hoja por sus códigos (ver app.dictionaries)."""
+    return (await db.run_sync(lambda session: dictionaries.encode_rows(session, [values])))[0]
+
+
+async def get_excel_data_by_id(db: AsyncSession, data_id: int):
+    """
+    Obtiene un registro específico de ExcelData por su ID.
+    """
+    return await db.scalar(crud.excel_data_by_id_query(data_id))
+
+
+async def create_excel_data(db: AsyncSession, data: schemas.ExcelDataCreate):
+    """
+    Crea un nuevo registro en ExcelData.
+    Retorna None si el archivo indicado no existe o fue eliminado.
+    """
+    if not await get_excel_file(db, data.archivo_id):
+        return None
+
+    db_data = models.ExcelData(**await _encode(db, data.dict()))
+    db.add(db_data)
+    await db.flush()
+    await _apply_deltas(db, {data.producto: (data.cantidad, 1)})
+    await db.run_sync(search.index_new_rows)
+    await db.commit()
+    await db.refresh(db_data)
+    return db_data
+
+
+async def update_excel_data(db: AsyncSession, data_id: int, data: schemas.ExcelDataCreate):
+    """
+    Actualiza un registro existente en ExcelData.
+    """
+    db_data = await get_excel_data_by_id(db, data_id)
+    if not db_data or not await get_excel_file(db, data.archivo_id):
+        return None
+
+    values = data.dict()
+    if fingerprints.edit_changes_fingerprint({col: getattr(db_data, col) for col in values}, values):
+        db_data.fingerprint = None
+
+    deltas = {}
+    totals.add_delta(deltas, db_data.producto, db_data.cantidad, -1)
+    for key, value in (await _encode(db, values)).items():
+        setattr(db_data, key, value)
+    totals.add_delta(deltas, data.producto, data.cantidad, 1)
+    await _apply_deltas(db, deltas)
+
+    await db.commit()
+    await db.refresh(db_data)
+    return db_data
+
+
+async def delete_excel_data(db: AsyncSession, data_id: int):
+    """
+    Elimina un registro de ExcelData por su ID.
+    """
+    db_data = await get_excel_data_by_id(db, data_id)
+    if not db_data:
+        return False
+
+    await _apply_deltas(db, {db_data.producto: (-db_data.cantidad, -1)})
+    await db.delete(db_data)
+    await db.commit()
+    return True
+
+
+async def apply_excel_data_batch(db: AsyncSession, creates: list, updates: list, deletes: list) -> dict:
+    """
+    Aplica una edición en lote de ExcelData en una sola transacción (ver crud.apply_excel_data_batch).
+    """
+    return await db.run_sync(lambda session: crud.apply_excel_data_batch(session, creates, updates, deletes))
@@ -1,40 +1,144 @@
-# backend/app/database.py
-"""
-Configura la conexión a la base de datos MySQL utilizando SQLAlchemy.
-Lee las variables desde el archivo .env ubicado en la raíz del proyecto.
-"""
-
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-import os
-
-# Cargar variables desde el .env de la raíz
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "../../.env"))
-
-MYSQL_USER = os.getenv("MYSQL_USER")
-MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
-MYSQL_HOST = os.getenv("MYSQL_HOST")
-MYSQL_PORT = os.getenv("MYSQL_PORT")
-MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
-
-# URL de conexión a la base de datos
-DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
-
-# Crear motor de conexión
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-
-# Sesión local
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Base para los modelos
-Base = declarative_base()
-
-# Dependencia para obtener la sesión
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# backend/app/database.py
+"""
+Configura la conexión a la base de datos MySQL utilizando SQLAlchemy.
+Lee las variables desde el archivo .env ubicado en la raíz del proyecto.
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+import logging
+import os
+import time
+
+# Cargar variables desde el .env de la raíz (único lugar donde se lee; los demás módulos
+# que usan os.getenv se importan después de este)
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "../../.env"))
+
+MYSQL_USER = os.getenv("MYSQL_USER")
+MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
+MYSQL_HOST = os.getenv("MYSQL_HOST")
+MYSQL_PORT = os.getenv("MYSQL_PORT")
+MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
+
+# URL de conexión a la base de datos
+DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+
+# Driver asíncrono ("aiomysql" o "asyncmy"); ASYNC_DATABASE_URL permite usar otra base
+# completa, por ejemplo "sqlite+aiosqlite:///pruebas.db" en pruebas
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "aiomysql")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    f"mysql+{DB_ASYNC_DRIVER}://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+)
+
+# Permitir LOAD DATA LOCAL INFILE para la inserción masiva (BULK_INSERT_METHOD=load_data)
+MYSQL_LOCAL_INFILE = os.getenv("MYSQL_LOCAL_INFILE", "false").lower() == "true"
+
+# Pool de conexiones (se aplica al motor síncrono y al asíncrono, cada uno con su propio pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))  # Conexiones abiertas de forma permanente
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))  # Conexiones extra en momentos de carga
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # Segundos de espera por una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Renovar conexiones con más de N segundos
+# Verificar la conexión antes de cada uso (un viaje extra a MySQL; con DB_POOL_RECYCLE
+# menor que wait_timeout del servidor se puede desactivar)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Reintentos al conectar durante el arranque (MySQL puede tardar en aceptar conexiones)
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", 10))  # Intentos antes de abortar el arranque
+DB_CONNECT_BACKOFF = float(os.getenv("DB_CONNECT_BACKOFF", 0.5))  # Espera inicial (s), se duplica en cada intento
+DB_CONNECT_MAX_BACKOFF = float(os.getenv("DB_CONNECT_MAX_BACKOFF", 10))  # Espera máxima entre intentos (s)
+
+logger = logging.getLogger(__name__)
+
+
+def pool_options(url: str) -> dict:
+    """Parámetros del pool para create_engine según el motor de base de datos."""
+    if url.startswith("sqlite"):
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Crear motor de conexión
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"local_infile": True} if MYSQL_LOCAL_INFILE else {},
+    **pool_options(DATABASE_URL),
+)
+
+# Sesión local
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Sesión asíncrona; el motor se crea en el primer uso (ver get_async_engine)
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+async_engine = None
+
+# Base para los modelos
+Base = declarative_base()
+
+# Dependencia para obtener la sesión
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_async_engine():
+    """Crea (una sola vez) el motor asíncrono y lo asocia a AsyncSessionLocal."""
+    global async_engine
+    if async_engine is None:
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+        AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+
+# Dependencia para obtener la sesión asíncrona
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def wait_for_database(retries: int = None):
+    """
+    Espera a que la base de datos acepte conexiones, reintentando con espera exponencial.
+    Relanza el último error si no se logra conectar en los intentos indicados.
+    """
+    retries = retries or DB_CONNECT_RETRIES
+    delay = DB_CONNECT_BACKOFF
+    for attempt in range(1, retries + 1):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except OperationalError as e:
+            if attempt == retries:
+                raise
+            logger.warning(
+                f"Base de datos no disponible (intento {attempt}/{retries}), reintentando en {delay:g} s: {e.orig}"
+            )
+            time.sleep(delay)
+            delay = min(delay * 2, DB_CONNECT_MAX_BACKOFF)
+
+
+async def check_database():
+    """Ejecuta una consulta mínima con el motor asíncrono; lanza la excepción si falla."""
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def dispose_engines():
+    """Cierra las conexiones abiertas de ambos pools al apagar el servidor."""
+    engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -0,0 +1,127 @@
+"""
+Diccionarios de los textos que se repiten en excel_data.
+Un mismo producto o una misma hoja aparecen en miles de filas; excel_data guarda solo su
+código (producto_id, hoja_id) y el texto se guarda una vez en las tablas productos y hojas.
+Los códigos se resuelven por bloques con una caché en memoria: un bloque de filas solo
+consulta la base por los nombres que la caché todavía no conoce.
+"""
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import models
+
+# Nombres por consulta al buscar o agregar los que faltan en la caché
+DICTIONARY_CHUNK_SIZE = 500
+
+
+def _insert_missing(dialect: str, table):
+    """INSERT que ignora los nombres que otro proceso ya agregó, según el motor de base de datos."""
+    if dialect == "mysql":
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update(nombre=stmt.inserted.nombre)
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(table)
+        return stmt.on_conflict_do_nothing(index_elements=[table.c.nombre])
+    return insert(table)
+
+
+class Dictionary:
+    """
+    Nombre <-> código de una tabla de diccionario (id, nombre).
+
+    Los códigos no cambian ni se eliminan, de modo que la caché nunca queda desactualizada.
+    Los nombres nuevos se agregan en una transacción propia que se confirma de inmediato:
+    un código guardado en la caché sigue existiendo aunque se revierta la transacción que
+    lo pidió. Por eso encode() se llama antes de escribir en la transacción de la sesión
+    (en SQLite la otra conexión tendría que esperar a que esa escritura se confirme).
+    """
+
+    def __init__(self, model):
+        self.table = model.__table__
+        self._codes = {}  # nombre -> código
+        self._names = {}  # código -> nombre
+
+    def encode(self, db: Session, names: list) -> list:
+        """Códigos de una lista de nombres, agregando al diccionario los que no existan."""
+        missing = set(names) - self._codes.keys()
+        if missing:
+            self._resolve(db, missing)
+        codes = self._codes
+        return [codes[name] for name in names]
+
+    def decode(self, db: Session, codes: list) -> list:
+        """Nombres de una lista de códigos."""
+        missing = set(codes) - self._names.keys()
+        if missing:
+            with db.get_bind().connect() as conn:
+                self._load(conn, self.table.c.id, missing)
+        names = self._names
+        return [names[code] for code in codes]
+
+    def _resolve(self, db: Session, names: set):
+        with db.get_bind().connect() as conn:
+            self._load(conn, self.table.c.nombre, names)
+            new = names - self._codes.keys()
+            if not new:
+                return
+            stmt = _insert_missing(conn.dialect.name, self.table)
+            for chunk in _chunks(sorted(new)):
+                conn.execute(stmt, [{"nombre": name} for name in chunk])
+            # Confirmar antes de leer los códigos: en MySQL una lectura dentro de la misma
+            # transacción no vería los nombres que otro proceso agregó al mismo tiempo
+            conn.commit()
+            self._load(conn, self.table.c.nombre, new)
+
+    def _load(self, conn, column, values: set):
+        """Carga en la caché las entradas cuyo nombre o código está en values."""
+        for chunk in _chunks(list(values)):
+            for code, name in conn.execute(select(self.table.c.id, self.table.c.nombre).where(column.in_(chunk))):
+                self._codes[name] = code
+                self._names[code] = name
+
+
+def _chunks(items: list, size: int = DICTIONARY_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+productos = Dictionary(models.Producto)
+hojas = Dictionary(models.Hoja)
+
+# Columna de texto -> (diccionario, columna con el código en excel_data)
+ENCODED_COLUMNS = {"producto": (productos, "producto_id"), "hoja": (hojas, "hoja_id")}
+
+
+# ------------------ Codificación de filas ------------------
+
+def encode_columns(db: Session, columns: dict) -> dict:
+    """Agrega a un bloque de arreglos por columna los códigos de producto y hoja."""
+    for name, (dictionary, code_column) in ENCODED_COLUMNS.items():
+        columns[code_column] = dictionary.encode(db, columns[name])
+    return columns
+
+
+def encode_rows(db: Session, rows: list) -> list:
+    """
+    Copia de las filas (diccionarios) con 'producto' y 'hoja' reemplazados por sus
+    códigos, con una sola resolución por diccionario para todas las filas.
+    """
+    rows = [dict(row) for row in rows]
+    for name, (dictionary, code_column) in ENCODED_COLUMNS.items():
+        targets = [row for row in rows if name in row]
+        codes = dictionary.encode(db, [row.pop(name) for row in targets])
+        for row, code in zip(targets, codes):
+            row[code_column] = code
+    return rows
+
+
+def decode_rows(db: Session, rows: list) -> list:
+    """Inverso de encode_rows: reemplaza los códigos de producto y hoja por sus nombres."""
+    rows = [dict(row) for row in rows]
+    for name, (dictionary, code_column) in ENCODED_COLUMNS.items():
+        targets = [row for row in rows if code_column in row]
+        names = dictionary.decode(db, [row.pop(code_column) for row in targets])
+        for row, value in zip(targets, names):
+            row[name] = value
+    return rows
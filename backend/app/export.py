@@ -0,0 +1,47 @@
+"""
+Exportación de los datos cargados en formatos de texto por líneas.
+Convierte los bloques de filas que entrega crud.iter_excel_data en fragmentos
+de NDJSON o CSV listos para enviarse con un StreamingResponse.
+"""
+
+import csv
+import io
+import json
+import os
+
+# Filas leídas de la base de datos (y enviadas al cliente) por bloque
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 5000))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def iter_ndjson(chunks, fields: list):
+    """Genera un objeto JSON por línea para cada fila."""
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n" for row in rows
+        )
+
+
+def iter_csv(chunks, fields: list):
+    """Genera el CSV con una fila de encabezados seguida de un fragmento por bloque."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def iter_export(format: str, chunks, fields: list):
+    """Elige el generador según el formato pedido ('ndjson' o 'csv')."""
+    if format == "csv":
+        return iter_csv(chunks, fields)
+    return iter_ndjson(chunks, fields)
@@ -0,0 +1,126 @@
+"""
+Huellas por fila de excel_data.
+La huella identifica una fila del libro por su contenido (columnas convertidas y hoja)
+y por el número de veces que esa misma fila ya apareció antes en el archivo, de modo
+que las filas repetidas conservan su cantidad. Con ella, volver a cargar un archivo solo
+escribe las filas nuevas y puede eliminar las que ya no están en el libro.
+"""
+
+import hashlib
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+from app import crud, models
+
+# Columnas que forman la huella, en este orden
+FINGERPRINT_COLUMNS = ["nombre", "direccion", "telefono", "producto", "cantidad", "hoja"]
+
+_data = models.ExcelData.__table__
+
+
+def _content_hash(values):
+    """BLAKE2b (16 bytes) del contenido de una fila, listo para agregarle el número de ocurrencia."""
+    return hashlib.blake2b("\x1f".join(str(v) for v in values).encode("utf-8"), digest_size=16)
+
+
+def _digest(content, occurrence: int) -> str:
+    """
+    Huella de una fila: BLAKE2b de 16 bytes (32 caracteres hexadecimales) del contenido
+    seguido del número de ocurrencia.
+    """
+    content = content.copy()
+    content.update(f"\x1e{occurrence}".encode("utf-8"))
+    return content.hexdigest()
+
+
+class FingerprintDiff:
+    """
+    Compara las filas de una carga con las que el archivo ya tiene en excel_data.
+    Las filas se deben entregar en el orden del libro, hoja por hoja.
+    """
+
+    def __init__(self, existing: set):
+        self.existing = existing  # huellas ya guardadas para el archivo
+        self.seen = set()  # huellas de las filas del libro que se está cargando
+        # Resumen del contenido de la fila (16 bytes) -> veces que ya apareció; no se guardan
+        # los valores, para que la memoria no crezca con el ancho de las filas
+        self._occurrences = {}
+
+    def fingerprints(self, columns: dict) -> list:
+        """Calcula la huella de cada fila de un lote (arreglos por columna)."""
+        result = []
+        for values in zip(*(columns[col] for col in FINGERPRINT_COLUMNS)):
+            content = _content_hash(values)
+            key = content.digest()
+            occurrence = self._occurrences.get(key, 0)
+            self._occurrences[key] = occurrence + 1
+            result.append(_digest(content, occurrence))
+        return result
+
+    def new_rows(self, columns: dict):
+        """
+        Agrega la columna 'fingerprint' a un lote y retorna solo las filas que el archivo
+        aún no tiene, junto con la cantidad de filas que ya estaban guardadas.
+        """
+        columns["fingerprint"] = self.fingerprints(columns)
+        self.seen.update(columns["fingerprint"])
+        keep = [i for i, fp in enumerate(columns["fingerprint"]) if fp not in self.existing]
+        unchanged = len(columns["fingerprint"]) - len(keep)
+        if not unchanged:
+            return columns, 0
+        return {col: [values[i] for i in keep] for col, values in columns.items()}, unchanged
+
+    def missing(self) -> set:
+        """Huellas guardadas que ya no aparecen en el libro."""
+        return self.existing - self.seen
+
+
+def edit_changes_fingerprint(old: dict, new: dict) -> bool:
+    """
+    Indica si una edición (new: columnas a modificar) cambia el archivo o alguna columna de la
+    huella de un registro. La huella identifica la fila tal como vino del libro: el registro
+    editado o movido a otro archivo debe quedar sin huella, como los creados a mano, para no
+    chocar con uq_excel_data_archivo_fingerprint ni tomarse como sin cambios al recargar el libro.
+    """
+    return any(col in new and new[col] != old[col] for col in ["archivo_id", *FINGERPRINT_COLUMNS])
+
+
+# ------------------ Consulta y llenado de huellas ------------------
+
+def existing_fingerprints(db: Session, file_id: int) -> set:
+    """Huellas de las filas ya cargadas de un archivo (las filas sin huella no se incluyen)."""
+    return set(
+        db.execute(
+            select(_data.c.fingerprint).where(_data.c.archivo_id == file_id, _data.c.fingerprint.is_not(None))
+        ).scalars()
+    )
+
+
+def backfill_file(db: Session, file_id: int, batch_size: int = 5000) -> int:
+    """
+    Calcula las huellas de un archivo cargado antes de que existieran, recorriendo sus
+    filas en el orden de inserción. Solo se aplica si ninguna fila del archivo tiene huella,
+    para no mezclar el orden de ocurrencias con el de una carga posterior.
+    Retorna las filas actualizadas.
+    """
+    has_fingerprints = db.execute(
+        select(_data.c.id).where(_data.c.archivo_id == file_id, _data.c.fingerprint.is_not(None)).limit(1)
+    ).first()
+    if has_fingerprints:
+        return 0
+
+    rows = db.execute(crud.excel_data_query(["id"] + FINGERPRINT_COLUMNS, archivo_id=file_id)).all()
+    diff = FingerprintDiff(set())
+    fingerprints = diff.fingerprints({col: [row[i + 1] for row in rows] for i, col in enumerate(FINGERPRINT_COLUMNS)})
+
+    stmt = update(_data).where(_data.c.id == bindparam("row_id")).values(fingerprint=bindparam("fp"))
+    for start in range(0, len(rows), batch_size):
+        db.execute(
+            stmt,
+            [
+                {"row_id": row[0], "fp": fp}
+                for row, fp in zip(rows[start:start + batch_size], fingerprints[start:start + batch_size])
+            ],
+        )
+        db.commit()
+    return len(rows)
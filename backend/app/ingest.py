@@ -0,0 +1,531 @@
+"""
+Conversión columnar de las hojas de Excel a datos listos para insertar.
+Reemplaza el recorrido fila por fila con operaciones vectorizadas de pandas
+e incluye el proceso completo de carga de un archivo a la base de datos.
+pandas y numpy se importan en el primer uso (ver app.reader), no al importar el módulo.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing.util
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from typing import TYPE_CHECKING
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from app import crud, fingerprints, metrics, reader, snapshots, utils
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columnas que deben existir en cada hoja
+REQUIRED_COLUMNS = ["nombre", "direccion", "telefono", "producto", "cantidad"]
+
+# Columnas que se guardan como texto sin más transformación
+TEXT_COLUMNS = ["nombre", "direccion", "telefono", "producto"]
+
+# Número máximo de filas de ejemplo que se reportan por cada columna con errores
+MAX_ERROR_SAMPLES = 20
+
+# Procesos para leer las hojas de un libro en paralelo (0 o 1: una hoja tras otra en el mismo proceso)
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", 0))
+
+# Hojas de un libro enviadas al pool que esperan su turno para insertarse (leyéndose o ya
+# leídas); limita lo que se acumula mientras se inserta una hoja lenta (0: una por proceso)
+INGEST_PARSE_PENDING = int(os.getenv("INGEST_PARSE_PENDING", 0))
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza los nombres de columnas (quita espacios y pasa a minúsculas).
+    Evita errores al comparar nombres de columnas.
+    """
+    new_cols = []
+    for c in df.columns:
+        # Convertir a string, limpiar espacios y pasar a minúsculas
+        try:
+            c_str = str(c).strip().lower()
+        except Exception:
+            c_str = str(c)
+        # Si dos columnas quedan con el mismo nombre, se conserva la primera
+        if c_str in new_cols:
+            suffix = 1
+            while f"{c_str}.{suffix}" in new_cols:
+                suffix += 1
+            c_str = f"{c_str}.{suffix}"
+        new_cols.append(c_str)
+    df.columns = new_cols
+    return df
+
+
+# ------------------ Conversión por columna ------------------
+
+def _text_column(series: pd.Series) -> list:
+    """Convierte una columna completa a texto, dejando vacíos los valores nulos."""
+    return series.where(series.notna(), "").astype(str).tolist()
+
+
+def _cantidad_column(series: pd.Series):
+    """
+    Convierte la columna 'cantidad' a enteros en una sola operación.
+
+    Los valores vacíos se guardan como 0. Los valores no numéricos también,
+    pero se reportan como error indicando las filas del Excel afectadas
+    (tomadas del índice de la serie).
+    """
+    import numpy as np
+    import pandas as pd
+
+    numeric = pd.to_numeric(series, errors="coerce").replace([np.inf, -np.inf], np.nan)
+    blank = series.isna() | (series.astype(str).str.strip() == "")
+    invalid = (numeric.isna() & ~blank).to_numpy()
+
+    # astype trunca hacia cero, igual que int(float(valor))
+    values = numeric.fillna(0).astype("int64").tolist()
+
+    errors = {}
+    if invalid.any():
+        rows = [int(number) for number in series.index[invalid]]
+        errors["cantidad"] = {
+            "mensaje": "Valores no numéricos reemplazados por 0",
+            "total": len(rows),
+            "filas": rows[:MAX_ERROR_SAMPLES],
+        }
+    return values, errors
+
+
+# ------------------ Conversión de hojas completas ------------------
+
+def dataframe_to_columns(df: pd.DataFrame, sheet_name: str, file_id: int):
+    """
+    Convierte una hoja (o un lote de ella) ya normalizada y validada en arreglos por columna.
+
+    Parámetros:
+        df (DataFrame): filas con las columnas requeridas, indexadas por número de fila del Excel
+        sheet_name (str): nombre de la hoja de Excel
+        file_id (int): ID del archivo en la tabla excel_files
+
+    Retorna:
+        tuple (columnas, errores): diccionario columna -> lista de valores,
+        y diccionario columna -> detalle de los valores inválidos
+    """
+    columns, errors = _convert_columns(df)
+    return _add_sheet_columns(columns, sheet_name, file_id), errors
+
+
+def dataframe_to_records(df: pd.DataFrame) -> list:
+    """
+    Convierte un lote ya normalizado y validado en registros (columna -> valor), con los
+    mismos valores que se insertan y que guarda la copia columnar (ver app.snapshots).
+    """
+    columns, _ = _convert_columns(df[REQUIRED_COLUMNS])
+    return [dict(zip(REQUIRED_COLUMNS, values)) for values in zip(*(columns[c] for c in REQUIRED_COLUMNS))]
+
+
+def _convert_columns(df: pd.DataFrame):
+    """Convierte las columnas requeridas de un lote, sin agregar hoja ni archivo_id."""
+    columns = {col: _text_column(df[col]) for col in TEXT_COLUMNS}
+    columns["cantidad"], errors = _cantidad_column(df["cantidad"])
+    return columns, errors
+
+
+def _add_sheet_columns(columns: dict, sheet_name: str, file_id: int) -> dict:
+    """Agrega a un lote las columnas constantes 'hoja' y 'archivo_id'."""
+    total = len(columns["cantidad"])
+    columns["hoja"] = [str(sheet_name)] * total
+    columns["archivo_id"] = [file_id] * total
+    return columns
+
+
+def _header_error(first: pd.DataFrame):
+    """Valida el primer lote de una hoja. Retorna el motivo por el que no se carga, o None."""
+    if first.empty:
+        return "La hoja no contiene datos"
+    try:
+        utils.validate_excel_columns(normalize_columns(first).columns.tolist(), REQUIRED_COLUMNS)
+    except HTTPException as e:
+        return e.detail
+    return None
+
+
+# ------------------ Proceso completo de carga ------------------
+
+class IngestProgress:
+    """
+    Contadores reales del avance de una carga.
+    Se actualizan mientras se procesa el archivo y se pueden consultar en cualquier momento.
+    """
+
+    def __init__(self):
+        self.sheets_total = 0
+        self.sheets_processed = 0
+        self.rows_parsed = 0
+        self.rows_inserted = 0
+        self.rows_unchanged = 0  # filas que el archivo ya tenía de una carga anterior
+        self.rows_deleted = 0  # filas eliminadas porque ya no están en el libro (prune)
+        self.invalid_sheets = {}  # hoja -> motivo por el que se omitió
+        self.errors = {}  # hoja -> errores por columna
+
+    def to_dict(self) -> dict:
+        return {
+            "sheets_total": self.sheets_total,
+            "sheets_processed": self.sheets_processed,
+            "rows_parsed": self.rows_parsed,
+            "rows_inserted": self.rows_inserted,
+            "rows_unchanged": self.rows_unchanged,
+            "rows_deleted": self.rows_deleted,
+            "invalid_sheets": self.invalid_sheets,
+            "errors": self.errors,
+        }
+
+
+def ingest_file(
+    db: Session, db_file, progress: IngestProgress = None, concurrent: bool = False, prune: bool = False
+) -> IngestProgress:
+    """
+    Lee todas las hojas de un archivo Excel registrado y las inserta en excel_data.
+    Si existe una copia columnar del archivo se lee de ella; si no, el libro se
+    recorre en lotes de tamaño fijo y la copia se escribe durante la misma lectura.
+
+    La carga es incremental: cada fila lleva su huella (ver app.fingerprints) y solo se
+    insertan las que el archivo aún no tiene, así que repetir la carga o cargar una versión
+    corregida del libro solo escribe la diferencia.
+
+    Parámetros:
+        db (Session): sesión de base de datos
+        db_file (ExcelFile): registro del archivo a cargar
+        progress (IngestProgress, opcional): objeto donde se va reportando el avance
+        concurrent (bool): el archivo se carga al mismo tiempo que otros (subida en lote);
+            si hay procesos de lectura se usan aunque el libro tenga una sola hoja
+        prune (bool): eliminar las filas cargadas antes que ya no aparecen en el libro
+
+    Retorna:
+        IngestProgress con los totales de la carga
+    """
+    progress = progress or IngestProgress()
+    start = time.perf_counter()
+
+    # Huellas de lo que el archivo ya tiene cargado (las de cargas anteriores a las huellas se calculan aquí)
+    with metrics.stage("fingerprint"):
+        fingerprints.backfill_file(db, db_file.id)
+        diff = fingerprints.FingerprintDiff(fingerprints.existing_fingerprints(db, db_file.id))
+
+    snapshot = snapshots.open_snapshot(db_file.filepath)
+    if snapshot is not None:
+        _ingest_snapshot(db, snapshot, db_file.id, progress, diff)
+    else:
+        with reader.open_workbook(db_file.filepath) as workbook, \
+                snapshots.SnapshotWriter(db_file.filepath) as writer:
+            progress.sheets_total = len(workbook.sheet_names)
+
+            if _use_parse_workers(db_file.filepath, workbook.sheet_names, concurrent):
+                _ingest_parallel(db, db_file.filepath, workbook.sheet_names, db_file.id, progress, writer, diff)
+            else:
+                # Recorrer cada hoja del archivo
+                for sheet_name in workbook.sheet_names:
+                    _ingest_sheet(db, workbook, sheet_name, db_file.id, progress, writer, diff)
+                    progress.sheets_processed += 1
+
+    if prune and diff.missing():
+        progress.rows_deleted = crud.delete_excel_data_by_fingerprints(db, db_file.id, diff.missing())
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"{progress.rows_inserted} registros insertados del archivo {db_file.filename} en {elapsed:.2f}s",
+        extra={"file_id": db_file.id, "rows": progress.rows_inserted, "duration_ms": round(elapsed * 1000, 2)},
+    )
+    return progress
+
+
+def _ingest_sheet(db: Session, workbook, sheet_name: str, file_id: int, progress: IngestProgress, writer, diff):
+    """Valida los encabezados de una hoja e inserta sus filas lote por lote."""
+    batches = metrics.timed_iter("read", workbook.iter_batches(sheet_name))
+    first = next(batches)
+
+    with metrics.stage("validate"):
+        message = _header_error(first)
+    if message:
+        _skip_sheet(sheet_name, message, progress, writer)
+        return
+
+    inserted = 0
+    start = time.perf_counter()
+    for df in chain([first], batches):
+        with metrics.stage("normalize"):
+            df = normalize_columns(df)
+
+        # Convertir el lote completo por columnas, sin recorrer fila por fila
+        with metrics.stage("convert"):
+            columns, errors = dataframe_to_columns(df[REQUIRED_COLUMNS], sheet_name, file_id)
+        progress.rows_parsed += len(df)
+        if errors:
+            _merge_errors(progress.errors.setdefault(sheet_name, {}), errors)
+        with metrics.stage("snapshot"):
+            writer.write(sheet_name, columns, progress.errors.get(sheet_name))
+
+        # Insertar en la base de datos, por bloques, las filas que el archivo aún no tiene
+        inserted += _insert_new_rows(db, columns, progress, diff)
+
+    if sheet_name in progress.errors:
+        logger.warning(f"Hoja '{sheet_name}' con valores inválidos: {progress.errors[sheet_name]}")
+    _log_sheet(sheet_name, file_id, inserted, time.perf_counter() - start)
+
+
+def _ingest_snapshot(db: Session, snapshot, file_id: int, progress: IngestProgress, diff):
+    """Inserta las hojas desde la copia columnar, sin volver a leer el Excel."""
+    progress.sheets_total = len(snapshot.sheets)
+
+    for sheet in snapshot.sheets:
+        sheet_name = sheet["name"]
+        if not sheet["file"]:
+            progress.invalid_sheets[sheet_name] = sheet["mensaje"]
+            progress.sheets_processed += 1
+            continue
+
+        if sheet["errors"]:
+            progress.errors[sheet_name] = sheet["errors"]
+
+        for columns in metrics.timed_iter("read_snapshot", snapshot.iter_batches(sheet)):
+            progress.rows_parsed += len(columns["cantidad"])
+            columns = _add_sheet_columns(columns, sheet_name, file_id)
+            _insert_new_rows(db, columns, progress, diff)
+
+        progress.sheets_processed += 1
+
+
+# ------------------ Lectura de hojas en procesos paralelos ------------------
+
+_parse_executor = None
+_parse_executor_lock = threading.Lock()
+
+
+def _get_parse_executor() -> ProcessPoolExecutor:
+    """Crea (una sola vez) el pool de procesos que leen las hojas."""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            # "spawn" evita copiar con fork los hilos y conexiones abiertas del servidor
+            _parse_executor = ProcessPoolExecutor(
+                max_workers=INGEST_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _parse_executor
+
+
+def shutdown_parse_workers():
+    """Detiene el pool de lectura, si existe (al apagar el servidor). Cada proceso cierra su libro abierto."""
+    global _parse_executor
+    with _parse_executor_lock:
+        executor, _parse_executor = _parse_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _use_parse_workers(filepath: str, sheet_names: list, concurrent: bool = False) -> bool:
+    """
+    Decide si las hojas se leen en paralelo. Los .xls se leen completos con pandas
+    al abrirlos, así que repartirlos por hoja no ahorra trabajo. Un libro de una sola
+    hoja solo se envía al pool si se carga junto con otros, para que los archivos
+    de un lote no compitan por el GIL de este proceso.
+    """
+    if INGEST_PARSE_WORKERS <= 1 or filepath.lower().endswith(".xls"):
+        return False
+    return len(sheet_names) > 1 or concurrent
+
+
+# Libro abierto en cada proceso del pool: ((ruta, mtime), lector). Así cada proceso lee una
+# sola vez el índice y los textos compartidos del libro, y no una vez por cada hoja
+_worker_workbook = None
+_worker_finalizer = None
+
+
+def _worker_open(filepath: str):
+    """Devuelve el libro abierto en este proceso, abriéndolo si es otro archivo."""
+    global _worker_workbook, _worker_finalizer
+    key = (filepath, os.stat(filepath).st_mtime_ns)
+    if _worker_workbook is None or _worker_workbook[0] != key:
+        _worker_close()
+        _worker_workbook = (key, reader.open_workbook(filepath))
+    if _worker_finalizer is None:
+        # Se ejecuta cuando el proceso termina (al detener el pool con shutdown_parse_workers)
+        _worker_finalizer = multiprocessing.util.Finalize(None, _worker_close, exitpriority=10)
+    return _worker_workbook[1]
+
+
+def _worker_close():
+    """Cierra el libro abierto en este proceso, para no retener el archivo."""
+    global _worker_workbook
+    if _worker_workbook is not None:
+        workbook, _worker_workbook = _worker_workbook[1], None
+        workbook.close()
+
+
+def _parse_sheet(filepath: str, sheet_name: str, path: str = None) -> dict:
+    """
+    Lee, normaliza y convierte una hoja completa (se ejecuta en un proceso del pool).
+    Con 'path', los lotes se escriben en ese archivo Arrow (ver snapshots.write_sheet_file)
+    y solo se devuelven la ruta y los contadores; sin él, se devuelven como arreglos por
+    columna. En ambos casos sin 'hoja' ni 'archivo_id', que se agregan en el proceso principal.
+    """
+    # Las mediciones de etapa se devuelven en 'stages' y las registra el proceso principal
+    result = {"name": sheet_name, "mensaje": None, "file": None, "rows": 0, "batches": [], "errors": {}, "stages": []}
+    stages = result["stages"]
+    batches = metrics.timed_iter("read", _worker_open(filepath).iter_batches(sheet_name), stages)
+    first = next(batches)
+
+    with metrics.stage("validate", stages):
+        result["mensaje"] = _header_error(first)
+    if result["mensaje"]:
+        return result
+
+    def converted():
+        for df in chain([first], batches):
+            with metrics.stage("normalize", stages):
+                df = normalize_columns(df)
+            with metrics.stage("convert", stages):
+                columns, errors = _convert_columns(df[REQUIRED_COLUMNS])
+            if errors:
+                _merge_errors(result["errors"], errors)
+            yield columns
+
+    if path is None:
+        result["batches"] = list(converted())
+    else:
+        result["rows"] = snapshots.write_sheet_file(path, converted())
+        result["file"] = path
+    return result
+
+
+def _ingest_parallel(
+    db: Session, filepath: str, sheet_names: list, file_id: int, progress: IngestProgress, writer, diff
+):
+    """
+    Lee las hojas en procesos separados e inserta cada una en el orden del libro.
+    Con pyarrow, cada proceso escribe su hoja en un archivo Arrow (el de la copia columnar,
+    si está activa) y aquí se lee lote por lote, en lugar de recibir la hoja serializada.
+    Se envían al pool como mucho INGEST_PARSE_PENDING hojas por delante de la que se inserta.
+    """
+    global _parse_executor
+    executor = _get_parse_executor()
+    pending = max(INGEST_PARSE_PENDING or INGEST_PARSE_WORKERS, 1)
+    # Sin copia columnar las hojas se escriben en una carpeta temporal que se elimina al terminar
+    spool_dir = tempfile.mkdtemp(prefix="ingest-") if snapshots.ARROW_AVAILABLE and not writer.enabled else None
+
+    def sheet_path(index: int):
+        if spool_dir:
+            return os.path.join(spool_dir, f"part_{index}.arrow")
+        return writer.sheet_file(index)
+
+    futures = deque()
+    submitted = 0
+
+    def submit_pending():
+        nonlocal submitted
+        while submitted < len(sheet_names) and len(futures) < pending:
+            futures.append(executor.submit(_parse_sheet, filepath, sheet_names[submitted], sheet_path(submitted)))
+            submitted += 1
+
+    try:
+        submit_pending()
+        while futures:
+            parsed = futures.popleft().result()
+            # La siguiente hoja se envía antes de insertar esta, para no dejar un proceso libre
+            submit_pending()
+            _insert_parsed_sheet(db, parsed, file_id, progress, writer, diff)
+            progress.sheets_processed += 1
+    except BrokenProcessPool:
+        # Un proceso terminó de forma inesperada: el pool ya no sirve y se crea de nuevo en la próxima carga
+        with _parse_executor_lock:
+            _parse_executor = None
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+        if spool_dir:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def _insert_parsed_sheet(db: Session, parsed: dict, file_id: int, progress: IngestProgress, writer, diff):
+    """Inserta una hoja leída por _parse_sheet y la agrega a la copia columnar."""
+    sheet_name = parsed["name"]
+    metrics.record_stages(parsed["stages"])
+    if parsed["mensaje"]:
+        _skip_sheet(sheet_name, parsed["mensaje"], progress, writer)
+        return
+
+    if parsed["errors"]:
+        progress.errors[sheet_name] = parsed["errors"]
+        logger.warning(f"Hoja '{sheet_name}' con valores inválidos: {parsed['errors']}")
+
+    if parsed["file"]:
+        batches = metrics.timed_iter("read_snapshot", snapshots.iter_sheet_file(parsed["file"]))
+    else:
+        batches = (parsed["batches"].pop(0) for _ in range(len(parsed["batches"])))
+
+    inserted = 0
+    start = time.perf_counter()
+    for columns in batches:
+        columns = _add_sheet_columns(columns, sheet_name, file_id)
+        progress.rows_parsed += len(columns["cantidad"])
+        if not parsed["file"]:
+            with metrics.stage("snapshot"):
+                writer.write(sheet_name, columns, parsed["errors"])
+        inserted += _insert_new_rows(db, columns, progress, diff)
+
+    # El archivo de la hoja ya es la parte de la copia columnar, o se descarta
+    if parsed["file"] and writer.enabled:
+        writer.adopt_sheet(sheet_name, parsed["file"], parsed["rows"], parsed["errors"])
+    elif parsed["file"]:
+        os.remove(parsed["file"])
+    _log_sheet(sheet_name, file_id, inserted, time.perf_counter() - start)
+
+
+def _insert_new_rows(db: Session, columns: dict, progress: IngestProgress, diff) -> int:
+    """Inserta las filas de un lote que el archivo aún no tiene. Retorna las filas insertadas."""
+    with metrics.stage("fingerprint"):
+        columns, unchanged = diff.new_rows(columns)
+    progress.rows_unchanged += unchanged
+    if not columns["cantidad"]:
+        return 0
+    return crud.insert_excel_data(db, columns, on_chunk=lambda n: _add_inserted(progress, n))["inserted"]
+
+
+def _log_sheet(sheet_name: str, file_id: int, rows: int, elapsed: float):
+    logger.info(
+        f"Hoja '{sheet_name}': {rows} filas en {elapsed:.2f}s",
+        extra={"file_id": file_id, "sheet": sheet_name, "rows": rows, "duration_ms": round(elapsed * 1000, 2)},
+    )
+
+
+def _skip_sheet(sheet_name: str, message: str, progress: IngestProgress, writer):
+    """Registra una hoja que no se carga (vacía o con columnas faltantes)."""
+    logger.warning(f"Hoja '{sheet_name}' inválida: {message}")
+    progress.invalid_sheets[sheet_name] = message
+    writer.add_invalid(sheet_name, message)
+
+
+def _merge_errors(target: dict, errors: dict):
+    """Acumula los errores por columna de un lote en los de la hoja."""
+    for column, detail in errors.items():
+        if column not in target:
+            target[column] = dict(detail)
+            continue
+        current = target[column]
+        current["total"] += detail["total"]
+        current["filas"] = (current["filas"] + detail["filas"])[:MAX_ERROR_SAMPLES]
+
+
+def _add_inserted(progress: IngestProgress, rows: int):
+    """Suma al progreso las filas de un bloque ya confirmado."""
+    progress.rows_inserted += rows
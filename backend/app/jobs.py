@@ -0,0 +1,287 @@
+"""
+Ejecución de cargas de Excel en segundo plano.
+Las cargas se encolan en un pool de hilos acotado y su progreso se consulta por ID,
+sin mantener ocupada la petición HTTP mientras se procesa el archivo.
+"""
+
+import logging
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from app import crud, database, ingest, logging_setup, metrics
+
+# Cargas ejecutándose al mismo tiempo (protege a MySQL cuando varios usuarios insertan)
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", 2))
+# Cargas en espera o en ejecución antes de rechazar nuevas solicitudes
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", 20))
+# Cargas terminadas que se conservan en memoria para poder consultarlas
+INGEST_MAX_FINISHED = int(os.getenv("INGEST_MAX_FINISHED", 200))
+# Archivos de las subidas en lote que se cargan al mismo tiempo (entre todos los lotes)
+INGEST_BATCH_WORKERS = int(os.getenv("INGEST_BATCH_WORKERS", 4))
+# Lotes sin terminar antes de rechazar nuevas subidas en lote
+INGEST_MAX_BATCHES = int(os.getenv("INGEST_MAX_BATCHES", 2))
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_MAX_WORKERS, thread_name_prefix="ingest")
+_batch_executor = ThreadPoolExecutor(max_workers=INGEST_BATCH_WORKERS, thread_name_prefix="ingest-batch")
+_jobs = {}  # job_id -> IngestJob
+_batches = {}  # batch_id -> BatchJob
+_lock = threading.Lock()
+
+
+class JobQueueFull(Exception):
+    """Se lanza cuando ya hay demasiadas cargas pendientes."""
+
+
+class FileBusy(Exception):
+    """Se lanza cuando el archivo tiene una carga sin terminar."""
+
+
+class IngestJob(ingest.IngestProgress):
+    """Carga de un archivo Excel ejecutada en segundo plano."""
+
+    def __init__(self, file_id: int, batch_id: str = None, prune: bool = False):
+        super().__init__()
+        self.id = uuid.uuid4().hex
+        self.file_id = file_id
+        self.batch_id = batch_id
+        self.prune = prune  # eliminar las filas que ya no están en el libro
+        self.status = "pending"  # pending | running | completed | failed
+        self.message = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def elapsed(self):
+        """Segundos de ejecución (hasta ahora si la carga sigue en curso)."""
+        if self.started_at is None:
+            return None
+        end = self.finished_at or time.time()
+        return round(end - self.started_at, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "file_id": self.file_id,
+            "status": self.status,
+            "message": self.message,
+            **super().to_dict(),
+            "elapsed": self.elapsed(),
+        }
+
+
+class BatchJob:
+    """
+    Carga de los archivos de una subida en lote.
+    Cada archivo se procesa como una IngestJob en el pool de lotes; el lote solo
+    agrupa sus avances y termina cuando termina el último archivo.
+    """
+
+    def __init__(self, files: list):
+        self.id = uuid.uuid4().hex
+        self.files = files  # [{"file_id", "filename", "rows_inserted"}] en el orden de la subida
+        self.jobs = {}  # file_id -> IngestJob (solo los archivos que faltaba cargar)
+        self.created_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return all(job.finished for job in self.jobs.values())
+
+    @property
+    def finished_at(self):
+        if not self.finished:
+            return None
+        return max((job.finished_at for job in self.jobs.values()), default=self.created_at)
+
+    def _file_dict(self, file: dict) -> dict:
+        job = self.jobs.get(file["file_id"])
+        if job is None:
+            # Ya estaba cargado antes de la subida
+            return {
+                **file,
+                "job_id": None,
+                "status": "completed",
+                "message": "El archivo ya había sido cargado",
+                "invalid_sheets": {},
+                "elapsed": None,
+            }
+        return {
+            **file,
+            "job_id": job.id,
+            "status": job.status,
+            "message": job.message,
+            "sheets_total": job.sheets_total,
+            "rows_inserted": job.rows_inserted,
+            "rows_unchanged": job.rows_unchanged,
+            "invalid_sheets": job.invalid_sheets,
+            "elapsed": job.elapsed(),
+        }
+
+    def to_dict(self) -> dict:
+        files = [self._file_dict(file) for file in self.files]
+        end = self.finished_at or time.time()
+        return {
+            "batch_id": self.id,
+            "status": "completed" if self.finished else "running",
+            "files_total": len(files),
+            "files_completed": sum(1 for f in files if f["status"] == "completed"),
+            "files_failed": sum(1 for f in files if f["status"] == "failed"),
+            "rows_inserted": sum(f["rows_inserted"] or 0 for f in files),
+            "elapsed": round(end - self.created_at, 3),
+            "files": files,
+        }
+
+
+def _run(job: IngestJob):
+    """Procesa la carga en un hilo del pool con su propia sesión de base de datos."""
+    logging_setup.bind(job_id=job.id, file_id=job.file_id, **({"batch_id": job.batch_id} if job.batch_id else {}))
+    job.status = "running"
+    job.started_at = time.time()
+    db = database.SessionLocal()
+    try:
+        db_file = crud.get_excel_file(db, job.file_id)
+        if not db_file:
+            raise ValueError("Archivo no encontrado")
+        ingest.ingest_file(db, db_file, job, concurrent=job.batch_id is not None, prune=job.prune)
+        # rows_inserted del archivo cuenta todas sus filas cargadas, también las de cargas anteriores
+        crud.mark_excel_file_inserted(db, job.file_id, job.rows_inserted + job.rows_unchanged)
+        job.status = "completed"
+        job.message = f"Se insertaron {job.rows_inserted} registros correctamente."
+        if job.rows_unchanged or job.rows_deleted:
+            job.message += f" {job.rows_unchanged} ya estaban cargados y {job.rows_deleted} se eliminaron."
+    except Exception as e:
+        db.rollback()
+        job.status = "failed"
+        job.message = f"Error en la carga: {e}"
+        logger.exception(f"Carga {job.id} del archivo {job.file_id} fallida")
+    finally:
+        db.close()
+        job.finished_at = time.time()
+        metrics.INGEST_JOB_SECONDS.observe(job.finished_at - job.started_at, status=job.status)
+        logger.info(
+            f"Carga {job.id} terminada: {job.status}",
+            extra={"status": job.status, "rows": job.rows_inserted, "duration_ms": round(job.elapsed() * 1000, 2)},
+        )
+
+
+def _prune_finished(registry: dict):
+    """Descarta las cargas (o lotes) terminadas más antiguas para acotar la memoria."""
+    finished = [job for job in registry.values() if job.finished]
+    for job in sorted(finished, key=lambda j: j.finished_at)[:-INGEST_MAX_FINISHED or None]:
+        del registry[job.id]
+
+
+def _unfinished_job(file_id: int):
+    """Carga sin terminar de un archivo, o None."""
+    for job in _jobs.values():
+        if job.file_id == file_id and not job.finished:
+            return job
+    return None
+
+
+# ------------------ API pública ------------------
+
+def submit_ingest(file_id: int, prune: bool = False) -> IngestJob:
+    """
+    Encola la carga de un archivo y retorna la tarea creada.
+    Si el archivo ya tiene una carga sin terminar, retorna esa misma tarea.
+    Con prune=True la carga elimina las filas del archivo que ya no están en el libro.
+    Lanza JobQueueFull si ya hay INGEST_MAX_PENDING cargas sin terminar.
+    """
+    with _lock:
+        job = _unfinished_job(file_id)
+        if job is not None:
+            return job
+
+        # Los archivos de las subidas en lote tienen su propio pool y su propio límite
+        active = sum(1 for job in _jobs.values() if not job.finished and job.batch_id is None)
+        if active >= INGEST_MAX_PENDING:
+            raise JobQueueFull(f"Hay {active} cargas en curso, intente más tarde")
+
+        _prune_finished(_jobs)
+        job = IngestJob(file_id, prune=prune)
+        _jobs[job.id] = job
+
+    # El trabajo conserva el contexto de log de la petición (request_id)
+    _executor.submit(contextvars.copy_context().run, _run, job)
+    logger.info(f"Carga {job.id} encolada para el archivo {file_id}")
+    return job
+
+
+def submit_batch(files: list) -> BatchJob:
+    """
+    Encola la carga de los archivos de una subida en lote y retorna el lote creado.
+    Se cargan hasta INGEST_BATCH_WORKERS archivos al mismo tiempo; los que ya fueron
+    cargados (rows_inserted no es None) no se vuelven a procesar y los que ya tienen
+    una carga en curso se siguen desde esa carga.
+    Lanza JobQueueFull si ya hay INGEST_MAX_BATCHES lotes sin terminar.
+
+    Parámetros:
+        files (list): diccionarios con file_id, filename y rows_inserted de cada archivo
+    """
+    with _lock:
+        active = sum(1 for batch in _batches.values() if not batch.finished)
+        if active >= INGEST_MAX_BATCHES:
+            raise JobQueueFull(f"Hay {active} lotes en curso, intente más tarde")
+
+        _prune_finished(_batches)
+        _prune_finished(_jobs)
+        batch = BatchJob(files)
+        new_jobs = []
+        for file in files:
+            if file["rows_inserted"] is not None or file["file_id"] in batch.jobs:
+                continue
+            job = _unfinished_job(file["file_id"])
+            if job is None:
+                job = IngestJob(file["file_id"], batch_id=batch.id)
+                _jobs[job.id] = job
+                new_jobs.append(job)
+            batch.jobs[file["file_id"]] = job
+        _batches[batch.id] = batch
+
+    context = contextvars.copy_context()
+    for job in new_jobs:
+        _batch_executor.submit(context.copy().run, _run, job)
+    logger.info(
+        f"Lote {batch.id} encolado: {len(new_jobs)} de {len(files)} archivos por cargar",
+        extra={"batch_id": batch.id},
+    )
+    return batch
+
+
+def get_active_job(file_id: int):
+    """Devuelve la carga sin terminar de un archivo, o None."""
+    with _lock:
+        return _unfinished_job(file_id)
+
+
+@contextmanager
+def no_active_job(file_id: int):
+    """
+    Bloque durante el cual no se puede encolar ninguna carga (por ejemplo, para marcar un
+    archivo como eliminado). Lanza FileBusy si el archivo ya tiene una carga sin terminar.
+    """
+    with _lock:
+        if _unfinished_job(file_id) is not None:
+            raise FileBusy("El archivo tiene una carga en curso, intente más tarde")
+        yield
+
+
+def get_job(job_id: str):
+    """Devuelve una carga por su ID, o None si no existe."""
+    return _jobs.get(job_id)
+
+
+def get_batch(batch_id: str):
+    """Devuelve un lote por su ID, o None si no existe."""
+    return _batches.get(batch_id)
@@ -0,0 +1,125 @@
+"""
+Configuración de logs estructurados sin bloquear las peticiones.
+Los handlers de la aplicación solo encolan cada registro (QueueHandler); un hilo
+aparte (QueueListener) los formatea como JSON y los escribe en un archivo que
+rota por tamaño.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.getenv("LOG_DIR", "app/logs")
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_MB = int(os.getenv("LOG_MAX_MB", 10))  # Tamaño a partir del cual se rota el archivo
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))  # Archivos rotados que se conservan
+
+# Campos de contexto (request_id, job_id, file_id...) que se agregan a cada registro
+_log_context = ContextVar("log_context", default={})
+
+# Atributos propios de LogRecord; cualquier otro atributo viene de extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+def bind(**fields):
+    """
+    Agrega campos al contexto de log actual (petición o trabajo).
+    Retorna el token para restaurar el contexto anterior con unbind.
+    """
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def unbind(token):
+    _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copia el contexto actual en el registro antes de encolarlo (el hilo de escritura no lo conoce)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Un objeto JSON por línea con el mensaje, el contexto y los campos de extra={...}."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler que deja el traceback en exc_text para que el formateador JSON lo ponga aparte."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """
+    Configura el logger raíz para escribir en LOG_DIR/LOG_FILE a través de una cola.
+    Se puede llamar varias veces; solo la primera tiene efecto.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        os.path.join(LOG_DIR, LOG_FILE),
+        maxBytes=LOG_MAX_MB * 1024 * 1024,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JSONFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Escribe los registros pendientes y detiene el hilo de escritura."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,50 +1,133 @@
-"""
-Punto de entrada principal del backend.
-Inicializa FastAPI, configura las rutas, CORS, base de datos y logs.
-"""
-
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.routes import files
-import logging
-import os
-
-# Crear instancia de la aplicación
-app = FastAPI(title="Excel Uploader API", version="1.0")
-
-# ⚙️ CORS - permitir orígenes locales
-origins = [
-    "http://localhost:8080",  # Frontend Angular
-    "http://127.0.0.1:8080",
-    "http://localhost:4200",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,  # permite Angular
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Crear todas las tablas (si no existen)
-Base.metadata.create_all(bind=engine)
-
-# Configuración de logs
-LOG_DIR = "app/logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
-logging.basicConfig(
-    filename=f"{LOG_DIR}/app.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
-# Incluir las rutas del módulo de archivos
-app.include_router(files.router, prefix="/files", tags=["Excel Files"])
-
-@app.get("/")
-def root():
-    """Ruta base de bienvenida."""
-    return {"message": "Bienvenido al backend de Excel Uploader"}
+"""
+Punto de entrada principal del backend.
+Inicializa FastAPI, configura las rutas, CORS, base de datos y logs.
+"""
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app import database, ingest, logging_setup, metrics, migrations, purge, utils
+from app.routes import files
+import logging
+import time
+import uuid
+
+# Configuración de logs: JSON por línea, escritos desde un hilo aparte (ver logging_setup)
+logging_setup.setup_logging()
+access_logger = logging.getLogger("app.access")
+logger = logging.getLogger(__name__)
+
+
+def prepare_database():
+    """Espera a que la base de datos responda, crea las tablas que falten y aplica las migraciones."""
+    database.wait_for_database()
+    database.Base.metadata.create_all(bind=database.engine)
+    migrations.upgrade(database.engine)
+
+
+# 🚀 Arranque y apagado: el esquema se prepara aquí y no al importar el módulo
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    await run_in_threadpool(prepare_database)
+    logger.info("Base de datos lista", extra={"duration_ms": round((time.perf_counter() - start) * 1000, 2)})
+    # Retomar las purgas de archivos eliminados que quedaron pendientes
+    pending = await run_in_threadpool(purge.resume_pending)
+    if pending:
+        logger.info(f"Se retomaron {pending} purgas pendientes")
+    yield
+    await run_in_threadpool(ingest.shutdown_parse_workers)
+    await database.dispose_engines()
+
+
+# Crear instancia de la aplicación
+app = FastAPI(title="Excel Uploader API", version="1.0", lifespan=lifespan)
+
+# ⚙️ CORS - permitir orígenes locales
+origins = [
+    "http://localhost:8080",  # Frontend Angular
+    "http://127.0.0.1:8080",
+    "http://localhost:4200",
+]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,  # permite Angular
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Incluir las rutas del módulo de archivos
+app.include_router(files.router, prefix="/files", tags=["Excel Files"])
+
+
+# ⏱️ Identificador, métricas y log de acceso de cada petición
+# (y cabecera Server-Timing si SERVER_TIMING=true)
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    log_token = logging_setup.bind(request_id=request_id)
+    timings = metrics.start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        elapsed = time.perf_counter() - start
+
+        # Se usa la plantilla de la ruta (ej. /files/preview/{file_id}) para no crear una serie por ID
+        route = getattr(request.scope.get("route"), "path", "sin_ruta")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            elapsed, method=request.method, route=route, status=response.status_code
+        )
+        access_logger.info(
+            f"{request.method} {request.url.path} {response.status_code}",
+            extra={
+                "method": request.method,
+                "route": route,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "db_ms": round(timings["db"] * 1000, 2),
+            },
+        )
+    finally:
+        logging_setup.unbind(log_token)
+
+    response.headers["X-Request-ID"] = request_id
+    if metrics.SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing(timings, elapsed)
+    return response
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# 🩺 Sondas para el orquestador: "live" solo indica que el proceso responde;
+# "ready" además comprueba que la base de datos acepta consultas
+@app.get("/health/live", include_in_schema=False)
+def health_live():
+    """El proceso está en marcha y atiende peticiones."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    """El servidor puede atender peticiones que usan la base de datos."""
+    try:
+        await database.check_database()
+    except Exception as e:
+        logger.warning(f"Sonda de disponibilidad fallida: {e}")
+        return JSONResponse(
+            status_code=503,
+            content=utils.response_json("error", "health", "No disponible", "La base de datos no responde"),
+        )
+    return {"status": "ok"}
+
+
+@app.get("/")
+def root():
+    """Ruta base de bienvenida."""
+    return {"message": "Bienvenido al backend de Excel Uploader"}
@@ -0,0 +1,70 @@
+"""
+Comandos de mantenimiento del backend.
+
+Uso:
+    python -m app.manage migrate          # crea tablas y aplica migraciones pendientes
+    python -m app.manage rebuild-totals   # recalcula product_totals desde excel_data
+    python -m app.manage check-totals     # compara product_totals con el GROUP BY real
+"""
+
+import argparse
+import sys
+
+from app import database, migrations, totals
+
+
+def migrate():
+    """Crea las tablas que falten y aplica las migraciones."""
+    from app import models  # noqa: F401 (registra los modelos en Base.metadata)
+
+    database.Base.metadata.create_all(bind=database.engine)
+    migrations.upgrade(database.engine)
+    print("Esquema actualizado.")
+    return 0
+
+
+def rebuild_totals():
+    """Corrige cualquier diferencia recalculando product_totals por completo."""
+    db = database.SessionLocal()
+    try:
+        products = totals.rebuild(db)
+    finally:
+        db.close()
+    print(f"product_totals reconstruida: {products} productos.")
+    return 0
+
+
+def check_totals():
+    """Termina con código 1 si product_totals no coincide con excel_data."""
+    db = database.SessionLocal()
+    try:
+        differences = totals.check(db)
+    finally:
+        db.close()
+
+    if not differences:
+        print("product_totals coincide con excel_data.")
+        return 0
+
+    for producto, detail in sorted(differences.items(), key=lambda item: str(item[0])):
+        print(f"{producto}: materializado={detail['materializado']} real={detail['real']}")
+    print(f"{len(differences)} productos con diferencias. Ejecute 'rebuild-totals' para corregirlas.")
+    return 1
+
+
+COMMANDS = {
+    "migrate": migrate,
+    "rebuild-totals": rebuild_totals,
+    "check-totals": check_totals,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="Mantenimiento del backend")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    return COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
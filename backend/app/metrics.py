@@ -0,0 +1,210 @@
+"""
+Métricas internas en formato de texto de Prometheus.
+Registra histogramas de latencia de las peticiones, de las consultas a la base de
+datos y de cada etapa de la carga de archivos. Se exponen en GET /metrics.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Agregar a cada respuesta la cabecera Server-Timing con el tiempo total y el de base de datos
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Límites (en segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Counter:
+    """Contador acumulado, opcionalmente separado por etiquetas."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+        return lines
+
+
+class Histogram:
+    """Histograma acumulado por buckets, opcionalmente separado por etiquetas."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Todas las métricas registradas en formato de texto de Prometheus."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# ------------------ Métricas de la aplicación ------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP", ("method", "route", "status")
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Duración de las consultas a la base de datos", ("operation",)
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "ingest_stage_duration_seconds", "Duración de cada etapa de la carga de archivos", ("stage",)
+)
+INGEST_JOB_SECONDS = Histogram(
+    "ingest_job_duration_seconds", "Duración total de los trabajos de carga",
+    ("status",), buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+INGEST_ROWS = Counter("ingest_rows_inserted_total", "Filas insertadas en excel_data por los trabajos de carga")
+PURGE_ROWS = Counter("purge_rows_deleted_total", "Filas de archivos eliminados purgadas de excel_data")
+
+
+# ------------------ Etapas de la carga ------------------
+
+@contextmanager
+def stage(name: str, observations: list = None):
+    """
+    Mide una etapa de la carga (read, normalize, validate, convert, db_write, commit...).
+    Si se indica 'observations' la medición se agrega a esa lista en lugar de registrarse,
+    para los procesos del pool que no comparten métricas con el servidor.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if observations is None:
+            INGEST_STAGE_SECONDS.observe(elapsed, stage=name)
+        else:
+            observations.append((name, elapsed))
+
+
+_END = object()
+
+
+def timed_iter(name: str, iterator, observations: list = None):
+    """Recorre un iterador midiendo como etapa el tiempo de obtener cada elemento."""
+    iterator = iter(iterator)
+    while True:
+        with stage(name, observations):
+            item = next(iterator, _END)
+        if item is _END:
+            return
+        yield item
+
+
+def record_stages(observations: list):
+    """Registra las mediciones de etapa devueltas por un proceso del pool."""
+    for name, elapsed in observations:
+        INGEST_STAGE_SECONDS.observe(elapsed, stage=name)
+
+
+# ------------------ Tiempos por petición ------------------
+
+# Tiempos de la petición en curso (se comparte con los hilos del threadpool)
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def start_request() -> dict:
+    """Inicia el registro de tiempos de base de datos para la petición actual."""
+    timings = {"db": 0.0, "db_count": 0}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: dict, elapsed: float) -> str:
+    """Valor de la cabecera Server-Timing (duraciones en milisegundos)."""
+    return (
+        f"app;dur={elapsed * 1000:.1f}, "
+        f'db;dur={timings["db"] * 1000:.1f};desc="{timings["db_count"]} consultas"'
+    )
+
+
+# ------------------ Consultas a la base de datos ------------------
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+# El inicio de cada consulta se guarda en su contexto de ejecución y no en la conexión:
+# una consulta que falla no llama a after_cursor_execute y no deja nada pendiente en el pool
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    DB_QUERY_SECONDS.observe(elapsed, operation=operation if operation in _OPERATIONS else "OTHER")
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["db"] += elapsed
+        timings["db_count"] += 1
@@ -0,0 +1,171 @@
+"""
+Migraciones ligeras del esquema de la base de datos.
+Base.metadata.create_all solo crea las tablas que no existen; aquí se agregan a
+las tablas ya creadas las columnas, índices y llaves foráneas que se incorporaron después.
+Cada paso es idempotente y se puede ejecutar en cada arranque.
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from app import search
+
+logger = logging.getLogger(__name__)
+
+# Columnas agregadas después de la primera versión: (tabla, columna, definición SQL)
+COLUMNS = [
+    ("excel_files", "sha256", "VARCHAR(64) NULL"),
+    ("excel_files", "rows_inserted", "INTEGER NULL"),
+    ("excel_data", "fingerprint", "CHAR(32) NULL"),
+    ("excel_files", "deleted_at", "DATETIME NULL"),
+    ("excel_data", "producto_id", "INTEGER NULL"),
+    ("excel_data", "hoja_id", "INTEGER NULL"),
+]
+
+# Índices agregados después de la primera versión: (tabla, nombre, columnas, único)
+INDEXES = [
+    ("excel_files", "ix_excel_files_sha256", ["sha256"], True),
+    ("excel_data", "ix_excel_data_archivo_id", ["archivo_id"], False),
+    ("excel_data", "ix_excel_data_producto_id_cantidad", ["producto_id", "cantidad"], False),
+    ("excel_data", "uq_excel_data_archivo_fingerprint", ["archivo_id", "fingerprint"], True),
+]
+
+# Llaves foráneas agregadas después:
+# (tabla, nombre, columna, tabla referida, columna referida, acción ON DELETE)
+FOREIGN_KEYS = [
+    ("excel_data", "fk_excel_data_archivo_id", "archivo_id", "excel_files", "id", "CASCADE"),
+    ("excel_data", "fk_excel_data_producto_id", "producto_id", "productos", "id", "RESTRICT"),
+    ("excel_data", "fk_excel_data_hoja_id", "hoja_id", "hojas", "id", "RESTRICT"),
+]
+
+# Columnas de texto de excel_data que pasaron a diccionarios: (columna, diccionario, columna con el código)
+DICTIONARY_COLUMNS = [
+    ("producto", "productos", "producto_id"),
+    ("hoja", "hojas", "hoja_id"),
+]
+
+
+def _backfill_product_totals(conn):
+    """Llena product_totals cuando se crea sobre una base que ya tenía datos."""
+    has_totals = conn.execute(text("SELECT 1 FROM product_totals LIMIT 1")).first()
+    has_data = conn.execute(text("SELECT 1 FROM excel_data LIMIT 1")).first()
+    if has_data and not has_totals:
+        logger.info("Migración: calculando product_totals desde excel_data")
+        conn.execute(text(
+            "INSERT INTO product_totals (producto, total, registros) "
+            "SELECT p.nombre, t.total, t.registros FROM ("
+            "SELECT producto_id, SUM(cantidad) AS total, COUNT(*) AS registros FROM excel_data GROUP BY producto_id"
+            ") t JOIN productos p ON p.id = t.producto_id"
+        ))
+
+
+def _encode_dictionary_columns(conn, inspector):
+    """
+    Pasa los textos de producto y hoja de excel_data a los diccionarios productos y hojas
+    (ver app.dictionaries) y elimina las columnas de texto junto con los índices que las usan.
+    product_totals se vacía para que _backfill_product_totals la vuelva a calcular con los
+    nombres exactos de los diccionarios.
+    """
+    existing = {c["name"] for c in inspector.get_columns("excel_data")}
+    if not existing & {column for column, _, _ in DICTIONARY_COLUMNS}:
+        return
+
+    mysql = conn.dialect.name == "mysql"
+    # En MySQL los diccionarios comparan los nombres en forma binaria (ver models._name_type)
+    binary = " COLLATE utf8mb4_0900_bin" if mysql else ""
+    for column, lookup, code_column in DICTIONARY_COLUMNS:
+        if column not in existing:
+            continue
+        logger.info(f"Migración: pasando excel_data.{column} al diccionario {lookup}")
+        conn.execute(text(
+            f"INSERT INTO {lookup} (nombre) SELECT DISTINCT {column}{binary} FROM excel_data "
+            f"WHERE {column}{binary} NOT IN (SELECT nombre FROM {lookup})"
+        ))
+        conn.execute(text(
+            f"UPDATE excel_data SET {code_column} = "
+            f"(SELECT id FROM {lookup} WHERE {lookup}.nombre = excel_data.{column}{binary})"
+        ))
+
+    search.drop_index(conn)
+    legacy_index = "ix_excel_data_producto_cantidad"
+    if legacy_index in {i["name"] for i in inspector.get_indexes("excel_data")}:
+        conn.execute(text(f"DROP INDEX {legacy_index} ON excel_data" if mysql else f"DROP INDEX {legacy_index}"))
+    for column, _, code_column in DICTIONARY_COLUMNS:
+        if column in existing:
+            conn.execute(text(f"ALTER TABLE excel_data DROP COLUMN {column}"))
+        if mysql:
+            conn.execute(text(f"ALTER TABLE excel_data MODIFY {code_column} INTEGER NOT NULL"))
+
+    if mysql:
+        conn.execute(text("ALTER TABLE product_totals MODIFY producto VARCHAR(255) COLLATE utf8mb4_0900_bin NOT NULL"))
+    conn.execute(text("DELETE FROM product_totals"))
+
+
+def _add_foreign_key(conn, inspector, table, name, column, ref_table, ref_column, on_delete):
+    """
+    Agrega una llave foránea (con la acción ON DELETE indicada) si aún no existe.
+    Si hay filas huérfanas (que apuntan a registros inexistentes) no se agrega y se avisa,
+    para no borrar datos sin revisión.
+    """
+    existing = inspector.get_foreign_keys(table)
+    if any(fk["referred_table"] == ref_table and fk["constrained_columns"] == [column] for fk in existing):
+        return
+
+    # SQLite no permite agregar restricciones a una tabla existente
+    if conn.dialect.name == "sqlite":
+        return
+
+    orphans = conn.execute(text(
+        f"SELECT COUNT(*) FROM {table} t LEFT JOIN {ref_table} r ON t.{column} = r.{ref_column} "
+        f"WHERE r.{ref_column} IS NULL"
+    )).scalar()
+    if orphans:
+        logger.error(
+            f"Migración: no se agregó {name}, hay {orphans} filas en {table} sin registro en {ref_table}. "
+            f"Elimínelas y vuelva a ejecutar 'python -m app.manage migrate'."
+        )
+        return
+
+    logger.info(f"Migración: agregando llave foránea {name}")
+    conn.execute(text(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+        f"REFERENCES {ref_table} ({ref_column}) ON DELETE {on_delete}"
+    ))
+
+
+def upgrade(engine: Engine):
+    """Aplica a la base de datos las columnas, índices y datos derivados que le falten."""
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+
+        for table, column, ddl in COLUMNS:
+            if table not in tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                logger.info(f"Migración: agregando columna {table}.{column}")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+        if "excel_data" in tables:
+            _encode_dictionary_columns(conn, inspector)
+
+        for table, name, columns, unique in INDEXES:
+            if table not in tables:
+                continue
+            existing = {i["name"] for i in inspector.get_indexes(table)}
+            if name not in existing:
+                logger.info(f"Migración: creando índice {name}")
+                kind = "UNIQUE INDEX" if unique else "INDEX"
+                conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+
+        for table, name, column, ref_table, ref_column, on_delete in FOREIGN_KEYS:
+            if {table, ref_table} <= tables:
+                _add_foreign_key(conn, inspector, table, name, column, ref_table, ref_column, on_delete)
+
+        if {"product_totals", "excel_data"} <= tables:
+            _backfill_product_totals(conn)
+
+        if "excel_data" in tables:
+            search.ensure_index(conn)
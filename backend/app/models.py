@@ -1,38 +1,112 @@
-# backend/app/models.py
-"""
-Definición de los modelos de la base de datos con SQLAlchemy.
-Aquí se representan las tablas principales del sistema.
-"""
-
-from sqlalchemy import Column, Integer, String, DateTime, func
-from app.database import Base
-
-# Modelo que representa los metadatos de los archivos Excel subidos
-class ExcelFile(Base):
-    """
-    Modelo para almacenar metadatos de los archivos Excel subidos.
-    """
-    __tablename__ = "excel_files"
-
-    id = Column(Integer, primary_key=True, index=True)
-    filename = Column(String(255), nullable=False)
-    filepath = Column(String(500), nullable=False)
-    filesize = Column(Integer, nullable=False)
-    filetype = Column(String(255), nullable=False)
-    upload_date = Column(DateTime(timezone=True), server_default=func.now())
-
-# Modelo que representa cada fila de datos proveniente de un Excel
-class ExcelData(Base):
-    """
-    Modelo para almacenar los datos de cada fila de los Excel validados.
-    """
-    __tablename__ = "excel_data"
-
-    id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String(255), nullable=False)
-    direccion = Column(String(255), nullable=False)
-    telefono = Column(String(100), nullable=False)
-    producto = Column(String(255), nullable=False)
-    cantidad = Column(Integer, nullable=False)
-    hoja = Column(String(100), nullable=False)  # nombre de la hoja de Excel
-    archivo_id = Column(Integer, nullable=False)
+# backend/app/models.py
+"""
+Definición de los modelos de la base de datos con SQLAlchemy.
+Aquí se representan las tablas principales del sistema.
+"""
+
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer, String, DateTime, func, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import column_property
+from app.database import Base
+
+
+def _name_type(length: int):
+    """
+    Texto de un diccionario. En MySQL usa intercalación binaria, para que dos nombres que
+    solo difieren en mayúsculas o tildes sean entradas distintas, igual que en Python.
+    """
+    return String(length).with_variant(mysql.VARCHAR(length, collation="utf8mb4_0900_bin"), "mysql")
+
+# Modelo que representa los metadatos de los archivos Excel subidos
+class ExcelFile(Base):
+    """
+    Modelo para almacenar metadatos de los archivos Excel subidos.
+    """
+    __tablename__ = "excel_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), nullable=False)
+    filepath = Column(String(500), nullable=False)
+    filesize = Column(Integer, nullable=False)
+    filetype = Column(String(255), nullable=False)
+    sha256 = Column(String(64), unique=True, index=True)  # hash del contenido (deduplicación)
+    rows_inserted = Column(Integer)  # filas cargadas en excel_data (None si aún no se insertó)
+    upload_date = Column(DateTime(timezone=True), server_default=func.now())
+    deleted_at = Column(DateTime(timezone=True))  # marcado como eliminado; sus filas esperan la purga (ver app.purge)
+
+# Diccionarios de los textos que se repiten en excel_data (ver app.dictionaries)
+class Producto(Base):
+    """
+    Nombres de producto; excel_data guarda solo su código (producto_id).
+    """
+    __tablename__ = "productos"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(_name_type(255), nullable=False, unique=True)
+
+
+class Hoja(Base):
+    """
+    Nombres de hoja de Excel; excel_data guarda solo su código (hoja_id).
+    """
+    __tablename__ = "hojas"
+
+    id = Column(Integer, primary_key=True)
+    nombre = Column(_name_type(100), nullable=False, unique=True)
+
+
+# Modelo que representa cada fila de datos proveniente de un Excel
+class ExcelData(Base):
+    """
+    Modelo para almacenar los datos de cada fila de los Excel validados.
+    Producto y hoja se guardan como códigos de sus diccionarios; los atributos 'producto'
+    y 'hoja' devuelven el texto (solo lectura: se escriben con app.dictionaries).
+    """
+    __tablename__ = "excel_data"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nombre = Column(String(255), nullable=False)
+    direccion = Column(String(255), nullable=False)
+    telefono = Column(String(100), nullable=False)
+    producto_id = Column(Integer, ForeignKey("productos.id", name="fk_excel_data_producto_id"), nullable=False)
+    cantidad = Column(Integer, nullable=False)
+    hoja_id = Column(Integer, ForeignKey("hojas.id", name="fk_excel_data_hoja_id"), nullable=False)  # hoja de Excel
+    archivo_id = Column(
+        Integer,
+        ForeignKey("excel_files.id", ondelete="CASCADE", name="fk_excel_data_archivo_id"),
+        nullable=False,
+        index=True,
+    )
+    # Huella del contenido de la fila en su archivo (ver app.fingerprints); None en filas creadas a mano
+    fingerprint = Column(String(32))
+
+    producto = column_property(
+        select(Producto.nombre).where(Producto.id == producto_id).correlate_except(Producto).scalar_subquery()
+    )
+    hoja = column_property(
+        select(Hoja.nombre).where(Hoja.id == hoja_id).correlate_except(Hoja).scalar_subquery()
+    )
+
+    __table_args__ = (
+        # Índice que cubre la agregación por producto (SUM(cantidad) ... GROUP BY producto_id)
+        Index("ix_excel_data_producto_id_cantidad", "producto_id", "cantidad"),
+        # Una misma fila del libro no se guarda dos veces en el mismo archivo
+        Index("uq_excel_data_archivo_fingerprint", "archivo_id", "fingerprint", unique=True),
+        # Búsqueda de texto (solo MySQL; en SQLite se usa una tabla FTS5, ver app.search)
+        Index("ft_excel_data_search", "nombre", "direccion", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        # En SQLite, IDs que no se reutilizan tras una purga: el índice FTS5 solo indexa los
+        # IDs mayores que el último indexado (ver app.search.index_new_rows)
+        {"sqlite_autoincrement": True},
+    )
+
+# Modelo con los totales por producto que consume el gráfico
+class ProductTotal(Base):
+    """
+    Totales materializados por producto (suma de cantidad y cantidad de registros).
+    Se actualizan en las mismas transacciones que modifican excel_data.
+    """
+    __tablename__ = "product_totals"
+
+    producto = Column(_name_type(255), primary_key=True)
+    total = Column(BigInteger, nullable=False, default=0)
+    registros = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,165 @@
+"""
+Purga en segundo plano de los archivos eliminados.
+DELETE /files/{file_id} solo marca el archivo (ver crud.mark_excel_file_deleted), de modo
+que deja de verse de inmediato. Aquí se eliminan después sus filas de excel_data por
+rangos de llave primaria, en transacciones cortas que no bloquean a las demás
+escrituras, y al final su registro y el archivo físico.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import crud, database, logging_setup, metrics, snapshots
+
+# Filas eliminadas por transacción
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 5000))
+# Pausa entre bloques (ms), para dejar pasar las cargas y consultas de los usuarios
+PURGE_PAUSE_MS = int(os.getenv("PURGE_PAUSE_MS", 20))
+# Purgas terminadas que se conservan en memoria para poder consultarlas
+PURGE_MAX_FINISHED = int(os.getenv("PURGE_MAX_FINISHED", 200))
+
+logger = logging.getLogger(__name__)
+
+# Un solo hilo: las purgas se ejecutan de a una, en el orden en que se eliminaron los archivos
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="purge")
+_purges = {}  # file_id -> PurgeJob
+_lock = threading.Lock()
+
+
+class PurgeJob:
+    """Purga de las filas y el archivo físico de un archivo eliminado."""
+
+    def __init__(self, file_id: int, filepath: str, rows_total: int = None):
+        self.file_id = file_id
+        self.filepath = filepath  # ruta a la que se movió el archivo físico al eliminarlo
+        self.status = "pending"  # pending | running | completed | failed
+        self.message = None
+        self.rows_total = rows_total
+        self.rows_deleted = 0
+        self.batches = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def elapsed(self):
+        """Segundos de ejecución (hasta ahora si la purga sigue en curso)."""
+        if self.started_at is None:
+            return None
+        end = self.finished_at or time.time()
+        return round(end - self.started_at, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "file_id": self.file_id,
+            "status": self.status,
+            "message": self.message,
+            "rows_total": self.rows_total,
+            "rows_deleted": self.rows_deleted,
+            "rows_remaining": None if self.rows_total is None else max(self.rows_total - self.rows_deleted, 0),
+            "batches": self.batches,
+            "elapsed": self.elapsed(),
+        }
+
+
+def trash_path(file_id: int, filepath: str) -> str:
+    """
+    Ruta a la que se mueve el archivo físico al eliminarlo. Queda oculta en la misma carpeta
+    y libera la ruta por hash, por si el mismo contenido se vuelve a subir antes de la purga.
+    """
+    directory, name = os.path.split(filepath)
+    return os.path.join(directory, f".deleted-{file_id}-{name}")
+
+
+def _run(job: PurgeJob):
+    """Elimina las filas del archivo por bloques, luego su registro y su archivo físico."""
+    logging_setup.bind(file_id=job.file_id)
+    job.status = "running"
+    job.started_at = time.time()
+    db = database.SessionLocal()
+    try:
+        if job.rows_total is None:
+            job.rows_total = crud.count_excel_data(db, job.file_id)
+
+        after_id = 0
+        while after_id is not None:
+            after_id, deleted = crud.purge_excel_data_batch(db, job.file_id, after_id, PURGE_BATCH_SIZE)
+            job.rows_deleted += deleted
+            job.batches += 1
+            metrics.PURGE_ROWS.inc(deleted)
+            if after_id is not None and PURGE_PAUSE_MS:
+                time.sleep(PURGE_PAUSE_MS / 1000)
+
+        crud.delete_purged_excel_file(db, job.file_id)
+        snapshots.delete_snapshot(job.filepath)
+        if os.path.exists(job.filepath):
+            os.remove(job.filepath)
+        job.status = "completed"
+        job.message = f"Se eliminaron {job.rows_deleted} registros."
+    except Exception as e:
+        db.rollback()
+        job.status = "failed"
+        job.message = f"Error en la purga: {e}"
+        logger.exception(f"Purga del archivo {job.file_id} fallida")
+    finally:
+        db.close()
+        job.finished_at = time.time()
+        logger.info(
+            f"Purga del archivo {job.file_id} terminada: {job.status}",
+            extra={"status": job.status, "rows": job.rows_deleted, "duration_ms": round(job.elapsed() * 1000, 2)},
+        )
+
+
+def _prune_finished():
+    """Descarta las purgas terminadas más antiguas para acotar la memoria."""
+    finished = [job for job in _purges.values() if job.finished]
+    for job in sorted(finished, key=lambda j: j.finished_at)[:-PURGE_MAX_FINISHED or None]:
+        del _purges[job.file_id]
+
+
+# ------------------ API pública ------------------
+
+def submit(file_id: int, filepath: str, rows_total: int = None) -> PurgeJob:
+    """
+    Encola la purga de un archivo ya marcado como eliminado y retorna la tarea creada.
+    Si el archivo ya tiene una purga sin terminar, retorna esa misma tarea.
+    """
+    with _lock:
+        job = _purges.get(file_id)
+        if job is not None and not job.finished:
+            return job
+        _prune_finished()
+        job = PurgeJob(file_id, filepath, rows_total)
+        _purges[file_id] = job
+
+    # La purga conserva el contexto de log de la petición (request_id)
+    _executor.submit(contextvars.copy_context().run, _run, job)
+    logger.info(f"Purga encolada para el archivo {file_id}")
+    return job
+
+
+def resume_pending() -> int:
+    """
+    Encola las purgas de los archivos marcados como eliminados que quedaron sin terminar
+    (por ejemplo, si el servidor se reinició durante una purga). Retorna las purgas encoladas.
+    """
+    db = database.SessionLocal()
+    try:
+        pending = [(f.id, f.filepath) for f in crud.get_deleted_excel_files(db)]
+    finally:
+        db.close()
+    for file_id, filepath in pending:
+        submit(file_id, filepath)
+    return len(pending)
+
+
+def get_purge(file_id: int):
+    """Devuelve la purga de un archivo, o None si no existe."""
+    return _purges.get(file_id)
@@ -0,0 +1,158 @@
+"""
+Lectura en streaming de libros Excel.
+Recorre las hojas fila por fila con openpyxl en modo read_only y entrega lotes
+de tamaño fijo, de modo que la memoria usada no depende del tamaño del archivo.
+
+pandas y openpyxl se importan al abrir el primer libro y no al importar el módulo,
+para que el servidor arranque sin cargarlos.
+"""
+
+import os
+from itertools import islice
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Filas por lote entregado a la validación e inserción
+READ_BATCH_SIZE = int(os.getenv("READ_BATCH_SIZE", 5000))
+
+
+def _build_header(values) -> list:
+    """
+    Arma los nombres de columnas a partir de la fila de encabezados.
+    Igual que pandas: las celdas vacías se llaman 'Unnamed: N' y los repetidos llevan sufijo '.N'.
+    """
+    header = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else value
+        key = str(name)
+        if key in seen:
+            seen[key] += 1
+            name = f"{key}.{seen[key]}"
+        else:
+            seen[key] = 0
+        header.append(name)
+    return header
+
+
+class WorkbookReader:
+    """
+    Lector de un libro Excel hoja por hoja.
+
+    Los .xlsx/.xlsm se leen en streaming con openpyxl (read_only=True, values_only=True).
+    Los .xls antiguos no son compatibles con openpyxl y se leen completos con pandas.
+    """
+
+    def __init__(self, filepath: str, batch_size: int = None):
+        self.filepath = filepath
+        self.batch_size = batch_size or READ_BATCH_SIZE
+        self._workbook = None
+        self._frames = None
+
+        if filepath.lower().endswith(".xls"):
+            import pandas as pd
+            self._frames = pd.read_excel(filepath, sheet_name=None, dtype=object)
+            self.sheet_names = list(self._frames.keys())
+        else:
+            from openpyxl import load_workbook
+            self._workbook = load_workbook(filepath, read_only=True, data_only=True)
+            self.sheet_names = list(self._workbook.sheetnames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Libera el archivo abierto por openpyxl."""
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def estimate_rows(self, sheet_name: str):
+        """
+        Estima las filas de datos de una hoja sin recorrerla, usando las dimensiones
+        guardadas en el archivo. Retorna None si el archivo no las incluye.
+        """
+        if self._frames is not None:
+            return len(self._frames[sheet_name])
+
+        worksheet = self._workbook[sheet_name]
+        if not worksheet.max_row:
+            return None
+        return max(worksheet.max_row - (worksheet.min_row or 1), 0)
+
+    def iter_batches(self, sheet_name: str, max_rows: int = None):
+        """
+        Genera lotes de la hoja como DataFrames con los encabezados originales.
+
+        Siempre genera al menos un lote: si la hoja no tiene filas de datos, el
+        primer lote está vacío (solo con las columnas, o sin ellas si no hay encabezado).
+        El índice de cada lote es el número de fila en el Excel.
+
+        Parámetros:
+            sheet_name (str): hoja a recorrer
+            max_rows (int, opcional): cantidad máxima de filas de datos a leer
+        """
+        import pandas as pd
+
+        if self._frames is not None:
+            rows = self._iter_frame_rows(self._frames[sheet_name])
+        else:
+            rows = self._iter_sheet_rows(self._workbook[sheet_name])
+
+        if max_rows is not None:
+            rows = islice(rows, max_rows + 1)  # +1 por la fila de encabezados
+
+        # La primera fila no vacía contiene los encabezados
+        first = next(rows, None)
+        if first is None:
+            yield pd.DataFrame()
+            return
+        header = _build_header(first[1])
+        width = len(header)
+
+        emitted = False
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            index = [number for number, _ in batch]
+            data = [_fit(values, width) for _, values in batch]
+            yield pd.DataFrame(data, columns=header, index=index, dtype=object)
+            emitted = True
+
+        if not emitted:
+            yield pd.DataFrame(columns=header, dtype=object)
+
+    @staticmethod
+    def _iter_sheet_rows(worksheet):
+        """Genera (número de fila, valores) omitiendo las filas totalmente vacías."""
+        for number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            if any(v is not None and v != "" for v in values):
+                yield number, values
+
+    @staticmethod
+    def _iter_frame_rows(df: "pd.DataFrame"):
+        """Adapta una hoja ya leída por pandas al mismo formato de filas."""
+        yield 1, tuple(df.columns)
+        frame = df.astype(object).where(df.notna(), None)
+        for number, values in enumerate(frame.itertuples(index=False, name=None), start=2):
+            yield number, values
+
+
+def _fit(values: tuple, width: int) -> tuple:
+    """Ajusta una fila al número de columnas del encabezado."""
+    if len(values) == width:
+        return values
+    if len(values) > width:
+        return values[:width]
+    return values + (None,) * (width - len(values))
+
+
+def open_workbook(filepath: str, batch_size: int = None) -> WorkbookReader:
+    """Abre un libro Excel para leerlo hoja por hoja en lotes."""
+    return WorkbookReader(filepath, batch_size=batch_size)
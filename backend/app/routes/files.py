@@ -1,369 +1,967 @@
-"""
-Rutas para la gestión de archivos Excel:
-- Subir y validar archivos Excel (.xls, .xlsx)
-- Leer las hojas y validar columnas
-- Insertar datos en la base de datos
-- Listar y eliminar archivos
-"""
-
-import os
-import pandas as pd
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app import crud, schemas, utils
-from dotenv import load_dotenv
-import shutil
-import time
-import logging
-from app.schemas import ExcelDataCreate, ExcelDataResponse, APIResponse
-from app.crud import (
-    get_all_excel_data,
-    get_excel_data_by_id,
-    create_excel_data,
-    update_excel_data,
-    delete_excel_data
-)
-
-# Cargar variables del archivo .env ubicado en el proyecto raíz
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "../../../.env"))
-
-# Configuración de la carpeta donde se guardan los archivos subidos
-UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "/app/uploads")
-MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 10))  # Tamaño máximo permitido (MB)
-ALLOWED_EXTENSIONS = os.getenv("ALLOWED_EXTENSIONS", "xls,xlsx").split(",")  # Extensiones válidas
-
-# Crear carpeta si no existe
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# Crear router para definir las rutas del módulo
-router = APIRouter()
-logger = logging.getLogger(__name__)  # Configurar logger para registrar eventos
-
-
-# ================================
-# Funciones auxiliares internas
-# ================================
-
-def allowed_file(filename: str) -> bool:
-    """Verifica que el archivo tenga una extensión válida."""
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
-
-
-def get_file_size_mb(file_path: str) -> float:
-    """Devuelve el tamaño de un archivo en MB."""
-    size_bytes = os.path.getsize(file_path)
-    return size_bytes / (1024 * 1024)
-
-
-def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Normaliza los nombres de columnas (quita espacios y pasa a minúsculas).
-    Evita errores al comparar nombres de columnas.
-    """
-    new_cols = []
-    for c in df.columns:
-        # Convertir a string, limpiar espacios y pasar a minúsculas
-        try:
-            c_str = str(c).strip().lower()
-        except Exception:
-            c_str = str(c)
-        new_cols.append(c_str)
-    df.columns = new_cols
-    return df
-
-
-# ================================
-# ENDPOINTS PRINCIPALES
-# ================================
-
-@router.post("/upload", response_model=schemas.APIResponse)
-async def upload_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Sube un archivo Excel, valida su tamaño y lo registra en la base de datos."""
-
-    # Validar extensión del archivo
-    if not allowed_file(file.filename):
-        raise HTTPException(status_code=400, detail="Solo se permiten archivos .xls o .xlsx")
-
-    # Guardar archivo temporalmente en la carpeta de uploads
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Verificar que el archivo no exceda el tamaño permitido
-    if get_file_size_mb(file_path) > MAX_FILE_SIZE_MB:
-        os.remove(file_path)
-        raise HTTPException(status_code=400, detail="El archivo excede el tamaño máximo permitido")
-
-    # Registrar metadatos del archivo en la base de datos
-    new_file = schemas.ExcelFileCreate(
-        filename=file.filename,
-        filepath=file_path,
-        filesize=int(os.path.getsize(file_path)),
-        filetype=file.content_type,
-    )
-    db_file = crud.create_excel_file(db, new_file)
-
-    logger.info(f"Archivo subido correctamente: {file.filename}")
-
-    # Retornar respuesta exitosa
-    return utils.response_json(
-        status="success",
-        type="upload",
-        title="Subida exitosa",
-        message=f"Archivo '{file.filename}' subido correctamente.",
-        data={"file_id": db_file.id, "filename": db_file.filename},
-    )
-
-
-@router.get("/preview/{file_id}")
-def preview_excel(file_id: int, db: Session = Depends(get_db)):
-    """Lee el contenido del Excel y valida las hojas y columnas requeridas."""
-
-    # Obtener archivo desde la base de datos
-    db_file = crud.get_excel_file(db, file_id)
-    if not db_file:
-        raise HTTPException(status_code=404, detail="Archivo no encontrado")
-
-    # Leer todas las hojas del Excel
-    try:
-        excel_data = pd.read_excel(db_file.filepath, sheet_name=None)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error leyendo Excel: {e}")
-
-    # Columnas que deben existir en cada hoja
-    required_columns = ["nombre", "direccion", "telefono", "producto", "cantidad"]
-    result = {}
-
-    # Validar cada hoja del archivo
-    for sheet_name, df in excel_data.items():
-        # Ignorar hojas vacías
-        if df is None or df.empty:
-            result[sheet_name] = {"mensaje": "La hoja no contiene datos", "datos": []}
-            continue
-
-        # Normalizar nombres de columnas y validar
-        df = _normalize_columns(df)
-
-        try:
-            utils.validate_excel_columns(df.columns.tolist(), required_columns)
-            # Mantener solo columnas requeridas y reemplazar valores nulos
-            df = df[required_columns].fillna("")
-            # Mostrar primeros 10 registros
-            result[sheet_name] = {
-                "mensaje": "Hoja válida",
-                "datos": df.head(10).to_dict(orient="records"),
-            }
-        except HTTPException as e:
-            result[sheet_name] = {"mensaje": str(e.detail), "datos": []}
-
-    # Formatear resultado final
-    formatted_result = [
-        {"nombre": sheet, "mensaje": info["mensaje"], "datos": info["datos"]}
-        for sheet, info in result.items()
-    ]
-
-    return formatted_result
-
-
-@router.post("/insert/{file_id}", response_model=schemas.APIResponse)
-def insert_excel_data(file_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    """Inserta los datos del Excel validado en la base de datos."""
-
-    # Buscar archivo en base de datos
-    db_file = crud.get_excel_file(db, file_id)
-    if not db_file:
-        raise HTTPException(status_code=404, detail="Archivo no encontrado")
-
-    # Leer contenido del Excel
-    try:
-        excel_data = pd.read_excel(db_file.filepath, sheet_name=None)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error leyendo Excel: {e}")
-
-    required_columns = ["nombre", "direccion", "telefono", "producto", "cantidad"]
-    total_inserted = 0  # Contador de registros insertados
-
-    # Recorrer cada hoja del archivo
-    for sheet_name, df in excel_data.items():
-        if df is None or df.empty:
-            continue
-
-        df = _normalize_columns(df)
-
-        try:
-            utils.validate_excel_columns(df.columns.tolist(), required_columns)
-            df = df[required_columns].fillna("")
-
-            data_objects = []  # Lista de objetos a insertar
-            for _, row in df.iterrows():
-                # Convertir valores y evitar errores de tipo
-                telefono_val = row.get("telefono", "")
-                telefono_val = "" if pd.isna(telefono_val) else str(telefono_val)
-
-                cantidad_val = row.get("cantidad", 0)
-                try:
-                    cantidad_int = int(cantidad_val)
-                except Exception:
-                    try:
-                        cantidad_int = int(float(cantidad_val))
-                    except Exception:
-                        cantidad_int = 0
-
-                # Crear objeto con los datos procesados
-                data_obj = schemas.ExcelDataCreate(
-                    nombre=str(row.get("nombre", "")),
-                    direccion=str(row.get("direccion", "")),
-                    telefono=telefono_val,
-                    producto=str(row.get("producto", "")),
-                    cantidad=cantidad_int,
-                    hoja=sheet_name,
-                    archivo_id=file_id,
-                )
-                data_objects.append(data_obj)
-
-            # Insertar datos validados en la base de datos
-            if data_objects:
-                inserted = crud.insert_excel_data(db, data_objects)
-                total_inserted += inserted
-
-        except HTTPException as e:
-            logger.warning(f"Hoja '{sheet_name}' inválida: {e.detail}")
-            continue
-
-    logger.info(f"{total_inserted} registros insertados del archivo {db_file.filename}")
-
-    # Proceso de carga de insercion de excel a base de datos
-    for progress in range(0, 101, 20):
-        time.sleep(0.1)
-        logger.info(f"Progreso de inserción: {progress}%")
-
-    # Retornar respuesta final
-    return utils.response_json(
-        status="success",
-        type="insert",
-        title="Carga completada",
-        message=f"Se insertaron {total_inserted} registros correctamente.",
-        data={"total_inserted": total_inserted},
-    )
-
-
-@router.get("/", response_model=schemas.APIResponse)
-def list_uploaded_files(db: Session = Depends(get_db)):
-    """Devuelve la lista de archivos Excel registrados."""
-    files = crud.get_all_excel_files(db)
-    serialized_files = [
-        schemas.ExcelFileResponse.model_validate(f, from_attributes=True) for f in files
-    ]
-
-    return utils.response_json(
-        status="success",
-        type="list",
-        title="Archivos registrados",
-        message="Lista de archivos cargados",
-        data={"files": serialized_files},
-    )
-
-
-@router.delete("/{file_id}", response_model=schemas.APIResponse)
-def delete_excel_file(file_id: int, db: Session = Depends(get_db)):
-    """Elimina un archivo Excel de la base de datos y del sistema."""
-    db_file = crud.get_excel_file(db, file_id)
-    if not db_file:
-        raise HTTPException(status_code=404, detail="Archivo no encontrado")
-
-    file_path = db_file.filepath
-    deleted = crud.delete_excel_file(db, file_id)
-
-    # Eliminar archivo físico si existe
-    if deleted and os.path.exists(file_path):
-        os.remove(file_path)
-
-    return utils.response_json(
-        status="success",
-        type="delete",
-        title="Eliminación completada",
-        message=f"Archivo '{db_file.filename}' eliminado correctamente.",
-    )
-
-
-@router.get("/chart", response_model=schemas.APIResponse)
-def get_chart_data(db: Session = Depends(get_db)):
-    """Devuelve datos agregados para gráficos de productos."""
-    try:
-        data = crud.get_chart_data(db)
-        return utils.response_json(
-            status="success",
-            type="chart",
-            title="Datos para el gráfico",
-            message="Datos agregados obtenidos correctamente",
-            data={"chart": data},
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener datos del gráfico: {e}")
-
-# ================================
-# CRUD manual para ExcelData
-# ================================
-
-@router.get("/data", response_model=APIResponse)
-def list_excel_data(db: Session = Depends(get_db)):
-    """Lista todos los registros de ExcelData."""
-    data = get_all_excel_data(db)
-    serialized = [ExcelDataResponse.model_validate(d, from_attributes=True) for d in data]
-
-    return utils.response_json(
-        status="success",
-        type="list",
-        title="Datos cargados",
-        message="Lista de registros en ExcelData",
-        data={"items": serialized}
-    )
-
-
-@router.post("/data", response_model=APIResponse)
-def create_excel_data_endpoint(payload: ExcelDataCreate, db: Session = Depends(get_db)):
-    """Crea un nuevo registro en ExcelData."""
-    new_data = create_excel_data(db, payload)
-    serialized = ExcelDataResponse.model_validate(new_data, from_attributes=True)
-
-    return utils.response_json(
-        status="success",
-        type="create",
-        title="Registro creado",
-        message="Nuevo registro agregado correctamente",
-        data={"item": serialized}
-    )
-
-
-@router.put("/data/{data_id}", response_model=APIResponse)
-def update_excel_data_endpoint(data_id: int, payload: ExcelDataCreate, db: Session = Depends(get_db)):
-    """Actualiza un registro existente en ExcelData."""
-    updated = update_excel_data(db, data_id, payload)
-    if not updated:
-        raise HTTPException(status_code=404, detail="Registro no encontrado")
-
-    serialized = ExcelDataResponse.model_validate(updated, from_attributes=True)
-
-    return utils.response_json(
-        status="success",
-        type="update",
-        title="Registro actualizado",
-        message="Registro modificado correctamente",
-        data={"item": serialized}
-    )
-
-
-@router.delete("/data/{data_id}", response_model=APIResponse)
-def delete_excel_data_endpoint(data_id: int, db: Session = Depends(get_db)):
-    """Elimina un registro de ExcelData por su ID."""
-    deleted = delete_excel_data(db, data_id)
-    if not deleted:
-        raise HTTPException(status_code=404, detail="Registro no encontrado")
-
-    return utils.response_json(
-        status="success",
-        type="delete",
-        title="Registro eliminado",
-        message="Registro eliminado correctamente"
-    )
+"""
+Rutas para la gestión de archivos Excel:
+- Subir y validar archivos Excel (.xls, .xlsx), uno por uno o en lote (varios archivos o un ZIP)
+- Leer las hojas y validar columnas
+- Insertar datos en la base de datos
+- Listar, reemplazar (nueva versión del libro) y eliminar archivos
+"""
+
+import hashlib
+import mimetypes
+import os
+import uuid
+import zipfile
+from typing import TYPE_CHECKING, List
+import anyio
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import get_async_db, get_db
+from app import cache, crud, crud_async, database, export, ingest, jobs, purge, reader, schemas, search, snapshots, utils
+import logging
+from app.schemas import ExcelDataBatch, ExcelDataCreate, ExcelDataResponse, APIResponse
+from app.crud_async import (
+    get_excel_data_page,
+    search_excel_data,
+    get_excel_data_by_id,
+    create_excel_data,
+    update_excel_data,
+    delete_excel_data,
+    apply_excel_data_batch
+)
+
+if TYPE_CHECKING:
+    import pandas as pd  # pandas se importa al leer el primer libro (ver app.reader)
+
+# Configuración de la carpeta donde se guardan los archivos subidos
+# (las variables del .env de la raíz ya las cargó app.database)
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "/app/uploads")
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 300))  # Tamaño máximo permitido (MB)
+MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bloques de 1 MB al guardar el archivo subido
+PREVIEW_ROWS = 10  # Filas que se muestran por hoja en la previsualización (por defecto)
+PREVIEW_MAX_ROWS = 1000  # Máximo de filas por hoja que se pueden pedir en la previsualización
+PREVIEW_CACHE_MAX_MB = int(os.getenv("PREVIEW_CACHE_MAX_MB", 32))  # Memoria para previsualizaciones
+DATA_PAGE_SIZE = int(os.getenv("DATA_PAGE_SIZE", 100))  # Registros por página en /data (por defecto)
+DATA_MAX_PAGE_SIZE = int(os.getenv("DATA_MAX_PAGE_SIZE", 1000))  # Máximo de registros por página en /data
+ALLOWED_EXTENSIONS = os.getenv("ALLOWED_EXTENSIONS", "xls,xlsx").split(",")  # Extensiones válidas
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 100))  # Libros por subida en lote (sueltos o dentro de ZIP)
+BATCH_MAX_ZIP_MB = int(os.getenv("BATCH_MAX_ZIP_MB", 2048))  # Tamaño máximo de cada ZIP (MB)
+DATA_BATCH_MAX_ITEMS = int(os.getenv("DATA_BATCH_MAX_ITEMS", 5000))  # Elementos por edición en lote de /data
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", 10000))  # Resultados que se pueden saltar en /data/search
+
+# Crear carpeta si no existe
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Crear router para definir las rutas del módulo
+router = APIRouter()
+preview_cache = cache.LRUCache(max_bytes=PREVIEW_CACHE_MAX_MB * 1024 * 1024)
+logger = logging.getLogger(__name__)  # Configurar logger para registrar eventos
+
+
+# ================================
+# Funciones auxiliares internas
+# ================================
+
+def allowed_file(filename: str) -> bool:
+    """Verifica que el archivo tenga una extensión válida."""
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+async def _save_upload(file: UploadFile, max_bytes: int = MAX_FILE_SIZE_BYTES):
+    """
+    Copia el archivo subido a un archivo temporal '.part' por bloques, calculando su SHA-256.
+    El temporal se elimina si se excede el tamaño máximo.
+
+    Retorna:
+        tuple (ruta del temporal, tamaño en bytes, hash SHA-256 en hexadecimal)
+    """
+    partial_path = os.path.join(UPLOAD_FOLDER, f".{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+
+    try:
+        async with await anyio.open_file(partial_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=400, detail="El archivo excede el tamaño máximo permitido")
+                sha256.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        await anyio.to_thread.run_sync(_remove_file, partial_path)
+        raise
+
+    return partial_path, size, sha256.hexdigest()
+
+
+def _register_upload(db: Session, file: UploadFile, partial_path: str, filesize: int, sha256: str):
+    """
+    Guarda el archivo subido bajo su hash y lo registra en la base de datos.
+    Si ya existe un archivo con el mismo contenido, se reutiliza su registro.
+
+    Retorna:
+        tuple (registro ExcelFile, True si se creó un registro nuevo)
+    """
+    existing = crud.get_excel_file_by_hash(db, sha256)
+    if existing:
+        _keep_existing(existing, partial_path)
+        return existing, False
+
+    file_path = _stored_path(file.filename, sha256)
+    os.replace(partial_path, file_path)
+
+    new_file = schemas.ExcelFileCreate(
+        filename=file.filename,
+        filepath=file_path,
+        filesize=filesize,
+        filetype=file.content_type,
+        sha256=sha256,
+    )
+    try:
+        return crud.create_excel_file(db, new_file), True
+    except IntegrityError:
+        # Otra petición registró el mismo contenido al mismo tiempo
+        db.rollback()
+        return crud.get_excel_file_by_hash(db, sha256), False
+
+
+def _replace_upload(db: Session, file_id: int, file: UploadFile, partial_path: str, filesize: int, sha256: str):
+    """
+    Guarda la nueva versión del libro bajo su hash y actualiza el registro del archivo.
+    La versión anterior (y su copia columnar) se elimina del disco.
+
+    Retorna:
+        tuple (registro ExcelFile, True si el contenido cambió)
+    """
+    db_file = crud.get_excel_file(db, file_id)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    if jobs.get_active_job(file_id) is not None:
+        raise HTTPException(status_code=409, detail="El archivo tiene una carga en curso, intente más tarde")
+
+    if db_file.sha256 == sha256:
+        _keep_existing(db_file, partial_path)
+        return db_file, False
+
+    other = crud.get_excel_file_by_hash(db, sha256)
+    if other:
+        raise HTTPException(status_code=409, detail=f"El contenido ya fue subido como el archivo {other.id} ('{other.filename}')")
+
+    old_path = db_file.filepath
+    file_path = _stored_path(file.filename, sha256)
+    os.replace(partial_path, file_path)
+    new_file = schemas.ExcelFileCreate(
+        filename=file.filename,
+        filepath=file_path,
+        filesize=filesize,
+        filetype=file.content_type,
+        sha256=sha256,
+    )
+    try:
+        db_file = crud.replace_excel_file(db, file_id, new_file)
+    except IntegrityError:
+        # Otra petición registró el mismo contenido al mismo tiempo (y usa la misma ruta)
+        db.rollback()
+        raise HTTPException(status_code=409, detail="El contenido ya fue subido como otro archivo")
+
+    preview_cache.discard(lambda key: key[0] == file_id)
+    snapshots.delete_snapshot(old_path)
+    _remove_file(old_path)
+    return db_file, True
+
+
+def _stored_path(filename: str, sha256: str) -> str:
+    """Ruta definitiva de un archivo subido: se guarda bajo su hash, con su extensión."""
+    extension = filename.rsplit(".", 1)[1].lower()
+    return os.path.join(UPLOAD_FOLDER, f"{sha256}.{extension}")
+
+
+def _keep_existing(db_file, partial_path: str):
+    """Descarta el temporal de un archivo ya registrado, o restaura con él el archivo físico si ya no está en disco."""
+    if os.path.exists(db_file.filepath):
+        _remove_file(partial_path)
+    else:
+        os.replace(partial_path, db_file.filepath)
+
+
+def _remove_file(path: str):
+    """Elimina un archivo si existe."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# ------------------ Subida en lote ------------------
+# Cada libro del lote se describe con un diccionario:
+# {"filename", "content_type", "source", "partial_path", "size", "sha256"}
+
+def _copy_to_partial(stream):
+    """Versión síncrona de _save_upload para leer un archivo comprimido dentro de un ZIP."""
+    partial_path = os.path.join(UPLOAD_FOLDER, f".{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(partial_path, "wb") as buffer:
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_FILE_SIZE_BYTES:
+                    raise HTTPException(status_code=400, detail="El archivo excede el tamaño máximo permitido")
+                sha256.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        _remove_file(partial_path)
+        raise
+
+    return partial_path, size, sha256.hexdigest()
+
+
+def _extract_zip(zip_path: str, source: str, max_files: int):
+    """
+    Copia uno por uno los libros Excel contenidos en un ZIP a temporales '.part',
+    sin descomprimir el ZIP completo. Se omiten carpetas y archivos ocultos o de sistema
+    (como __MACOSX/ o .DS_Store); los demás archivos que no son libros se rechazan.
+
+    Retorna:
+        tuple (libros guardados, rechazados con su motivo)
+    """
+    saved, rejected = [], []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                filename = os.path.basename(info.filename)
+                if info.is_dir() or not filename or filename.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                if not allowed_file(filename):
+                    rejected.append({"filename": filename, "source": source, "error": "Solo se permiten archivos .xls o .xlsx"})
+                    continue
+                if len(saved) >= max_files:
+                    raise HTTPException(status_code=400, detail=f"El lote supera el máximo de {BATCH_MAX_FILES} archivos")
+                try:
+                    with archive.open(info) as member:
+                        partial_path, size, sha256 = _copy_to_partial(member)
+                except HTTPException as e:
+                    rejected.append({"filename": filename, "source": source, "error": e.detail})
+                    continue
+                except (zipfile.BadZipFile, RuntimeError) as e:  # datos dañados o cifrados
+                    rejected.append({"filename": filename, "source": source, "error": f"No se pudo extraer: {e}"})
+                    continue
+                saved.append({
+                    "filename": filename,
+                    "content_type": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                    "source": source,
+                    "partial_path": partial_path,
+                    "size": size,
+                    "sha256": sha256,
+                })
+    except zipfile.BadZipFile:
+        rejected.append({"filename": source, "source": source, "error": "El archivo ZIP está dañado"})
+    except BaseException:
+        _discard_uploads(saved)
+        raise
+
+    return saved, rejected
+
+
+def _discard_uploads(uploads: list):
+    """Elimina los temporales de los libros de un lote que no se llegaron a registrar."""
+    for upload in uploads:
+        _remove_file(upload["partial_path"])
+
+
+def _register_batch(db: Session, uploads: list) -> list:
+    """
+    Guarda los libros de un lote bajo su hash y registra los nuevos en una sola transacción.
+    Los libros ya subidos antes (o repetidos dentro del mismo lote) reutilizan su registro.
+
+    Retorna:
+        lista de tuplas (registro ExcelFile, True si se creó un registro nuevo), en el orden de 'uploads'
+    """
+    existing = crud.get_excel_files_by_hashes(db, [upload["sha256"] for upload in uploads])
+    new_files = {}  # sha256 -> ExcelFileCreate
+    for upload in uploads:
+        sha256 = upload["sha256"]
+        if sha256 in existing:
+            _keep_existing(existing[sha256], upload["partial_path"])
+        elif sha256 in new_files:
+            _remove_file(upload["partial_path"])
+        else:
+            file_path = _stored_path(upload["filename"], sha256)
+            os.replace(upload["partial_path"], file_path)
+            new_files[sha256] = schemas.ExcelFileCreate(
+                filename=upload["filename"],
+                filepath=file_path,
+                filesize=upload["size"],
+                filetype=upload["content_type"],
+                sha256=sha256,
+            )
+
+    created = {}
+    if new_files:
+        try:
+            created = {f.sha256: f for f in crud.create_excel_files(db, list(new_files.values()))}
+        except IntegrityError:
+            # Otra petición registró alguno de estos archivos al mismo tiempo: se registran uno por uno
+            db.rollback()
+            for sha256, new_file in new_files.items():
+                try:
+                    created[sha256] = crud.create_excel_file(db, new_file)
+                except IntegrityError:
+                    db.rollback()
+                    existing[sha256] = crud.get_excel_file_by_hash(db, sha256)
+
+    results = []
+    for upload in uploads:
+        sha256 = upload["sha256"]
+        if sha256 in created:
+            # Las repeticiones del mismo libro dentro del lote se reportan como duplicados
+            existing[sha256] = created.pop(sha256)
+            results.append((existing[sha256], True))
+        else:
+            results.append((existing[sha256], False))
+    return results
+
+
+def _preview_sheet(df: "pd.DataFrame", required_columns: list, rows: int, estimated_rows) -> dict:
+    """Valida los encabezados de una hoja y arma su previsualización."""
+    # Ignorar hojas vacías (sin encabezados, o sin filas de datos)
+    has_data = len(df) > 0 if rows > 0 else bool(estimated_rows)
+    if df is None or len(df.columns) == 0 or not has_data:
+        return {"mensaje": "La hoja no contiene datos", "datos": []}
+
+    # Normalizar nombres de columnas y validar
+    df = ingest.normalize_columns(df)
+
+    try:
+        utils.validate_excel_columns(df.columns.tolist(), required_columns)
+        # Mostrar los primeros registros ya convertidos, igual que desde la copia columnar
+        return {"mensaje": "Hoja válida", "datos": ingest.dataframe_to_records(df)}
+    except HTTPException as e:
+        return {"mensaje": str(e.detail), "datos": []}
+
+
+def _build_preview(filepath: str, rows: int) -> list:
+    """
+    Arma la previsualización de todas las hojas leyendo solo los encabezados y las
+    primeras filas de cada una (o la copia columnar si el archivo ya fue procesado).
+    """
+    required_columns = ingest.REQUIRED_COLUMNS
+    result = []
+
+    # Si el archivo ya fue procesado, leer la copia columnar en lugar del Excel
+    snapshot = snapshots.open_snapshot(filepath)
+    if snapshot is not None:
+        for sheet in snapshot.sheets:
+            result.append({
+                "nombre": sheet["name"],
+                "mensaje": sheet["mensaje"],
+                "datos": snapshot.head(sheet, rows),
+                "filas_estimadas": sheet["rows"],
+            })
+        return result
+
+    # Si no, leer solo los encabezados y las primeras filas de cada hoja
+    with reader.open_workbook(filepath) as workbook:
+        for sheet_name in workbook.sheet_names:
+            estimated_rows = workbook.estimate_rows(sheet_name)
+            df = next(workbook.iter_batches(sheet_name, max_rows=rows))
+            info = _preview_sheet(df, required_columns, rows, estimated_rows)
+            result.append({"nombre": sheet_name, **info, "filas_estimadas": estimated_rows})
+    return result
+
+
+def _parse_fields(fields: str):
+    """Convierte el parámetro 'fields' (columnas separadas por coma) en lista, validando los nombres."""
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in crud.EXCEL_DATA_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Columnas desconocidas: {', '.join(unknown)}. Válidas: {', '.join(crud.EXCEL_DATA_FIELDS)}",
+        )
+    return selected
+
+
+def _stream_export(format: str, fields: list, filters: dict):
+    """
+    Genera la exportación con su propia sesión de base de datos, que se mantiene
+    abierta mientras se envía la respuesta y se cierra al terminar o si el cliente se desconecta.
+    """
+    db = database.SessionLocal()
+    try:
+        chunks = crud.iter_excel_data(db, export.EXPORT_CHUNK_SIZE, fields=fields, **filters)
+        yield from export.iter_export(format, chunks, fields)
+    finally:
+        db.close()
+
+
+# ================================
+# ENDPOINTS PRINCIPALES
+# ================================
+
+@router.post("/upload", response_model=schemas.APIResponse)
+async def upload_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Sube un archivo Excel, valida su tamaño y lo registra en la base de datos."""
+
+    # Validar extensión del archivo
+    if not allowed_file(file.filename):
+        raise HTTPException(status_code=400, detail="Solo se permiten archivos .xls o .xlsx")
+
+    # Rechazar de inmediato si el tamaño declarado ya excede el límite
+    if file.size is not None and file.size > MAX_FILE_SIZE_BYTES:
+        raise HTTPException(status_code=400, detail="El archivo excede el tamaño máximo permitido")
+
+    # Guardar el archivo por bloques sin bloquear el event loop
+    partial_path, filesize, sha256 = await _save_upload(file)
+
+    # Registrar el archivo en la base de datos (fuera del event loop), reutilizando duplicados
+    db_file, created = await run_in_threadpool(_register_upload, db, file, partial_path, filesize, sha256)
+
+    if created:
+        logger.info(f"Archivo subido correctamente: {file.filename} (sha256 {sha256})")
+        message = f"Archivo '{file.filename}' subido correctamente."
+    else:
+        logger.info(f"Archivo duplicado: {file.filename} coincide con el archivo {db_file.id}")
+        message = f"El archivo '{file.filename}' ya había sido subido como '{db_file.filename}'."
+
+    # Retornar respuesta exitosa
+    return utils.response_json(
+        status="success",
+        type="upload",
+        title="Subida exitosa",
+        message=message,
+        data={
+            "file_id": db_file.id,
+            "filename": db_file.filename,
+            "sha256": sha256,
+            "duplicate": not created,
+            "rows_inserted": db_file.rows_inserted,
+        },
+    )
+
+
+@router.post("/upload/batch", response_model=schemas.APIResponse, status_code=202)
+async def upload_excel_batch(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """
+    Sube varios archivos Excel, o archivos ZIP con libros Excel, y encola la carga de todos.
+    Los libros se registran en una sola transacción y se cargan al mismo tiempo
+    (hasta INGEST_BATCH_WORKERS a la vez); el avance se consulta en /files/batches/{batch_id}.
+    Los archivos no válidos se reportan en 'errors' sin detener el resto del lote.
+    """
+    uploads, rejected = [], []
+    try:
+        for file in files:
+            if file.filename.lower().endswith(".zip"):
+                # El ZIP se guarda completo y sus libros se copian uno por uno fuera del event loop
+                zip_path, _, _ = await _save_upload(file, BATCH_MAX_ZIP_MB * 1024 * 1024)
+                try:
+                    saved, skipped = await run_in_threadpool(
+                        _extract_zip, zip_path, file.filename, BATCH_MAX_FILES - len(uploads)
+                    )
+                finally:
+                    await anyio.to_thread.run_sync(_remove_file, zip_path)
+                uploads.extend(saved)
+                rejected.extend(skipped)
+                continue
+
+            if not allowed_file(file.filename):
+                rejected.append({"filename": file.filename, "source": None, "error": "Solo se permiten archivos .xls, .xlsx o .zip"})
+                continue
+            if len(uploads) >= BATCH_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"El lote supera el máximo de {BATCH_MAX_FILES} archivos")
+            try:
+                partial_path, filesize, sha256 = await _save_upload(file)
+            except HTTPException as e:
+                rejected.append({"filename": file.filename, "source": None, "error": e.detail})
+                continue
+            uploads.append({
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "source": None,
+                "partial_path": partial_path,
+                "size": filesize,
+                "sha256": sha256,
+            })
+
+        if not uploads:
+            raise HTTPException(status_code=400, detail="El lote no contiene archivos Excel válidos")
+
+        registered = await run_in_threadpool(_register_batch, db, uploads)
+    except BaseException:
+        await anyio.to_thread.run_sync(_discard_uploads, uploads)
+        raise
+
+    files_data = [
+        {
+            "file_id": db_file.id,
+            "filename": db_file.filename,
+            "source": upload["source"],
+            "duplicate": not created,
+            "rows_inserted": db_file.rows_inserted,
+        }
+        for upload, (db_file, created) in zip(uploads, registered)
+    ]
+
+    # Encolar la carga de los archivos nuevos (cada archivo una sola vez)
+    unique = {f["file_id"]: f for f in files_data}
+    try:
+        batch = jobs.submit_batch(
+            [{"file_id": f["file_id"], "filename": f["filename"], "rows_inserted": f["rows_inserted"]} for f in unique.values()]
+        )
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    logger.info(
+        f"Lote {batch.id}: {len(uploads)} archivos recibidos, {len(rejected)} rechazados",
+        extra={"batch_id": batch.id},
+    )
+    return utils.response_json(
+        status="success",
+        type="upload",
+        title="Lote en proceso",
+        message=f"Se recibieron {len(uploads)} archivos; {len(batch.jobs)} fueron encolados para su carga.",
+        data={"batch_id": batch.id, "files": files_data},
+        errors={"rejected": rejected} if rejected else None,
+    )
+
+
+@router.get("/preview/{file_id}")
+def preview_excel(
+    file_id: int,
+    rows: int = Query(PREVIEW_ROWS, ge=0, le=PREVIEW_MAX_ROWS),
+    db: Session = Depends(get_db),
+):
+    """
+    Valida las hojas y columnas requeridas y muestra las primeras filas de cada hoja.
+    Solo se leen los encabezados y 'rows' filas por hoja, junto con una estimación
+    del total de filas, por lo que el tiempo depende de la cantidad de hojas y no del tamaño.
+    """
+
+    # Obtener archivo desde la base de datos
+    db_file = crud.get_excel_file(db, file_id)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    try:
+        mtime_ns = os.stat(db_file.filepath).st_mtime_ns
+    except OSError:
+        raise HTTPException(status_code=404, detail="El archivo ya no existe en el servidor")
+
+    # Reutilizar la previsualización si el archivo no cambió. Al crearse la copia columnar
+    # cambia la clave, porque desde la copia se conoce el total exacto de filas
+    cache_key = (file_id, mtime_ns, rows, snapshots.has_snapshot(db_file.filepath))
+    cached = preview_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        formatted_result = _build_preview(db_file.filepath, rows)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error leyendo Excel: {e}")
+
+    preview_cache.put(cache_key, formatted_result)
+    return formatted_result
+
+
+@router.post("/insert/{file_id}", response_model=schemas.APIResponse, status_code=202)
+def insert_excel_data(
+    file_id: int,
+    response: Response,
+    prune: bool = Query(False, description="Eliminar las filas cargadas antes que ya no están en el libro"),
+    db: Session = Depends(get_db),
+):
+    """
+    Encola la inserción de los datos del Excel y retorna el ID de la carga.
+    La carga es incremental: solo se insertan las filas que el archivo aún no tiene
+    (por ejemplo, después de reemplazar el libro con PUT /files/{file_id}).
+    """
+
+    # Buscar archivo en base de datos
+    db_file = crud.get_excel_file(db, file_id)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    # Un archivo con el mismo contenido no se vuelve a procesar ni a insertar
+    if db_file.rows_inserted is not None:
+        response.status_code = 200
+        return utils.response_json(
+            status="success",
+            type="insert",
+            title="Carga completada",
+            message=f"El archivo '{db_file.filename}' ya fue cargado ({db_file.rows_inserted} registros).",
+            data={"job_id": None, "file_id": file_id, "total_inserted": db_file.rows_inserted},
+        )
+
+    # Encolar la carga en el pool de trabajadores
+    try:
+        job = jobs.submit_ingest(file_id, prune=prune)
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    # Retornar de inmediato con el ID para consultar el progreso
+    return utils.response_json(
+        status="success",
+        type="insert",
+        title="Carga en proceso",
+        message=f"La carga del archivo '{db_file.filename}' fue encolada.",
+        data={"job_id": job.id, "file_id": file_id, "status": job.status},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.APIResponse)
+def get_insert_job(job_id: str):
+    """Devuelve el progreso real de una carga: hojas, filas, errores y tiempo."""
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Carga no encontrada")
+
+    data = job.to_dict()
+    errors = data.pop("errors")
+
+    return utils.response_json(
+        status="error" if job.status == "failed" else "success",
+        type="job",
+        title="Estado de la carga",
+        message=job.message or "Carga en proceso",
+        data=data,
+        errors=errors or None,
+    )
+
+
+@router.get("/batches/{batch_id}", response_model=schemas.APIResponse)
+def get_batch(batch_id: str):
+    """Devuelve el avance de una subida en lote con el resumen de cada archivo."""
+    batch = jobs.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+
+    data = batch.to_dict()
+    failed = data["files_failed"]
+    return utils.response_json(
+        status="error" if data["status"] == "completed" and failed == data["files_total"] else "success",
+        type="batch",
+        title="Estado del lote",
+        message=(
+            f"Lote terminado: {data['files_completed']} archivos cargados, {failed} con errores."
+            if data["status"] == "completed"
+            else "Lote en proceso"
+        ),
+        data=data,
+    )
+
+
+@router.get("/", response_model=schemas.APIResponse)
+async def list_uploaded_files(db: AsyncSession = Depends(get_async_db)):
+    """Devuelve la lista de archivos Excel registrados."""
+    files = await crud_async.get_all_excel_files(db)
+
+    return utils.fast_response_json(
+        status="success",
+        type="list",
+        title="Archivos registrados",
+        message="Lista de archivos cargados",
+        data={"files": files},
+    )
+
+
+@router.put("/{file_id}", response_model=schemas.APIResponse)
+async def replace_excel_file(file_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Reemplaza el libro de un archivo ya registrado por una versión corregida.
+    Los registros cargados se conservan: la siguiente carga (POST /files/insert/{file_id})
+    solo inserta las filas nuevas y, con prune=true, elimina las que ya no están en el libro.
+    """
+    if not allowed_file(file.filename):
+        raise HTTPException(status_code=400, detail="Solo se permiten archivos .xls o .xlsx")
+    if file.size is not None and file.size > MAX_FILE_SIZE_BYTES:
+        raise HTTPException(status_code=400, detail="El archivo excede el tamaño máximo permitido")
+
+    partial_path, filesize, sha256 = await _save_upload(file)
+    try:
+        db_file, changed = await run_in_threadpool(
+            _replace_upload, db, file_id, file, partial_path, filesize, sha256
+        )
+    except BaseException:
+        await anyio.to_thread.run_sync(_remove_file, partial_path)
+        raise
+
+    if changed:
+        logger.info(f"Archivo {file_id} reemplazado por {file.filename} (sha256 {sha256})")
+        message = f"Archivo '{db_file.filename}' reemplazado. Ejecute la carga para aplicar los cambios."
+    else:
+        message = f"El archivo '{file.filename}' no tiene cambios respecto al registrado."
+
+    return utils.response_json(
+        status="success",
+        type="upload",
+        title="Archivo reemplazado" if changed else "Sin cambios",
+        message=message,
+        data={
+            "file_id": db_file.id,
+            "filename": db_file.filename,
+            "sha256": sha256,
+            "changed": changed,
+            "rows_inserted": db_file.rows_inserted,
+        },
+    )
+
+
+@router.delete("/{file_id}", response_model=schemas.APIResponse, status_code=202)
+def delete_excel_file(file_id: int, db: Session = Depends(get_db)):
+    """
+    Elimina un archivo Excel. El archivo deja de aparecer de inmediato en el listado, en /data
+    y en el gráfico; sus registros y el archivo físico se purgan después en segundo plano
+    (ver app.purge) y el avance se consulta en GET /files/purges/{file_id}.
+    """
+    db_file = crud.get_excel_file(db, file_id)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    # Se guardan antes de marcarlo: al confirmar se expiran los atributos de db_file, y la
+    # purga puede eliminar su registro antes de que se arme la respuesta
+    filename, file_path = db_file.filename, db_file.filepath
+    # El archivo físico se aparta para liberar su ruta por hash hasta que termine la purga
+    trash_path = purge.trash_path(file_id, file_path)
+
+    # Se marca bajo el lock de las cargas, para que no se encole una entre la verificación
+    # y la marca. Los archivos se mueven solo después de confirmar la marca
+    try:
+        with jobs.no_active_job(file_id):
+            rows = crud.mark_excel_file_deleted(db, file_id, trash_path)
+    except jobs.FileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if rows is None:
+        # Otra petición lo eliminó al mismo tiempo
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    snapshots.delete_snapshot(file_path)
+    try:
+        if os.path.exists(file_path):
+            os.replace(file_path, trash_path)
+    except OSError:
+        # El archivo ya está marcado: la purga elimina igual sus registros y el archivo queda en su ruta
+        logger.exception(f"No se pudo mover el archivo {file_id} a {trash_path}")
+
+    preview_cache.discard(lambda key: key[0] == file_id)
+    job = purge.submit(file_id, trash_path, rows)
+    logger.info(f"Archivo {file_id} marcado como eliminado, {rows} registros por purgar")
+
+    return utils.response_json(
+        status="success",
+        type="delete",
+        title="Eliminación en proceso",
+        message=f"Archivo '{filename}' eliminado. Sus {rows} registros se purgan en segundo plano.",
+        data=job.to_dict(),
+    )
+
+
+@router.get("/purges/{file_id}", response_model=schemas.APIResponse)
+def get_purge(file_id: int):
+    """Devuelve el avance de la purga de un archivo eliminado: filas eliminadas, restantes y tiempo."""
+    job = purge.get_purge(file_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Purga no encontrada")
+
+    return utils.response_json(
+        status="error" if job.status == "failed" else "success",
+        type="purge",
+        title="Estado de la purga",
+        message=job.message or "Purga en proceso",
+        data=job.to_dict(),
+    )
+
+
+@router.get("/chart", response_model=schemas.APIResponse)
+async def get_chart_data(db: AsyncSession = Depends(get_async_db)):
+    """Devuelve datos agregados para gráficos de productos."""
+    try:
+        data = await crud_async.get_chart_data(db)
+        return utils.fast_response_json(
+            status="success",
+            type="chart",
+            title="Datos para el gráfico",
+            message="Datos agregados obtenidos correctamente",
+            data={"chart": data},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener datos del gráfico: {e}")
+
+# ================================
+# CRUD manual para ExcelData
+# ================================
+
+@router.get("/data", response_model=APIResponse)
+async def list_excel_data(
+    cursor: int = Query(None, ge=0, description="ID del último registro de la página anterior"),
+    limit: int = Query(DATA_PAGE_SIZE, ge=1, le=DATA_MAX_PAGE_SIZE),
+    archivo_id: int = Query(None),
+    hoja: str = Query(None),
+    producto: str = Query(None),
+    fields: str = Query(None, description="Columnas separadas por coma, ej. 'producto,cantidad'"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Lista los registros de ExcelData por páginas.
+    Para pedir la página siguiente se envía como cursor el valor 'next_cursor' recibido.
+    """
+    selected = _parse_fields(fields)
+    items, next_cursor = await get_excel_data_page(
+        db,
+        limit=limit,
+        after_id=cursor,
+        archivo_id=archivo_id,
+        hoja=hoja,
+        producto=producto,
+        fields=selected,
+    )
+
+    return utils.fast_response_json(
+        status="success",
+        type="list",
+        title="Datos cargados",
+        message=f"{len(items)} registros de ExcelData",
+        data={"items": items, "next_cursor": next_cursor, "limit": limit}
+    )
+
+
+@router.get("/data/search", response_model=APIResponse)
+async def search_excel_data_endpoint(
+    q: str = Query(..., min_length=1, description="Palabras a buscar en nombre, dirección y producto"),
+    limit: int = Query(DATA_PAGE_SIZE, ge=1, le=DATA_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    archivo_id: int = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Busca registros que contengan todas las palabras (también como prefijo) en nombre,
+    dirección o producto, ordenados por relevancia. Usa el índice de texto de la base
+    (ver app.search). Para pedir la página siguiente se envía como offset 'next_offset'.
+    """
+    words = search.terms(q)
+    if not words:
+        raise HTTPException(status_code=400, detail="La búsqueda no contiene palabras")
+
+    items, next_offset = await search_excel_data(db, words, limit=limit, offset=offset, archivo_id=archivo_id)
+
+    return utils.fast_response_json(
+        status="success",
+        type="search",
+        title="Resultados de la búsqueda",
+        message=f"{len(items)} registros encontrados",
+        data={"items": items, "next_offset": next_offset, "limit": limit, "terms": words},
+    )
+
+
+@router.get("/data/export")
+def export_excel_data(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    archivo_id: int = Query(None),
+    hoja: str = Query(None),
+    producto: str = Query(None),
+    fields: str = Query(None, description="Columnas separadas por coma, ej. 'producto,cantidad'"),
+):
+    """
+    Exporta los registros de ExcelData en NDJSON o CSV.
+    Las filas se leen con un cursor del servidor y se envían por bloques,
+    así la memoria usada es la misma para mil o para millones de filas.
+    """
+    selected = _parse_fields(fields) or crud.EXCEL_DATA_FIELDS
+    filters = {"archivo_id": archivo_id, "hoja": hoja, "producto": producto}
+    filename = f"excel_data_{archivo_id}.{format}" if archivo_id is not None else f"excel_data.{format}"
+
+    return StreamingResponse(
+        _stream_export(format, selected, filters),
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/data", response_model=APIResponse)
+async def create_excel_data_endpoint(payload: ExcelDataCreate, db: AsyncSession = Depends(get_async_db)):
+    """Crea un nuevo registro en ExcelData."""
+    new_data = await create_excel_data(db, payload)
+    if not new_data:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    serialized = ExcelDataResponse.model_validate(new_data, from_attributes=True)
+
+    return utils.response_json(
+        status="success",
+        type="create",
+        title="Registro creado",
+        message="Nuevo registro agregado correctamente",
+        data={"item": serialized}
+    )
+
+
+@router.post("/data/batch", response_model=APIResponse)
+async def batch_excel_data_endpoint(payload: ExcelDataBatch, db: AsyncSession = Depends(get_async_db)):
+    """
+    Crea, modifica (solo los campos enviados, por ID) y elimina varios registros de ExcelData
+    en una sola transacción. Retorna el estado de cada elemento en el orden recibido:
+    created/updated/deleted, o not_found, file_not_found y duplicate si no se aplicó; si la base
+    rechaza la escritura no se aplica ningún elemento y los válidos se reportan como conflict.
+    """
+    total = len(payload.create) + len(payload.update) + len(payload.delete)
+    if total > DATA_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"El lote tiene {total} elementos; el máximo es {DATA_BATCH_MAX_ITEMS}")
+
+    results = await apply_excel_data_batch(
+        db,
+        [item.dict() for item in payload.create],
+        [item.dict(exclude_none=True) for item in payload.update],
+        payload.delete,
+    )
+
+    applied = {
+        kind: sum(1 for item in items if item["status"] in ("created", "updated", "deleted"))
+        for kind, items in results.items()
+    }
+    failed = total - sum(applied.values())
+    return utils.response_json(
+        status="error" if failed and failed == total else "success",
+        type="batch",
+        title="Edición en lote",
+        message=(
+            f"Se crearon {applied['create']}, se modificaron {applied['update']} y se eliminaron "
+            f"{applied['delete']} registros." + (f" {failed} elementos no se aplicaron." if failed else "")
+        ),
+        data={**results, "applied": applied, "failed": failed},
+    )
+
+
+@router.put("/data/{data_id}", response_model=APIResponse)
+async def update_excel_data_endpoint(data_id: int, payload: ExcelDataCreate, db: AsyncSession = Depends(get_async_db)):
+    """Actualiza un registro existente en ExcelData."""
+    updated = await update_excel_data(db, data_id, payload)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Registro no encontrado")
+
+    serialized = ExcelDataResponse.model_validate(updated, from_attributes=True)
+
+    return utils.response_json(
+        status="success",
+        type="update",
+        title="Registro actualizado",
+        message="Registro modificado correctamente",
+        data={"item": serialized}
+    )
+
+
+@router.delete("/data/{data_id}", response_model=APIResponse)
+async def delete_excel_data_endpoint(data_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Elimina un registro de ExcelData por su ID."""
+    deleted = await delete_excel_data(db, data_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Registro no encontrado")
+
+    return utils.response_json(
+        status="success",
+        type="delete",
+        title="Registro eliminado",
+        message="Registro eliminado correctamente"
+    )
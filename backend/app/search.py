@@ -0,0 +1,261 @@
+"""
+Búsqueda de texto sobre excel_data (nombre, dirección y producto).
+En MySQL se usa un índice FULLTEXT de InnoDB, que el motor mantiene con cada escritura.
+En SQLite se usa una tabla virtual FTS5: las filas nuevas se indexan por bloques con
+index_new_rows() en la misma transacción que las inserta, y las modificaciones y
+eliminaciones, con triggers. En otros motores se busca con LIKE, sin índice ni ranking.
+
+El índice cubre nombre y dirección. El producto se guarda como código (ver app.dictionaries):
+las palabras se comparan con la lista de productos, que es corta, y los productos que
+coinciden se buscan por producto_id.
+"""
+
+import itertools
+import logging
+import os
+import re
+import unicodedata
+
+from sqlalchemy import and_, column, func, inspect, literal, literal_column, or_, select, table, text, union_all
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from app import models
+
+# Términos que se toman de cada búsqueda (el resto se ignora)
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", 8))
+
+# Palabras de una búsqueda que se prueban también contra los nombres de producto (las
+# combinaciones crecen como 2^n)
+SEARCH_MAX_PRODUCT_TERMS = int(os.getenv("SEARCH_MAX_PRODUCT_TERMS", 3))
+
+SEARCH_COLUMNS = ["nombre", "direccion"]
+FULLTEXT_INDEX = "ft_excel_data_search"
+FTS_TABLE = "excel_data_fts"
+FTS_STATE_TABLE = "excel_data_fts_state"
+
+# Tabla FTS5 con contenido externo (solo guarda el índice); unicode61 con remove_diacritics
+# ignora las tildes y prefix acelera las búsquedas por prefijo. excel_data_fts_state guarda
+# el último ID indexado: indexar un bloque de filas con un INSERT ... SELECT es varias veces
+# más rápido que un trigger por fila durante la carga. Los triggers de modificación y
+# eliminación solo actúan sobre filas ya indexadas.
+_INDEXED = f"old.id <= (SELECT last_id FROM {FTS_STATE_TABLE})"
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{', '.join(SEARCH_COLUMNS)}, content='excel_data', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"CREATE TABLE IF NOT EXISTS {FTS_STATE_TABLE} (id INTEGER PRIMARY KEY CHECK (id = 1), last_id INTEGER NOT NULL)",
+    f"INSERT OR IGNORE INTO {FTS_STATE_TABLE} (id, last_id) VALUES (1, 0)",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON excel_data WHEN {_INDEXED} BEGIN "
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, nombre, direccion) "
+    f"VALUES ('delete', old.id, old.nombre, old.direccion); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF nombre, direccion ON excel_data "
+    f"WHEN {_INDEXED} BEGIN "
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, nombre, direccion) "
+    f"VALUES ('delete', old.id, old.nombre, old.direccion); "
+    f"INSERT INTO {FTS_TABLE} (rowid, nombre, direccion) "
+    f"VALUES (new.id, new.nombre, new.direccion); END",
+]
+_SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {FTS_STATE_TABLE}",
+]
+
+_TOKEN = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def terms(q: str) -> list:
+    """Palabras de la búsqueda, sin los operadores de MySQL ni de FTS5."""
+    return _TOKEN.findall(q.lower())[:SEARCH_MAX_TERMS]
+
+
+def _fold(value: str) -> str:
+    """Minúsculas y sin tildes, como comparan el índice FULLTEXT y FTS5."""
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# ------------------ Índice ------------------
+
+def _fts5_available(conn) -> bool:
+    options = {row[0] for row in conn.execute(text("PRAGMA compile_options"))}
+    return "ENABLE_FTS5" in options
+
+
+def has_fts_table(conn) -> bool:
+    """Si la base SQLite ya tiene la tabla FTS5."""
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first() is not None
+
+
+def ensure_index(conn) -> bool:
+    """
+    Crea el índice de búsqueda si falta y lo llena con las filas existentes.
+    Retorna True si lo creó.
+    """
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        if FULLTEXT_INDEX in {i["name"] for i in inspect(conn).get_indexes("excel_data")}:
+            return False
+        logger.info(f"Migración: creando índice FULLTEXT {FULLTEXT_INDEX}")
+        conn.execute(text(
+            f"ALTER TABLE excel_data ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(SEARCH_COLUMNS)})"
+        ))
+        return True
+
+    if dialect == "sqlite":
+        if not _fts5_available(conn):
+            logger.warning("SQLite sin FTS5: la búsqueda usará LIKE")
+            return False
+        created = not has_fts_table(conn) or _fts_columns(conn) != SEARCH_COLUMNS
+        if created:
+            drop_index(conn)
+        for statement in _SQLITE_DDL:
+            conn.execute(text(statement))
+        if created:
+            logger.info(f"Migración: creando índice FTS5 {FTS_TABLE}")
+            rebuild(conn)
+        return created
+
+    return False
+
+
+def _fts_columns(conn) -> list:
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({FTS_TABLE})"))]
+
+
+def drop_index(conn):
+    """Elimina el índice de búsqueda (por ejemplo, antes de cambiar las columnas que cubre)."""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        if FULLTEXT_INDEX in {i["name"] for i in inspect(conn).get_indexes("excel_data")}:
+            conn.execute(text(f"ALTER TABLE excel_data DROP INDEX {FULLTEXT_INDEX}"))
+    elif dialect == "sqlite":
+        for statement in _SQLITE_DROP:
+            conn.execute(text(statement))
+
+
+def rebuild(conn):
+    """Vuelve a construir el índice de búsqueda a partir de excel_data."""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        conn.execute(text(f"ALTER TABLE excel_data DROP INDEX {FULLTEXT_INDEX}"))
+        conn.execute(text(
+            f"ALTER TABLE excel_data ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(SEARCH_COLUMNS)})"
+        ))
+    elif dialect == "sqlite" and has_fts_table(conn):
+        conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+        conn.execute(text(f"UPDATE {FTS_STATE_TABLE} SET last_id = (SELECT COALESCE(MAX(id), 0) FROM excel_data)"))
+
+
+def index_new_rows(db: Session):
+    """
+    Agrega al índice FTS5 las filas insertadas después de la última llamada, sin confirmar
+    la transacción. Se llama después de cada inserción en excel_data; si alguna no lo hace,
+    sus filas se indexan en la siguiente. En MySQL no hace nada.
+    En SQLite las escrituras son de a una, por lo que los IDs nuevos siempre son mayores
+    que el último indexado.
+    """
+    if db.get_bind().dialect.name != "sqlite" or not has_fts_table(db):
+        return
+    db.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, nombre, direccion) "
+        f"SELECT id, nombre, direccion FROM excel_data "
+        f"WHERE id > (SELECT last_id FROM {FTS_STATE_TABLE})"
+    ))
+    db.execute(text(
+        f"UPDATE {FTS_STATE_TABLE} SET last_id = (SELECT COALESCE(MAX(id), 0) FROM excel_data)"
+    ))
+
+
+# ------------------ Consulta ------------------
+
+def product_matches(words: list, products) -> dict:
+    """
+    Productos cuyo nombre contiene cada palabra (también como prefijo), sin distinguir
+    mayúsculas ni tildes. Retorna palabra -> IDs, solo con las palabras que coinciden.
+
+    Parámetros:
+        words (list): palabras ya separadas con terms()
+        products: pares (id, nombre) de la tabla productos
+    """
+    tokens = [(code, _TOKEN.findall(_fold(name))) for code, name in products]
+    matches = {}
+    for word in words:
+        folded = _fold(word)
+        codes = {code for code, name_tokens in tokens if any(t.startswith(folded) for t in name_tokens)}
+        if codes:
+            matches[word] = codes
+    return matches
+
+
+def _text_branch(dialect: str, words: list, fts: bool):
+    """SELECT (id, score) de las filas con todas las palabras en nombre o dirección."""
+    data = models.ExcelData.__table__
+    if dialect == "mysql":
+        # Modo booleano: +palabra* exige cada palabra y acepta prefijos
+        score = match(*[data.c[c] for c in SEARCH_COLUMNS], against=" ".join(f"+{w}*" for w in words))
+        score = score.in_boolean_mode()
+        return select(data.c.id, score.label("score")).where(score)
+    if dialect == "sqlite" and fts:
+        index = table(FTS_TABLE, column("rowid"))
+        rank = func.bm25(literal_column(FTS_TABLE))  # menor es más relevante
+        return (
+            select(data.c.id, (-rank).label("score"))
+            .select_from(data.join(index, index.c.rowid == data.c.id))
+            .where(literal_column(FTS_TABLE).op("MATCH")(" ".join(f'"{w}"*' for w in words)))
+        )
+    conditions = [or_(*[data.c[c].ilike(f"%{w}%") for c in SEARCH_COLUMNS]) for w in words]
+    return select(data.c.id, literal(0).label("score")).where(and_(*conditions))
+
+
+def matches_query(dialect: str, words: list, products: list, fts: bool = True, condition=None):
+    """
+    SELECT (id, score) de las filas que contienen todas las palabras (también como prefijo)
+    en nombre, dirección o producto; 'score' es mayor cuanto más relevante es la fila.
+    Cada palabra que coincide con algún producto puede cumplirse en el texto o en el
+    producto: se une una consulta por combinación, y las filas que solo coinciden por
+    producto tienen score 0. Una palabra que aparece en todos los productos la cumplen
+    todas las filas, así que no se busca.
+
+    Parámetros:
+        dialect (str): motor de base de datos (mysql, sqlite, ...)
+        words (list): palabras ya separadas con terms()
+        products (list): pares (id, nombre) de la tabla productos
+        fts (bool): en SQLite, si existe la tabla FTS5
+        condition (opcional): filtro sobre excel_data que se aplica en cada consulta
+    """
+    data = models.ExcelData.__table__
+    all_codes = {code for code, _ in products}
+    matches = product_matches(words, products)
+    words = [w for w in words if matches.get(w) != all_codes]
+    if not words:
+        branch = select(data.c.id, literal(0).label("score"))
+        return branch if condition is None else branch.where(condition)
+    product_words = [w for w in words if w in matches][:SEARCH_MAX_PRODUCT_TERMS]
+
+    branches = []
+    for size in range(len(product_words) + 1):
+        for in_product in itertools.combinations(product_words, size):
+            codes = set.intersection(*[matches[w] for w in in_product]) if in_product else None
+            if codes is not None and not codes:
+                continue
+            text_words = [w for w in words if w not in in_product]
+            if text_words:
+                branch = _text_branch(dialect, text_words, fts)
+            else:
+                branch = select(data.c.id, literal(0).label("score"))
+            if codes is not None:
+                branch = branch.where(data.c.producto_id.in_(sorted(codes)))
+            if condition is not None:
+                branch = branch.where(condition)
+            branches.append(branch)
+
+    if len(branches) == 1:
+        return branches[0]
+    combined = union_all(*branches).subquery()
+    return select(combined.c.id, func.max(combined.c.score).label("score")).group_by(combined.c.id)
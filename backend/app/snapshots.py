@@ -0,0 +1,251 @@
+"""
+Copias columnares (Arrow IPC) de los libros Excel ya procesados.
+La primera lectura completa de un archivo guarda, junto a él, una copia por hoja
+con las columnas ya normalizadas y convertidas. Las previsualizaciones y cargas
+posteriores leen esa copia con memory-map en lugar de volver a procesar el XLSX.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import uuid
+
+# Permite desactivar las copias columnares (por ejemplo, si el disco es limitado).
+# pyarrow es opcional: sin él no se guardan copias
+PARSE_SNAPSHOTS = os.getenv("PARSE_SNAPSHOTS", "true").lower() == "true"
+ARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+SNAPSHOTS_ENABLED = PARSE_SNAPSHOTS and ARROW_AVAILABLE
+
+# Versión del formato; al cambiarla se descartan las copias anteriores
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# Columnas guardadas en la copia (hoja y archivo_id se agregan al leerla)
+SNAPSHOT_COLUMNS = ["nombre", "direccion", "telefono", "producto", "cantidad"]
+
+logger = logging.getLogger(__name__)
+
+
+def _pyarrow():
+    """Importa pyarrow en el primer uso, para no cargarlo al arrancar el servidor."""
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    return pa
+
+
+def _schema():
+    pa = _pyarrow()
+    return pa.schema(
+        [(col, pa.string()) for col in SNAPSHOT_COLUMNS[:-1]] + [("cantidad", pa.int64())]
+    )
+
+
+def snapshot_dir(filepath: str) -> str:
+    """Carpeta donde se guarda la copia columnar de un archivo."""
+    return f"{filepath}.snapshot"
+
+
+def _source_signature(filepath: str) -> dict:
+    """Datos del archivo original que invalidan la copia si cambian."""
+    stat = os.stat(filepath)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# ------------------ Lectura ------------------
+
+class Snapshot:
+    """Copia columnar válida de un archivo Excel."""
+
+    def __init__(self, directory: str, manifest: dict):
+        self.directory = directory
+        self.sheets = manifest["sheets"]  # en el orden del libro
+
+    def iter_batches(self, sheet: dict):
+        """Genera las filas de una hoja como diccionarios columna -> lista de valores."""
+        return iter_sheet_file(os.path.join(self.directory, sheet["file"]))
+
+    def head(self, sheet: dict, rows: int) -> list[dict]:
+        """Devuelve las primeras filas de una hoja como lista de registros."""
+        if not sheet["file"] or rows <= 0:
+            return []
+        pa = _pyarrow()
+        records = []
+        with pa.memory_map(os.path.join(self.directory, sheet["file"]), "r") as source:
+            arrow_reader = pa.ipc.open_file(source)
+            for i in range(arrow_reader.num_record_batches):
+                batch = arrow_reader.get_batch(i)
+                records.extend(batch.slice(0, rows - len(records)).to_pylist())
+                if len(records) >= rows:
+                    break
+        return records
+
+
+def open_snapshot(filepath: str):
+    """
+    Devuelve la copia columnar de un archivo, o None si no existe o ya no es válida.
+    Una copia cuyo archivo original cambió se elimina.
+    """
+    if not SNAPSHOTS_ENABLED:
+        return None
+
+    directory = snapshot_dir(filepath)
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        signature = _source_signature(filepath)
+    except OSError:
+        return None
+
+    if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("source") != signature:
+        logger.info(f"Copia columnar desactualizada, se descarta: {directory}")
+        delete_snapshot(filepath)
+        return None
+
+    return Snapshot(directory, manifest)
+
+
+def has_snapshot(filepath: str) -> bool:
+    """Indica si el archivo tiene una copia columnar guardada (sin comprobar que siga siendo válida)."""
+    return SNAPSHOTS_ENABLED and os.path.exists(os.path.join(snapshot_dir(filepath), MANIFEST_NAME))
+
+
+def delete_snapshot(filepath: str):
+    """Elimina la copia columnar de un archivo, si existe."""
+    shutil.rmtree(snapshot_dir(filepath), ignore_errors=True)
+
+
+# ------------------ Archivos de hoja ------------------
+
+def iter_sheet_file(path: str):
+    """Genera los lotes de un archivo de hoja (Arrow IPC) como diccionarios columna -> lista de valores."""
+    pa = _pyarrow()
+    with pa.memory_map(path, "r") as source:
+        arrow_reader = pa.ipc.open_file(source)
+        for i in range(arrow_reader.num_record_batches):
+            batch = arrow_reader.get_batch(i)
+            yield {name: batch.column(name).to_pylist() for name in SNAPSHOT_COLUMNS}
+
+
+def write_sheet_file(path: str, batches) -> int:
+    """
+    Escribe lotes (columna -> lista de valores) en un archivo de hoja con el formato de la copia.
+    Lo usan los procesos de lectura (ver ingest._parse_sheet). Retorna las filas escritas.
+    """
+    pa = _pyarrow()
+    schema = _schema()
+    rows = 0
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for columns in batches:
+            batch = pa.RecordBatch.from_pydict({col: columns[col] for col in SNAPSHOT_COLUMNS}, schema=schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+# ------------------ Escritura ------------------
+
+class SnapshotWriter:
+    """
+    Escribe la copia columnar mientras se procesa un libro.
+    Se escribe en una carpeta temporal que solo reemplaza a la definitiva al terminar
+    sin errores, de modo que nunca queda a la vista una copia incompleta.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.enabled = SNAPSHOTS_ENABLED
+        self.sheets = []
+        self._tmp_dir = f"{snapshot_dir(filepath)}.{uuid.uuid4().hex}.tmp"
+        self._sink = None
+        self._writer = None
+        if self.enabled:
+            self._signature = _source_signature(filepath)
+            os.makedirs(self._tmp_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def add_invalid(self, sheet_name: str, message: str):
+        """Registra una hoja que no se carga (vacía o con columnas faltantes)."""
+        self._close_sheet()
+        self.sheets.append({"name": sheet_name, "file": None, "mensaje": message, "rows": 0, "errors": {}})
+
+    def sheet_file(self, index: int) -> str:
+        """
+        Ruta donde otro proceso puede escribir la hoja de la posición indicada del libro
+        (ver write_sheet_file y adopt_sheet), o None si las copias están desactivadas.
+        """
+        if not self.enabled:
+            return None
+        return os.path.join(self._tmp_dir, f"part_{index}.arrow")
+
+    def adopt_sheet(self, sheet_name: str, path: str, rows: int, errors: dict = None):
+        """Agrega a la copia una hoja ya escrita en la ruta que dio sheet_file."""
+        self._close_sheet()
+        self.sheets.append(
+            {"name": sheet_name, "file": os.path.basename(path), "mensaje": "Hoja válida", "rows": rows, "errors": errors or {}}
+        )
+
+    def write(self, sheet_name: str, columns: dict, errors: dict = None):
+        """Agrega un lote convertido (ver ingest.dataframe_to_columns) a la hoja indicada."""
+        if not self.enabled:
+            return
+
+        if not self.sheets or self.sheets[-1]["name"] != sheet_name or self.sheets[-1]["file"] is None:
+            self._open_sheet(sheet_name)
+
+        sheet = self.sheets[-1]
+        batch = _pyarrow().RecordBatch.from_pydict({col: columns[col] for col in SNAPSHOT_COLUMNS}, schema=_schema())
+        self._writer.write_batch(batch)
+        sheet["rows"] += batch.num_rows
+        if errors:
+            sheet["errors"] = errors
+
+    def commit(self):
+        """Cierra la copia y la publica junto al archivo original."""
+        if not self.enabled:
+            return
+        self._close_sheet()
+
+        manifest = {"version": SNAPSHOT_VERSION, "source": self._signature, "sheets": self.sheets}
+        with open(os.path.join(self._tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        delete_snapshot(self.filepath)
+        os.replace(self._tmp_dir, snapshot_dir(self.filepath))
+
+    def abort(self):
+        """Descarta la copia en construcción."""
+        if not self.enabled:
+            return
+        try:
+            self._close_sheet()
+        finally:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def _open_sheet(self, sheet_name: str):
+        pa = _pyarrow()
+        self._close_sheet()
+        file_name = f"sheet_{len(self.sheets)}.arrow"
+        self._sink = pa.OSFile(os.path.join(self._tmp_dir, file_name), "wb")
+        self._writer = pa.ipc.new_file(self._sink, _schema())
+        self.sheets.append({"name": sheet_name, "file": file_name, "mensaje": "Hoja válida", "rows": 0, "errors": {}})
+
+    def _close_sheet(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            self._sink = None
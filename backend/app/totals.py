@@ -0,0 +1,155 @@
+"""
+Mantenimiento de la tabla product_totals.
+Cada operación que modifica excel_data aplica aquí la diferencia por producto
+dentro de su misma transacción, de modo que el gráfico no necesita recorrer
+excel_data con un GROUP BY en cada petición.
+"""
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import models
+
+_totals = models.ProductTotal.__table__
+_data = models.ExcelData.__table__
+_files = models.ExcelFile.__table__
+_productos = models.Producto.__table__
+
+
+# ------------------ Cálculo de diferencias ------------------
+
+def deltas_from_columns(columns: dict) -> dict:
+    """Suma cantidad y registros por producto a partir de arreglos por columna."""
+    deltas = {}
+    for producto, cantidad in zip(columns["producto"], columns["cantidad"]):
+        total, registros = deltas.get(producto, (0, 0))
+        deltas[producto] = (total + cantidad, registros + 1)
+    return deltas
+
+
+def add_delta(deltas: dict, producto: str, cantidad: int, registros: int = 1):
+    """Acumula la diferencia de un registro (usar registros=-1 al quitarlo)."""
+    total, count = deltas.get(producto, (0, 0))
+    deltas[producto] = (total + cantidad * registros, count + registros)
+
+
+def _sums_by_producto(condition):
+    """
+    SELECT de (producto, SUM(cantidad), COUNT(*)) de las filas que cumplen la condición.
+    Se agrupa por el código de producto y solo después se une con los nombres.
+    """
+    grouped = (
+        select(_data.c.producto_id, func.sum(_data.c.cantidad).label("total"), func.count().label("registros"))
+        .where(condition)
+        .group_by(_data.c.producto_id)
+        .subquery()
+    )
+    return select(_productos.c.nombre, grouped.c.total, grouped.c.registros).join_from(
+        grouped, _productos, _productos.c.id == grouped.c.producto_id
+    )
+
+
+def deltas_for_rows(db: Session, condition) -> dict:
+    """Diferencias que hay que restar al eliminar las filas de excel_data que cumplen la condición."""
+    rows = db.execute(_sums_by_producto(condition)).all()
+    return {producto: (-int(total or 0), -count) for producto, total, count in rows}
+
+
+def deltas_for_file(db: Session, file_id: int) -> dict:
+    """Diferencias que hay que restar al eliminar todos los registros de un archivo."""
+    return deltas_for_rows(db, _data.c.archivo_id == file_id)
+
+
+# ------------------ Aplicación de diferencias ------------------
+
+def _upsert_statement(dialect: str):
+    """INSERT que suma a los totales existentes, según el motor de base de datos."""
+    if dialect == "mysql":
+        stmt = mysql.insert(_totals)
+        return stmt.on_duplicate_key_update(
+            total=_totals.c.total + stmt.inserted.total,
+            registros=_totals.c.registros + stmt.inserted.registros,
+        )
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(_totals)
+        return stmt.on_conflict_do_update(
+            index_elements=[_totals.c.producto],
+            set_={
+                "total": _totals.c.total + stmt.excluded.total,
+                "registros": _totals.c.registros + stmt.excluded.registros,
+            },
+        )
+    return None
+
+
+def apply_deltas(db: Session, deltas: dict):
+    """
+    Aplica las diferencias por producto a product_totals sin confirmar la transacción.
+    Los productos que se quedan sin registros se eliminan.
+    """
+    deltas = {p: d for p, d in deltas.items() if d != (0, 0)}
+    if not deltas:
+        return
+
+    # Siempre en el mismo orden: en MySQL, las cargas, purgas y ediciones que actualizan
+    # product_totals al mismo tiempo bloquean sus filas en ese orden y no se interbloquean
+    rows = [{"producto": p, "total": t, "registros": n} for p, (t, n) in sorted(deltas.items())]
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = db.execute(
+                update(_totals)
+                .where(_totals.c.producto == row["producto"])
+                .values(total=_totals.c.total + row["total"], registros=_totals.c.registros + row["registros"])
+            )
+            if result.rowcount == 0:
+                db.execute(insert(_totals).values(**row))
+
+    if any(n < 0 for _, n in deltas.values()):
+        db.execute(delete(_totals).where(_totals.c.registros <= 0))
+
+
+# ------------------ Reconstrucción y verificación ------------------
+
+def _live_totals(db: Session) -> dict:
+    """
+    Totales calculados directamente desde excel_data con GROUP BY.
+    Las filas de los archivos marcados como eliminados (ya descontadas) no se cuentan.
+    """
+    deleted = select(_files.c.id).where(_files.c.deleted_at.is_not(None))
+    rows = db.execute(_sums_by_producto(_data.c.archivo_id.not_in(deleted))).all()
+    return {producto: (int(total or 0), count) for producto, total, count in rows}
+
+
+def rebuild(db: Session) -> int:
+    """Recalcula product_totals desde cero a partir de excel_data. Retorna los productos escritos."""
+    live = _live_totals(db)
+    db.execute(delete(_totals))
+    if live:
+        db.execute(
+            insert(_totals),
+            [{"producto": p, "total": t, "registros": n} for p, (t, n) in live.items()],
+        )
+    db.commit()
+    return len(live)
+
+
+def check(db: Session) -> dict:
+    """
+    Compara product_totals con el GROUP BY sobre excel_data.
+    Retorna producto -> {"materializado": ..., "real": ...} para cada diferencia encontrada.
+    """
+    live = _live_totals(db)
+    stored = {
+        producto: (int(total), registros)
+        for producto, total, registros in db.execute(
+            select(_totals.c.producto, _totals.c.total, _totals.c.registros)
+        ).all()
+    }
+    return {
+        producto: {"materializado": stored.get(producto), "real": live.get(producto)}
+        for producto in set(live) | set(stored)
+        if live.get(producto) != stored.get(producto)
+    }
@@ -0,0 +1,9 @@
+"""
+Benchmarks reproducibles del proceso de carga de archivos Excel.
+
+Uso (desde la carpeta backend):
+    python -m benchmarks.run --rows 20000 --sheets 4
+    python -m benchmarks.compare resultados_anteriores.json resultados_nuevos.json
+
+Ver benchmarks/run.py para todas las opciones.
+"""
@@ -0,0 +1,75 @@
+"""
+Compara dos archivos de resultados de benchmarks.run y marca las regresiones.
+
+Uso (desde la carpeta backend):
+    python -m benchmarks.compare base.json nuevo.json --threshold 10
+
+Se comparan la latencia p50 (menor es mejor) y las filas por segundo (mayor es mejor)
+de cada medición presente en ambos archivos. Termina con código 1 si alguna empeora
+más que el umbral, para poder usarlo en integración continua.
+"""
+
+import argparse
+import json
+
+# Métrica -> True si un valor mayor es mejor
+METRICS = {"p50_ms": False, "rows_per_sec": True}
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    """Convierte los resultados anidados en {'escenario.medicion.metrica': valor}."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif key in METRICS and isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    """Retorna filas (métrica, base, nuevo, cambio %, regresión) para las métricas comunes."""
+    base_flat = _flatten(base["results"])
+    new_flat = _flatten(new["results"])
+    rows = []
+    for path in sorted(set(base_flat) & set(new_flat)):
+        before, after = base_flat[path], new_flat[path]
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        higher_is_better = METRICS[path.rsplit(".", 1)[1]]
+        worse = -change if higher_is_better else change
+        rows.append((path, before, after, change, worse > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmarks.")
+    parser.add_argument("base", help="resultados de referencia")
+    parser.add_argument("new", help="resultados a evaluar")
+    parser.add_argument("--threshold", type=float, default=10.0, help="porcentaje de empeoramiento tolerado")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"base: {base['machine'].get('commit')}  nuevo: {new['machine'].get('commit')}")
+    if base.get("params") != new.get("params"):
+        print("Aviso: los parámetros de ejecución no coinciden, la comparación puede no ser válida.")
+
+    rows = compare(base, new, args.threshold)
+    width = max((len(r[0]) for r in rows), default=10)
+    for path, before, after, change, regression in rows:
+        mark = "  REGRESIÓN" if regression else ""
+        print(f"{path:<{width}}  {before:>12.3f}  {after:>12.3f}  {change:>+8.1f}%{mark}")
+
+    regressions = sum(1 for r in rows if r[4])
+    print(f"{regressions} regresiones sobre {len(rows)} métricas (umbral {args.threshold}%)")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
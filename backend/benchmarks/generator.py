@@ -0,0 +1,141 @@
+"""
+Generador de libros Excel sintéticos para los benchmarks.
+Los libros se generan con una semilla fija, de modo que dos ejecuciones con los
+mismos parámetros producen exactamente el mismo archivo (y el mismo hash).
+"""
+
+import argparse
+import random
+
+from openpyxl import Workbook
+
+# Encabezados requeridos tal como los escribiría un usuario
+BASE_HEADERS = ["nombre", "direccion", "telefono", "producto", "cantidad"]
+
+# Columnas adicionales que la carga debe ignorar
+EXTRA_HEADERS = ["Observaciones", "Fecha", "Vendedor", "Código"]
+
+# Valores inválidos de 'cantidad' (deben reemplazarse por 0 y reportarse)
+DIRTY_CANTIDAD = ["N/A", "diez", "1,5", "--", "inf", "#REF!"]
+
+PRODUCTS = [f"Producto {i:03d}" for i in range(200)]
+
+
+def _noisy_header(header: str, rng: random.Random) -> str:
+    """Cambia mayúsculas y agrega espacios como lo haría un usuario (ej. ' Nombre ')."""
+    style = rng.choice([str.lower, str.upper, str.title])
+    return " " * rng.randint(0, 2) + style(header) + " " * rng.randint(0, 2)
+
+
+def _sheet_headers(index: int, noise: bool, rng: random.Random) -> list:
+    """Encabezados de una hoja. Con ruido: columnas extra, orden cambiado y mayúsculas mezcladas."""
+    if not noise:
+        return list(BASE_HEADERS)
+
+    headers = [_noisy_header(h, rng) for h in BASE_HEADERS]
+    headers += rng.sample(EXTRA_HEADERS, rng.randint(1, len(EXTRA_HEADERS)))
+    rng.shuffle(headers)
+
+    # Una de cada cinco hojas no tiene la columna 'producto' y debe reportarse como inválida
+    if index % 5 == 4:
+        headers = [h for h in headers if h.strip().lower() != "producto"]
+    return headers
+
+
+def _cell(header: str, row: int, rng: random.Random, dirty_ratio: float):
+    """Valor de una celda según su columna."""
+    name = header.strip().lower()
+    if name == "nombre":
+        return f"Cliente {row}"
+    if name == "direccion":
+        return f"Calle {rng.randint(1, 200)} #{rng.randint(1, 99)}-{rng.randint(1, 99)}"
+    if name == "telefono":
+        return 3000000000 + rng.randint(0, 99999999)
+    if name == "producto":
+        return rng.choice(PRODUCTS)
+    if name == "cantidad":
+        roll = rng.random()
+        if roll < dirty_ratio:
+            return rng.choice(DIRTY_CANTIDAD)
+        if roll < dirty_ratio * 1.5:
+            return None  # vacío: se guarda como 0 sin reportarse
+        if roll < dirty_ratio * 2:
+            return rng.uniform(0, 100)  # decimal: se trunca
+        return rng.randint(1, 500)
+    return rng.choice(["", "ok", None, 42])
+
+
+def generate_workbook(
+    path: str,
+    rows: int = 10000,
+    sheets: int = 1,
+    noise: bool = True,
+    dirty_ratio: float = 0.01,
+    empty_sheet: bool = False,
+    seed: int = 42,
+) -> dict:
+    """
+    Escribe un libro .xlsx sintético.
+
+    Parámetros:
+        path (str): ruta del archivo a crear
+        rows (int): filas de datos por hoja
+        sheets (int): cantidad de hojas con datos
+        noise (bool): encabezados con mayúsculas/espacios, columnas extra y hojas sin 'producto'
+        dirty_ratio (float): proporción de valores de 'cantidad' no numéricos
+        empty_sheet (bool): agregar al final una hoja vacía
+        seed (int): semilla del generador aleatorio
+
+    Retorna:
+        dict con las filas esperadas: escritas, válidas (en hojas con todas las columnas) y hojas inválidas
+    """
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    valid_rows = 0
+    invalid_sheets = 0
+
+    for index in range(sheets):
+        worksheet = workbook.create_sheet(f"Hoja{index + 1}")
+        headers = _sheet_headers(index, noise, rng)
+        worksheet.append(headers)
+        for row in range(rows):
+            worksheet.append([_cell(h, row, rng, dirty_ratio) for h in headers])
+
+        if {"producto", "cantidad"} <= {h.strip().lower() for h in headers}:
+            valid_rows += rows
+        else:
+            invalid_sheets += 1
+
+    if empty_sheet:
+        workbook.create_sheet("Vacía")
+        invalid_sheets += 1
+
+    workbook.save(path)
+    return {"rows_written": rows * sheets, "valid_rows": valid_rows, "invalid_sheets": invalid_sheets}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un libro Excel sintético para pruebas de carga.")
+    parser.add_argument("path", help="archivo .xlsx a crear")
+    parser.add_argument("--rows", type=int, default=10000, help="filas por hoja")
+    parser.add_argument("--sheets", type=int, default=1, help="cantidad de hojas")
+    parser.add_argument("--no-noise", action="store_true", help="encabezados limpios y sin columnas extra")
+    parser.add_argument("--dirty-ratio", type=float, default=0.01, help="proporción de 'cantidad' inválida")
+    parser.add_argument("--empty-sheet", action="store_true", help="agregar una hoja vacía")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    info = generate_workbook(
+        args.path,
+        rows=args.rows,
+        sheets=args.sheets,
+        noise=not args.no_noise,
+        dirty_ratio=args.dirty_ratio,
+        empty_sheet=args.empty_sheet,
+        seed=args.seed,
+    )
+    print(info)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Entorno de ejecución de los benchmarks.
+Prepara una base SQLite y una carpeta de archivos temporales, monta las rutas de
+la API en un TestClient y ofrece utilidades para medir latencias y memoria.
+"""
+
+import contextlib
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+
+
+class BenchEnv:
+    """
+    API completa sobre SQLite lista para medir.
+
+    Las variables de entorno se fijan antes de importar la aplicación, porque
+    los módulos leen su configuración al importarse.
+    """
+
+    def __init__(self, workdir: str, env: dict = None):
+        self.workdir = workdir
+        self.db_path = os.path.join(workdir, "bench.sqlite")
+        os.makedirs(workdir, exist_ok=True)
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+        defaults = {
+            "MYSQL_USER": "bench",
+            "MYSQL_PASSWORD": "bench",
+            "MYSQL_HOST": "localhost",
+            "MYSQL_PORT": "3306",
+            "MYSQL_DATABASE": "bench",
+            "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+            "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{self.db_path}",
+        }
+        for key, value in {**defaults, **(env or {})}.items():
+            os.environ[key] = str(value)
+
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from app import database, migrations, models  # noqa: F401 (registra las tablas)
+
+        # Todo el acceso síncrono (rutas, trabajos de carga, exportación) usa la misma base SQLite
+        self.engine = create_engine(
+            f"sqlite:///{self.db_path}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+        )
+        event.listen(self.engine, "connect", _sqlite_pragmas)
+        database.engine = self.engine
+        database.SessionLocal.configure(bind=self.engine)
+        database.Base.metadata.create_all(bind=self.engine)
+        migrations.upgrade(self.engine)
+
+        from app.routes import files
+
+        app = FastAPI()
+        app.include_router(files.router, prefix="/files")
+
+        # Misma sonda que app.main: una ruta ligera para medir la latencia bajo carga
+        @app.get("/health/live")
+        def health_live():
+            return {"status": "ok"}
+
+        self.app = app
+        self.client = TestClient(app)
+        self.files = files
+
+    @contextlib.contextmanager
+    def serve(self):
+        """
+        Levanta la API en un servidor uvicorn real (en un hilo) y retorna su URL base.
+        A diferencia del TestClient, las peticiones concurrentes comparten un mismo event loop.
+        """
+        import uvicorn
+
+        # Con IPPROTO_TCP explícito asyncio activa TCP_NODELAY en las conexiones aceptadas
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.bind(("127.0.0.1", 0))
+        server = uvicorn.Server(uvicorn.Config(self.app, lifespan="off", log_level="warning", access_log=False))
+        thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+        thread.start()
+        try:
+            while not server.started:
+                time.sleep(0.01)
+            yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+        finally:
+            server.should_exit = True
+            thread.join()
+            sock.close()
+
+    def session(self):
+        from app import database
+        return database.SessionLocal()
+
+    # ------------------ Operaciones de la API ------------------
+
+    def upload(self, path: str) -> dict:
+        with open(path, "rb") as f:
+            response = self.client.post(
+                "/files/upload",
+                files={"file": (os.path.basename(path), f, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+            )
+        response.raise_for_status()
+        return response.json()["data"]
+
+    def insert(self, file_id: int, timeout: float = 3600) -> dict:
+        """Lanza la carga de un archivo y espera a que el trabajo termine."""
+        response = self.client.post(f"/files/insert/{file_id}")
+        response.raise_for_status()
+        data = response.json()["data"]
+        if "job_id" not in data:
+            return data
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.client.get(f"/files/jobs/{data['job_id']}").json()["data"]
+            if job["status"] == "completed":
+                return job
+            if job["status"] == "failed":
+                raise RuntimeError(f"La carga falló: {job.get('message')}")
+            time.sleep(0.01)
+        raise TimeoutError("La carga no terminó a tiempo")
+
+    def upload_batch(self, zip_path: str, timeout: float = 3600) -> dict:
+        """Sube un ZIP de libros por /files/upload/batch y espera a que termine el lote."""
+        with open(zip_path, "rb") as f:
+            response = self.client.post(
+                "/files/upload/batch", files={"files": (os.path.basename(zip_path), f, "application/zip")}
+            )
+        response.raise_for_status()
+        batch_id = response.json()["data"]["batch_id"]
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            batch = self.client.get(f"/files/batches/{batch_id}").json()["data"]
+            if batch["status"] == "completed":
+                if batch["files_failed"]:
+                    raise RuntimeError(f"{batch['files_failed']} archivos del lote fallaron")
+                return batch
+            time.sleep(0.01)
+        raise TimeoutError("El lote no terminó a tiempo")
+
+    def delete(self, file_id: int, wait: bool = True):
+        """Elimina un archivo y, con wait=True, espera a que se purguen sus registros."""
+        self.client.delete(f"/files/{file_id}").raise_for_status()
+        if wait:
+            self.wait_purge(file_id)
+
+    def wait_purge(self, file_id: int, timeout: float = 3600) -> dict:
+        """Espera a que termine la purga de un archivo eliminado."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            purge = self.client.get(f"/files/purges/{file_id}").json()["data"]
+            if purge["status"] == "completed":
+                return purge
+            if purge["status"] == "failed":
+                raise RuntimeError(f"La purga falló: {purge.get('message')}")
+            time.sleep(0.01)
+        raise TimeoutError("La purga no terminó a tiempo")
+
+    def clear_preview_cache(self):
+        self.files.preview_cache.discard(lambda key: True)
+
+
+def _sqlite_pragmas(dbapi_connection, _):
+    # WAL permite leer mientras el trabajo de carga escribe
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+# ------------------ Medición ------------------
+
+def percentiles(samples: list) -> dict:
+    """Resumen de latencias en milisegundos."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def _current_rss() -> int:
+    """Memoria residente actual del proceso en bytes (solo Linux; 0 si no está disponible)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class RSSSampler:
+    """
+    Mide el pico de memoria residente durante un bloque de código.
+    A diferencia de ru_maxrss (el pico de todo el proceso), el pico se reinicia en cada bloque.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = _current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, _current_rss())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, _current_rss())
+
+    def to_dict(self) -> dict:
+        return {
+            "rss_start_mb": round(self.start_rss / 1024 / 1024, 1),
+            "rss_peak_mb": round(self.peak_rss / 1024 / 1024, 1),
+            "rss_growth_mb": round((self.peak_rss - self.start_rss) / 1024 / 1024, 1),
+        }
+
+
+def measure(fn, repeat: int = 1, warmup: int = 0, rows: int = None, setup=None) -> dict:
+    """
+    Ejecuta fn varias veces y retorna percentiles de latencia, filas/s y pico de memoria.
+
+    Parámetros:
+        fn: función sin argumentos a medir (recibe el resultado de setup si se indica)
+        repeat (int): ejecuciones medidas
+        warmup (int): ejecuciones previas que no se miden
+        rows (int, opcional): filas procesadas por ejecución, para calcular filas/s
+        setup: función que se ejecuta antes de cada ejecución, fuera del tiempo medido
+    """
+    for _ in range(warmup):
+        fn(setup()) if setup else fn()
+
+    samples = []
+    with RSSSampler() as rss:
+        for _ in range(repeat):
+            arg = setup() if setup else None
+            start = time.perf_counter()
+            fn(arg) if setup else fn()
+            samples.append(time.perf_counter() - start)
+
+    result = {"latency": percentiles(samples), **rss.to_dict()}
+    if rows:
+        result["rows"] = rows
+        result["rows_per_sec"] = round(rows / statistics.median(samples), 1)
+    return result
+
+
+def machine_info() -> dict:
+    """Datos del entorno para poder comparar resultados entre ejecuciones."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
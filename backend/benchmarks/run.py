@@ -0,0 +1,101 @@
+"""
+Ejecuta los benchmarks de la API contra SQLite y guarda los resultados en JSON.
+
+Ejemplos (desde la carpeta backend):
+    python -m benchmarks.run
+    python -m benchmarks.run --rows 100000 --sheets 4 --repeat 5
+    python -m benchmarks.run --suite full --workers 1 2 4 8 --worker-sheets 20
+    python -m benchmarks.run --only insert chart --output resultados.json
+
+Los resultados de distintas versiones se comparan con benchmarks.compare.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from benchmarks import scenarios
+from benchmarks.generator import generate_workbook
+from benchmarks.harness import BenchEnv, machine_info
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga de archivos Excel.")
+    parser.add_argument("--rows", type=int, default=20000, help="filas por hoja del libro de prueba")
+    parser.add_argument("--sheets", type=int, default=4, help="hojas del libro de prueba")
+    parser.add_argument("--dirty-ratio", type=float, default=0.01, help="proporción de 'cantidad' inválida")
+    parser.add_argument("--no-noise", action="store_true", help="encabezados limpios y sin columnas extra")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por medición")
+    parser.add_argument("--page-size", type=int, default=100, help="tamaño de página para /files/data")
+    parser.add_argument("--suite", choices=["core", "full"], default="core")
+    parser.add_argument("--only", nargs="+", metavar="ESCENARIO", help="ejecutar solo estos escenarios")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="procesos a probar en parse_workers")
+    parser.add_argument("--worker-sheets", type=int, default=20, help="hojas del libro de parse_workers")
+    parser.add_argument("--worker-rows", type=int, default=5000, help="filas por hoja del libro de parse_workers")
+    parser.add_argument("--batch-files", type=int, default=8, help="libros del ZIP en batch_upload")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="filas de cada libro en batch_upload")
+    parser.add_argument("--upload-clients", type=int, default=8, help="clientes que suben a la vez en concurrent_upload")
+    parser.add_argument("--upload-mb", type=int, default=20, help="tamaño de cada archivo subido en concurrent_upload")
+    parser.add_argument("--workdir", help="carpeta de trabajo (por defecto una temporal que se elimina)")
+    parser.add_argument("--output", help="archivo JSON de resultados (por defecto benchmarks/results/<commit>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    selected = scenarios.FULL if args.suite == "full" else scenarios.CORE
+    if args.only:
+        unknown = [name for name in args.only if name not in scenarios.FULL]
+        if unknown:
+            raise SystemExit(f"Escenarios desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(scenarios.FULL)}")
+        selected = {name: scenarios.FULL[name] for name in args.only}
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="excel-bench-")
+    try:
+        env = BenchEnv(workdir)
+        workbook_path = os.path.join(workdir, "bench.xlsx")
+        workbook_info = generate_workbook(
+            workbook_path,
+            rows=args.rows,
+            sheets=args.sheets,
+            noise=not args.no_noise,
+            dirty_ratio=args.dirty_ratio,
+            seed=args.seed,
+        )
+        ctx = scenarios.Context(workbook_path, workbook_info, args)
+
+        results = {}
+        for name, scenario in selected.items():
+            print(f"- {name}...", flush=True)
+            results[name] = scenario(env, ctx)
+            print(json.dumps(results[name], ensure_ascii=False), flush=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "machine": machine_info(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "workdir")},
+        "workbook": workbook_info,
+        "results": results,
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{report['machine']['commit'] or 'local'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
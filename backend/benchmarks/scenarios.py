@@ -0,0 +1,386 @@
+"""
+Escenarios medidos por el benchmark.
+Cada escenario recibe el entorno (BenchEnv), el libro generado y los parámetros
+de la ejecución, y retorna un diccionario con sus mediciones.
+"""
+
+import json
+import os
+import time
+
+from benchmarks.harness import RSSSampler, measure
+
+
+class Context:
+    """Estado compartido entre escenarios: libro generado y archivo cargado actualmente."""
+
+    def __init__(self, workbook_path: str, workbook_info: dict, args):
+        self.workbook_path = workbook_path
+        self.workbook_info = workbook_info
+        self.args = args
+        self.file_id = None
+        self.inserted = False
+
+    @property
+    def rows(self) -> int:
+        return self.workbook_info["valid_rows"]
+
+
+def _fresh_upload(env, ctx) -> int:
+    """Elimina el archivo actual (datos, copia columnar y registro) y lo vuelve a subir."""
+    if ctx.file_id is not None:
+        env.delete(ctx.file_id)
+    ctx.file_id = env.upload(ctx.workbook_path)["file_id"]
+    ctx.inserted = False
+    return ctx.file_id
+
+
+def _ensure_inserted(env, ctx):
+    if ctx.file_id is None:
+        _fresh_upload(env, ctx)
+    if not ctx.inserted:
+        env.insert(ctx.file_id)
+        ctx.inserted = True
+
+
+# ------------------ Escenarios principales ------------------
+
+def upload(env, ctx) -> dict:
+    """Subida de un archivo nuevo (guardado en disco, hash y registro)."""
+    def setup():
+        if ctx.file_id is not None:
+            env.delete(ctx.file_id)
+            ctx.file_id = None
+
+    def run(_):
+        ctx.file_id = env.upload(ctx.workbook_path)["file_id"]
+        ctx.inserted = False
+
+    result = measure(run, repeat=ctx.args.repeat, setup=setup)
+    result["file_mb"] = round(os.path.getsize(ctx.workbook_path) / 1024 / 1024, 2)
+    result["duplicate"] = measure(lambda: env.upload(ctx.workbook_path), repeat=ctx.args.repeat)
+    return result
+
+
+def preview(env, ctx) -> dict:
+    """Previsualización leyendo el Excel, desde la caché y desde la copia columnar."""
+    if ctx.inserted or ctx.file_id is None:
+        _fresh_upload(env, ctx)
+    url = f"/files/preview/{ctx.file_id}"
+
+    def cold(_):
+        env.client.get(url).raise_for_status()
+
+    result = {"excel": measure(cold, repeat=ctx.args.repeat, setup=env.clear_preview_cache)}
+    result["cached"] = measure(lambda: env.client.get(url).raise_for_status(), repeat=ctx.args.repeat * 5)
+
+    _ensure_inserted(env, ctx)
+    result["snapshot"] = measure(cold, repeat=ctx.args.repeat, setup=env.clear_preview_cache)
+    return result
+
+
+def insert(env, ctx) -> dict:
+    """Carga completa de un archivo recién subido (lectura, conversión e inserción)."""
+    def setup():
+        return _fresh_upload(env, ctx)
+
+    def run(file_id):
+        env.insert(file_id)
+        ctx.inserted = True
+
+    return measure(run, repeat=ctx.args.repeat, rows=ctx.rows, setup=setup)
+
+
+def chart(env, ctx) -> dict:
+    """Datos del gráfico (totales por producto)."""
+    _ensure_inserted(env, ctx)
+    return measure(lambda: env.client.get("/files/chart").raise_for_status(), repeat=ctx.args.repeat * 10, warmup=2)
+
+
+def list_data(env, ctx) -> dict:
+    """Listado paginado de excel_data: primera página, página profunda y con proyección."""
+    _ensure_inserted(env, ctx)
+    repeat = ctx.args.repeat * 10
+    last_id = env.client.get("/files/data", params={"limit": 1, "archivo_id": ctx.file_id}).json()["data"]["items"][0]["id"]
+    deep_cursor = last_id + ctx.rows - ctx.args.page_size - 1
+
+    def page(params):
+        return lambda: env.client.get("/files/data", params={"limit": ctx.args.page_size, **params}).raise_for_status()
+
+    return {
+        "first_page": measure(page({}), repeat=repeat, warmup=2, rows=ctx.args.page_size),
+        "deep_page": measure(page({"cursor": deep_cursor}), repeat=repeat, warmup=2, rows=ctx.args.page_size),
+        "projection": measure(page({"fields": "producto,cantidad"}), repeat=repeat, warmup=2, rows=ctx.args.page_size),
+        "filtered": measure(page({"archivo_id": ctx.file_id, "producto": "Producto 001"}), repeat=repeat, warmup=2),
+    }
+
+
+# ------------------ Escenarios adicionales (--suite full) ------------------
+
+def export(env, ctx) -> dict:
+    """Exportación completa en NDJSON y CSV: filas por segundo y memoria usada."""
+    _ensure_inserted(env, ctx)
+    result = {}
+    for fmt in ("ndjson", "csv"):
+        def run():
+            with env.client.stream("GET", "/files/data/export", params={"format": fmt, "archivo_id": ctx.file_id}) as response:
+                response.raise_for_status()
+                for _ in response.iter_bytes():
+                    pass
+        result[fmt] = measure(run, repeat=ctx.args.repeat, rows=ctx.rows)
+    return result
+
+
+def serialization(env, ctx) -> dict:
+    """Codificación del listado con Pydantic + jsonable_encoder frente a orjson directo."""
+    from fastapi.encoders import jsonable_encoder
+    from app import crud, schemas, utils
+
+    _ensure_inserted(env, ctx)
+    with env.session() as db:
+        items, _ = crud.get_excel_data_page(db, limit=ctx.args.page_size * 10)
+
+    def pydantic_path():
+        serialized = [schemas.ExcelDataResponse.model_validate(item) for item in items]
+        body = schemas.APIResponse(**utils.response_json("success", "list", "t", "m", data={"items": serialized}))
+        json.dumps(jsonable_encoder(body)).encode("utf-8")
+
+    result = {"items": len(items), "pydantic": measure(pydantic_path, repeat=ctx.args.repeat * 10, rows=len(items))}
+    if utils.orjson is not None:
+        fast = lambda: utils.orjson.dumps(utils.response_json("success", "list", "t", "m", data={"items": items}))
+        result["orjson"] = measure(fast, repeat=ctx.args.repeat * 10, rows=len(items))
+    return result
+
+
+def parse_workers(env, ctx) -> dict:
+    """Escalamiento de la lectura por hojas en procesos (INGEST_PARSE_WORKERS) en un libro de muchas hojas."""
+    from app import ingest
+    from benchmarks.generator import generate_workbook
+
+    path = os.path.join(env.workdir, "parse_workers.xlsx")
+    info = generate_workbook(
+        path, rows=ctx.args.worker_rows, sheets=ctx.args.worker_sheets, noise=True, seed=ctx.args.seed
+    )
+    worker_ctx = Context(path, info, ctx.args)
+
+    result = {"sheets": ctx.args.worker_sheets, "rows_per_sheet": ctx.args.worker_rows}
+    try:
+        for workers in ctx.args.workers:
+            ingest.INGEST_PARSE_WORKERS = workers
+            if ingest._parse_executor is not None:
+                ingest._parse_executor.shutdown()
+                ingest._parse_executor = None
+            # La primera carga arranca los procesos y no se mide
+            env.insert(_fresh_upload(env, worker_ctx))
+            result[f"workers_{workers}"] = insert(env, worker_ctx)
+    finally:
+        if worker_ctx.file_id is not None:
+            env.delete(worker_ctx.file_id)
+    return result
+
+
+def batch_upload(env, ctx) -> dict:
+    """Subida en lote (ZIP) de varios libros frente a subirlos y cargarlos uno por uno."""
+    import zipfile
+    from app import jobs
+    from benchmarks.generator import generate_workbook
+
+    paths = []
+    for i in range(ctx.args.batch_files):
+        path = os.path.join(env.workdir, f"batch_{i}.xlsx")
+        generate_workbook(path, rows=ctx.args.batch_rows, sheets=1, noise=True, seed=ctx.args.seed + i)
+        paths.append(path)
+    zip_path = os.path.join(env.workdir, "batch.zip")
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for path in paths:
+            archive.write(path, os.path.basename(path))
+
+    file_ids = []
+
+    def cleanup():
+        while file_ids:
+            env.delete(file_ids.pop())
+
+    def sequential(_):
+        for path in paths:
+            file_id = env.upload(path)["file_id"]
+            file_ids.append(file_id)
+            env.insert(file_id)
+
+    def batch(_):
+        result = env.upload_batch(zip_path)
+        file_ids.extend(f["file_id"] for f in result["files"])
+
+    rows = ctx.args.batch_files * ctx.args.batch_rows
+    result = {"files": ctx.args.batch_files, "rows_per_file": ctx.args.batch_rows, "batch_workers": jobs.INGEST_BATCH_WORKERS}
+    try:
+        result["sequential"] = measure(sequential, repeat=ctx.args.repeat, rows=rows, setup=cleanup)
+        result["batch"] = measure(batch, repeat=ctx.args.repeat, rows=rows, setup=cleanup)
+    finally:
+        cleanup()
+    return result
+
+
+def concurrent_upload(env, ctx) -> dict:
+    """
+    Latencia de una ruta ligera (/health/live) mientras varios clientes suben archivos a la vez,
+    sobre un servidor uvicorn real: mide cuánto bloquea la subida al event loop.
+    El contenido no se lee al subir, así que cada cliente envía bytes aleatorios distintos.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    import httpx
+    from benchmarks.harness import percentiles
+
+    clients, size = ctx.args.upload_clients, ctx.args.upload_mb * 1024 * 1024
+    uploads_per_client = ctx.args.repeat
+    payloads = [os.urandom(size) for _ in range(clients)]
+    file_ids, upload_samples = [], []
+    done = threading.Event()
+
+    def probe(http, stop=None, count=None):
+        samples = []
+        while (count is None or len(samples) < count) and not (stop and stop.is_set()):
+            start = time.perf_counter()
+            http.get("/health/live").raise_for_status()
+            samples.append(time.perf_counter() - start)
+            time.sleep(0.005)
+        return samples
+
+    def uploader(http, client):
+        for i in range(uploads_per_client):
+            # Un prefijo distinto en cada subida evita que se reconozca como duplicado
+            body = f"{client}-{i}".encode() + payloads[client]
+            start = time.perf_counter()
+            response = http.post("/files/upload", files={"file": (f"concurrente_{client}_{i}.xlsx", body)})
+            upload_samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+            file_ids.append(response.json()["data"]["file_id"])
+
+    result = {"clients": clients, "upload_mb": ctx.args.upload_mb, "uploads": clients * uploads_per_client}
+    with env.serve() as url, httpx.Client(base_url=url, timeout=600) as http:
+        probe(http, count=20)
+        result["idle"] = percentiles(probe(http, count=200))
+
+        with ThreadPoolExecutor(clients + 1) as pool:
+            probing = pool.submit(probe, http, stop=done)
+            start = time.perf_counter()
+            futures = [pool.submit(uploader, http, client) for client in range(clients)]
+            try:
+                for future in futures:
+                    future.result()
+            finally:
+                elapsed = time.perf_counter() - start
+                done.set()
+            result["under_load"] = percentiles(probing.result())
+        result["upload"] = percentiles(upload_samples)
+        result["upload_mb_per_sec"] = round(clients * uploads_per_client * ctx.args.upload_mb / elapsed, 1)
+
+    for file_id in file_ids:
+        env.delete(file_id)
+    return result
+
+
+def search(env, ctx) -> dict:
+    """
+    Construcción del índice de texto (FTS5 en SQLite) sobre las filas cargadas y búsquedas
+    por relevancia: un término que aparece en todas las filas, uno selectivo, la combinación
+    de ambos, un prefijo y una página profunda.
+    """
+    from app import search as text_search
+
+    _ensure_inserted(env, ctx)
+    repeat = ctx.args.repeat * 10
+
+    def rebuild():
+        with env.engine.begin() as conn:
+            text_search.rebuild(conn)
+
+    def query(q, **params):
+        return lambda: env.client.get(
+            "/files/data/search", params={"q": q, "limit": ctx.args.page_size, **params}
+        ).raise_for_status()
+
+    return {
+        "index_build": measure(rebuild, repeat=ctx.args.repeat, rows=ctx.rows),
+        "common_term": measure(query("cliente"), repeat=repeat, warmup=2),
+        "selective_term": measure(query("producto 042"), repeat=repeat, warmup=2),
+        "combined": measure(query(f"cliente {ctx.args.rows // 2}"), repeat=repeat, warmup=2),
+        "prefix": measure(query("call 19"), repeat=repeat, warmup=2),
+        "deep_page": measure(query("producto", offset=1000), repeat=repeat, warmup=2),
+    }
+
+
+def storage(env, ctx) -> dict:
+    """
+    Espacio en disco de excel_data, de sus índices y de los diccionarios (tabla dbstat de SQLite),
+    y latencia del GROUP BY por producto sobre excel_data (totals.check) y del gráfico.
+    """
+    from sqlalchemy import text
+    from app import totals
+
+    _ensure_inserted(env, ctx)
+    with env.engine.connect() as conn:
+        pages = dict(conn.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all())
+        owners = dict(conn.execute(text("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'")).all())
+        rows = conn.execute(text("SELECT COUNT(*) FROM excel_data")).scalar()
+
+    def mb(size):
+        return round(size / 1024 / 1024, 2)
+
+    indexes = {name: size for name, size in pages.items() if owners.get(name) == "excel_data"}
+    result = {
+        "rows": rows,
+        "table_mb": mb(pages.get("excel_data", 0)),
+        "indexes_mb": mb(sum(indexes.values())),
+        "index_mb": {name: mb(size) for name, size in sorted(indexes.items())},
+        "search_index_mb": mb(sum(size for name, size in pages.items() if name.startswith("excel_data_fts"))),
+        "dictionaries_mb": mb(sum(pages.get(name, 0) for name in ("productos", "hojas"))),
+        "bytes_per_row": round((pages.get("excel_data", 0) + sum(indexes.values())) / max(rows, 1), 1),
+    }
+
+    def group_by():
+        with env.session() as db:
+            totals.check(db)
+
+    result["group_by_producto"] = measure(group_by, repeat=ctx.args.repeat * 3, warmup=1, rows=rows)
+    result["chart"] = measure(lambda: env.client.get("/files/chart").raise_for_status(), repeat=ctx.args.repeat * 10, warmup=2)
+    return result
+
+
+def delete(env, ctx) -> dict:
+    """
+    Eliminación de un archivo cargado: la respuesta del DELETE (el archivo se marca y se oculta),
+    la purga de sus registros en segundo plano y el gráfico después de eliminarlo.
+    """
+    _ensure_inserted(env, ctx)
+    file_id = ctx.file_id
+    with RSSSampler() as rss:
+        timing = measure(lambda: env.delete(file_id, wait=False), rows=ctx.rows)
+        timing["purge"] = measure(lambda: env.wait_purge(file_id), rows=ctx.rows)
+    ctx.file_id = None
+    ctx.inserted = False
+    timing.update(rss.to_dict())
+    timing["chart_after"] = measure(lambda: env.client.get("/files/chart").raise_for_status(), repeat=10)
+    return timing
+
+
+CORE = {
+    "upload": upload,
+    "preview": preview,
+    "insert": insert,
+    "chart": chart,
+    "list_data": list_data,
+}
+
+FULL = {
+    **CORE,
+    "export": export,
+    "serialization": serialization,
+    "parse_workers": parse_workers,
+    "batch_upload": batch_upload,
+    "concurrent_upload": concurrent_upload,
+    "search": search,
+    "storage": storage,
+    "delete": delete,
+}
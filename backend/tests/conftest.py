@@ -0,0 +1,104 @@
+"""
+Configuración común de las pruebas: una base SQLite temporal, compartida por el motor
+síncrono y el asíncrono, en lugar de MySQL, y un cliente HTTP sobre la aplicación.
+Se ejecutan desde backend/ con: python -m pytest
+"""
+
+import os
+import tempfile
+
+# Las variables se fijan antes de importar app.database, que las lee al importarse
+_TMP_DIR = tempfile.mkdtemp(prefix="excel-uploader-tests-")
+_DB_PATH = os.path.join(_TMP_DIR, "pruebas.db")
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_TMP_DIR, "uploads")
+os.environ["LOG_DIR"] = os.path.join(_TMP_DIR, "logs")
+for _name in ("MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_HOST", "MYSQL_DATABASE"):
+    os.environ.setdefault(_name, "pruebas")
+os.environ.setdefault("MYSQL_PORT", "3306")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import database, migrations
+
+database.engine = create_engine(f"sqlite:///{_DB_PATH}", connect_args={"check_same_thread": False, "timeout": 30})
+database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+database.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade(database.engine)
+
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    # Sin "with": no se ejecuta el lifespan, que esperaría a MySQL
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+class _InlineExecutor:
+    """Ejecuta las tareas en el mismo hilo, al encolarlas."""
+
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+@pytest.fixture
+def inline_jobs(monkeypatch):
+    """Las cargas y las purgas terminan antes de que responda la petición que las encola."""
+    from app import jobs, purge
+
+    monkeypatch.setattr(jobs, "_executor", _InlineExecutor())
+    monkeypatch.setattr(purge, "_executor", _InlineExecutor())
+    monkeypatch.setattr(purge, "PURGE_PAUSE_MS", 0)
+
+
+def _workbook(sheets: dict) -> bytes:
+    """Libro .xlsx con las filas indicadas por hoja ({hoja: [fila, ...]})."""
+    import io
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        sheet = workbook.create_sheet(name)
+        sheet.append(["nombre", "direccion", "telefono", "producto", "cantidad"])
+        for row in rows:
+            sheet.append([row["nombre"], row["direccion"], row["telefono"], row["producto"], row["cantidad"]])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload(client):
+    """Sube un libro con las filas indicadas por hoja ({hoja: [fila, ...]}) y retorna su file_id."""
+
+    def _upload(sheets: dict, filename: str = "libro.xlsx") -> int:
+        response = client.post("/files/upload", files={"file": (filename, _workbook(sheets), "application/octet-stream")})
+        assert response.status_code in (200, 201), response.text
+        return response.json()["data"]["file_id"]
+
+    return _upload
+
+
+@pytest.fixture
+def replace(client):
+    """Reemplaza el libro de un archivo ya registrado (PUT /files/{file_id})."""
+
+    def _replace(file_id: int, sheets: dict, filename: str = "libro.xlsx"):
+        response = client.put(f"/files/{file_id}", files={"file": (filename, _workbook(sheets), "application/octet-stream")})
+        assert response.status_code == 200, response.text
+
+    return _replace
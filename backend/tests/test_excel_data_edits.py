@@ -0,0 +1,135 @@
+"""
+Ediciones de registros de ExcelData cargados desde un libro: el registro editado o movido
+a otro archivo pierde su huella (ver app.fingerprints), también en la edición en lote.
+"""
+
+from sqlalchemy.exc import IntegrityError
+
+from app import crud, fingerprints, models, schemas, search
+
+ROW = {"nombre": "Ana", "direccion": "Calle 1", "telefono": "555", "producto": "Café", "cantidad": 3, "hoja": "Hoja1"}
+
+
+def _create_file(db, name: str) -> int:
+    db_file = crud.create_excel_file(
+        db, schemas.ExcelFileCreate(filename=name, filepath=f"/tmp/{name}", filesize=1, filetype="xlsx")
+    )
+    return db_file.id
+
+
+def _load_rows(db, file_id: int, rows: list) -> list:
+    """Inserta filas como lo hace una carga del libro (con huella) y retorna sus IDs."""
+    columns = {col: [row[col] for row in rows] for col in fingerprints.FINGERPRINT_COLUMNS}
+    columns["archivo_id"] = [file_id] * len(rows)
+    columns, _ = fingerprints.FingerprintDiff(set()).new_rows(columns)
+    crud.insert_excel_data(db, columns)
+    table = models.ExcelData.__table__
+    return list(db.execute(table.select().with_only_columns(table.c.id).where(table.c.archivo_id == file_id)).scalars())
+
+
+def _fingerprint(db, data_id: int):
+    db.expire_all()
+    return db.get(models.ExcelData, data_id).fingerprint
+
+
+def test_put_moves_row_into_file_with_identical_row(client, db):
+    source, target = _create_file(db, "origen.xlsx"), _create_file(db, "destino.xlsx")
+    (moved,) = _load_rows(db, source, [ROW])
+    (existing,) = _load_rows(db, target, [ROW])
+
+    response = client.put(f"/files/data/{moved}", json={**ROW, "archivo_id": target})
+
+    assert response.status_code == 200
+    assert _fingerprint(db, moved) is None
+    assert _fingerprint(db, existing) is not None
+    assert fingerprints.existing_fingerprints(db, target) == {_fingerprint(db, existing)}
+
+
+def test_put_with_changed_values_clears_fingerprint(client, db):
+    file_id = _create_file(db, "editado.xlsx")
+    (data_id,) = _load_rows(db, file_id, [ROW])
+
+    response = client.put(f"/files/data/{data_id}", json={**ROW, "cantidad": 4, "archivo_id": file_id})
+
+    assert response.status_code == 200
+    assert _fingerprint(db, data_id) is None
+
+
+def test_put_without_changes_keeps_fingerprint(client, db):
+    file_id = _create_file(db, "igual.xlsx")
+    (data_id,) = _load_rows(db, file_id, [ROW])
+    before = _fingerprint(db, data_id)
+
+    response = client.put(f"/files/data/{data_id}", json={**ROW, "archivo_id": file_id})
+
+    assert response.status_code == 200
+    assert _fingerprint(db, data_id) == before
+
+
+def test_sync_update_moves_row_into_file_with_identical_row(db):
+    source, target = _create_file(db, "origen_sync.xlsx"), _create_file(db, "destino_sync.xlsx")
+    (moved,) = _load_rows(db, source, [ROW])
+    _load_rows(db, target, [ROW])
+
+    updated = crud.update_excel_data(db, moved, schemas.ExcelDataCreate(**ROW, archivo_id=target))
+
+    assert updated.archivo_id == target
+    assert _fingerprint(db, moved) is None
+
+
+def test_batch_moves_row_into_file_with_identical_row(client, db):
+    source, target = _create_file(db, "origen_lote.xlsx"), _create_file(db, "destino_lote.xlsx")
+    (moved,) = _load_rows(db, source, [ROW])
+    _load_rows(db, target, [ROW])
+
+    response = client.post("/files/data/batch", json={"update": [{"id": moved, "archivo_id": target}]})
+
+    assert response.status_code == 200
+    assert response.json()["data"]["update"] == [{"id": moved, "status": "updated"}]
+    assert _fingerprint(db, moved) is None
+
+
+def test_batch_mixes_rows_that_clear_and_keep_their_fingerprint(client, db):
+    file_id = _create_file(db, "mixto.xlsx")
+    edited, same, only_id = _load_rows(
+        db, file_id, [ROW, {**ROW, "nombre": "Luis"}, {**ROW, "nombre": "Eva"}]
+    )
+    kept = {data_id: _fingerprint(db, data_id) for data_id in (same, only_id)}
+
+    response = client.post(
+        "/files/data/batch",
+        json={"update": [{"id": edited, "cantidad": 9}, {"id": same, "cantidad": ROW["cantidad"]}, {"id": only_id}]},
+    )
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["data"]["update"]] == ["updated"] * 3
+    assert _fingerprint(db, edited) is None
+    assert {data_id: _fingerprint(db, data_id) for data_id in (same, only_id)} == kept
+    assert db.get(models.ExcelData, edited).cantidad == 9
+
+
+def test_batch_reports_conflict_when_the_write_is_rejected(client, db, monkeypatch):
+    file_id = _create_file(db, "conflicto.xlsx")
+    updated, deleted = _load_rows(db, file_id, [ROW, {**ROW, "nombre": "Luis"}])
+
+    def reject(session):
+        raise IntegrityError("INSERT", {}, Exception("rechazado"))
+
+    monkeypatch.setattr(search, "index_new_rows", reject)
+    response = client.post(
+        "/files/data/batch",
+        json={
+            "create": [{**ROW, "archivo_id": file_id}],
+            "update": [{"id": updated, "cantidad": 9}, {"id": 10**9, "cantidad": 1}],
+            "delete": [deleted],
+        },
+    )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["create"] == [{"index": 0, "id": None, "status": "conflict"}]
+    assert data["update"] == [{"id": updated, "status": "conflict"}, {"id": 10**9, "status": "not_found"}]
+    assert data["delete"] == [{"id": deleted, "status": "conflict"}]
+    db.expire_all()
+    assert db.get(models.ExcelData, updated).cantidad == ROW["cantidad"]
+    assert db.get(models.ExcelData, deleted) is not None
@@ -0,0 +1,25 @@
+"""
+Eliminación de archivos: la respuesta no depende del registro del archivo, que la purga
+puede eliminar antes de que termine la petición.
+"""
+
+from app import crud
+
+ROWS = [
+    {"nombre": f"Cliente {i}", "direccion": "Calle 1", "telefono": "555", "producto": "Té", "cantidad": i}
+    for i in range(5)
+]
+
+
+def test_delete_responds_after_the_purge_removed_the_file(client, db, inline_jobs, upload):
+    file_id = upload({"Hoja1": ROWS}, filename="borrar.xlsx")
+    assert client.post(f"/files/insert/{file_id}").status_code == 202
+
+    response = client.delete(f"/files/{file_id}")
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["message"] == "Archivo 'borrar.xlsx' eliminado. Sus 5 registros se purgan en segundo plano."
+    assert body["data"]["status"] == "completed"
+    assert crud.get_excel_file(db, file_id) is None
+    assert client.get(f"/files/purges/{file_id}").json()["data"]["rows_deleted"] == 5
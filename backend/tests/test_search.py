@@ -0,0 +1,138 @@
+"""
+Búsqueda de texto (GET /files/data/search) sobre el índice FTS5 de SQLite: todas las
+palabras, también como prefijo, en nombre, dirección o producto, por relevancia.
+La base se comparte entre pruebas, por lo que cada una busca palabras propias.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from app import database, search
+
+
+@pytest.fixture(autouse=True)
+def _requires_fts():
+    with database.engine.connect() as conn:
+        if not search.has_fts_table(conn):
+            pytest.skip("SQLite sin FTS5")
+
+
+def _row(nombre: str, direccion: str = "Calle 1", producto: str = "Arroz", cantidad: int = 1) -> dict:
+    return {"nombre": nombre, "direccion": direccion, "telefono": "555", "producto": producto, "cantidad": cantidad}
+
+
+def _load(client, upload, rows: list, filename: str) -> int:
+    file_id = upload({"Hoja1": rows}, filename=filename)
+    assert client.post(f"/files/insert/{file_id}").status_code == 202
+    return file_id
+
+
+def _search(client, q: str, **params) -> dict:
+    response = client.get("/files/data/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def _names(data: dict) -> list:
+    return [item["nombre"] for item in data["items"]]
+
+
+def test_search_matches_prefixes_and_requires_every_word(client, inline_jobs, upload):
+    _load(
+        client,
+        upload,
+        [_row("Rosalba Quintero", "Avenida Olmedo 12"), _row("Rosalía Quintana", "Calle Sur"), _row("Rosendo Paz", "Avenida Olmedo 3")],
+        "prefijos.xlsx",
+    )
+
+    assert sorted(_names(_search(client, "rosal"))) == ["Rosalba Quintero", "Rosalía Quintana"]
+    assert _names(_search(client, "rosal olmed")) == ["Rosalba Quintero"]
+    assert sorted(_names(_search(client, "ROSALIA"))) == ["Rosalía Quintana"]
+    assert _search(client, "rosal inexistente")["items"] == []
+
+
+def test_search_matches_through_the_product_name(client, inline_jobs, upload):
+    _load(
+        client,
+        upload,
+        [_row("Eusebio Torres", producto="Quinua Real"), _row("Eusebio Mena", producto="Lenteja"), _row("Quinua Eusebio", producto="Lenteja")],
+        "productos.xlsx",
+    )
+
+    # Cada palabra puede estar en el texto o en el producto
+    data = _search(client, "eusebio quinua")
+    assert _names(data) == ["Quinua Eusebio", "Eusebio Torres"]
+    assert data["items"][1]["producto"] == "Quinua Real"
+
+    # Las filas que solo coinciden por producto van al final, con score 0
+    data = _search(client, "quinua")
+    assert _names(data) == ["Quinua Eusebio", "Eusebio Torres"]
+    assert data["items"][0]["score"] > 0
+    assert data["items"][1]["score"] == 0
+
+
+def test_search_orders_by_relevance_and_pages_with_next_offset(client, inline_jobs, upload):
+    rows = [_row(f"Cliente Zenobia {i}", "Barrio Norte, casa larga con varias palabras más") for i in range(4)]
+    rows.append(_row("Zenobia Zenobia", "Zenobia"))
+    _load(client, upload, rows, "ranking.xlsx")
+
+    first = _search(client, "zenobia", limit=3)
+    second = _search(client, "zenobia", limit=3, offset=first["next_offset"])
+
+    assert first["items"][0]["nombre"] == "Zenobia Zenobia"
+    scores = [item["score"] for item in first["items"] + second["items"]]
+    assert scores == sorted(scores, reverse=True)
+    assert first["next_offset"] == 3
+    assert second["next_offset"] is None
+    assert len(first["items"]) + len(second["items"]) == 5
+    assert not set(_names(first)) & set(_names(second))
+
+
+class _DeferredExecutor:
+    """Guarda las tareas encoladas para ejecutarlas después con run()."""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.pending.append((fn, args, kwargs))
+
+    def run(self):
+        while self.pending:
+            fn, args, kwargs = self.pending.pop(0)
+            fn(*args, **kwargs)
+
+
+def test_search_skips_rows_of_deleted_files(client, inline_jobs, upload, monkeypatch):
+    from app import purge
+
+    kept = _load(client, upload, [_row("Leocadia Ferrer")], "conservado.xlsx")
+    removed = _load(client, upload, [_row("Leocadia Ortiz")], "eliminado.xlsx")
+
+    # La purga queda pendiente: el archivo solo está marcado y sus filas siguen en el índice
+    deferred = _DeferredExecutor()
+    monkeypatch.setattr(purge, "_executor", deferred)
+    assert client.delete(f"/files/{removed}").status_code == 202
+
+    data = _search(client, "leocadia")
+    assert _names(data) == ["Leocadia Ferrer"]
+    assert {item["archivo_id"] for item in data["items"]} == {kept}
+    assert _search(client, "leocadia", archivo_id=removed)["items"] == []
+
+    deferred.run()
+    assert _names(_search(client, "leocadia")) == ["Leocadia Ferrer"]
+
+
+def test_search_index_follows_rows_loaded_after_a_purge(client, db, inline_jobs, upload):
+    # La purga elimina las filas de ID más alto; las filas cargadas después no deben quedar
+    # fuera del índice ni heredar las entradas de las filas purgadas
+    removed = _load(client, upload, [_row(f"Teodolinda Vidal {i}") for i in range(3)], "purgado.xlsx")
+    assert client.delete(f"/files/{removed}").status_code == 202
+    assert _search(client, "teodolinda")["items"] == []
+
+    _load(client, upload, [_row(f"Casimiro Ponce {i}") for i in range(3)], "recargado.xlsx")
+
+    assert sorted(_names(_search(client, "casimiro"))) == [f"Casimiro Ponce {i}" for i in range(3)]
+    assert _search(client, "teodolinda")["items"] == []
+    count = db.execute(text(f"SELECT COUNT(*) FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH 'casimiro'")).scalar()
+    assert count == 3
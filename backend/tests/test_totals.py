@@ -0,0 +1,71 @@
+"""
+product_totals se mantiene por diferencias en cada operación que modifica excel_data;
+después de cualquier secuencia de cargas, ediciones y eliminaciones debe coincidir
+con el GROUP BY sobre excel_data (ver app.totals.check).
+"""
+
+from sqlalchemy import select
+
+from app import models, totals
+
+
+def _row(i: int, producto: str) -> dict:
+    return {"nombre": f"Cliente {i}", "direccion": f"Calle {i}", "telefono": f"555{i:04d}", "producto": producto, "cantidad": i}
+
+
+def _data_ids(db, file_id: int) -> list:
+    table = models.ExcelData.__table__
+    db.expire_all()
+    return list(db.execute(select(table.c.id).where(table.c.archivo_id == file_id).order_by(table.c.id)).scalars())
+
+
+def _chart(client) -> dict:
+    return {item["producto"]: item["total"] for item in client.get("/files/chart").json()["data"]["chart"]}
+
+
+def test_totals_match_excel_data_after_every_kind_of_change(client, db, inline_jobs, upload, replace):
+    sheets = {
+        "Hoja1": [_row(i, "Arroz") for i in range(1, 6)] + [_row(i, "Frijol") for i in range(6, 9)],
+        "Hoja2": [_row(i, "Maíz") for i in range(9, 13)],
+    }
+    kept = upload(sheets, filename="totales.xlsx")
+    removed = upload({"Hoja1": [_row(i, "Arroz") for i in range(20, 24)] + [_row(30, "Trigo")]}, filename="quitar.xlsx")
+
+    # Carga masiva de ambos libros
+    for file_id in (kept, removed):
+        assert client.post(f"/files/insert/{file_id}").status_code == 202
+    assert totals.check(db) == {}
+
+    # Alta, modificación (cambio de producto y de cantidad) y baja de un registro
+    ids = _data_ids(db, kept)
+    created = client.post("/files/data", json={**_row(40, "Avena"), "hoja": "Hoja1", "archivo_id": kept})
+    assert created.status_code == 200
+    assert client.put(f"/files/data/{ids[0]}", json={**_row(1, "Maíz"), "cantidad": 50, "hoja": "Hoja1", "archivo_id": kept}).status_code == 200
+    assert client.delete(f"/files/data/{ids[1]}").status_code == 200
+    assert totals.check(db) == {}
+
+    # Edición en lote: altas, cambios parciales (producto o solo cantidad) y bajas
+    batch = client.post(
+        "/files/data/batch",
+        json={
+            "create": [{**_row(41, "Frijol"), "hoja": "Hoja2", "archivo_id": kept}],
+            "update": [{"id": ids[2], "producto": "Avena"}, {"id": ids[5], "cantidad": 99}],
+            "delete": [ids[6], created.json()["data"]["item"]["id"]],
+        },
+    )
+    assert batch.status_code == 200
+    assert batch.json()["data"]["failed"] == 0
+    assert totals.check(db) == {}
+
+    # Eliminación de un archivo con su purga: Trigo desaparece del gráfico
+    assert client.delete(f"/files/{removed}").status_code == 202
+    assert totals.check(db) == {}
+    assert "Trigo" not in _chart(client)
+
+    # Recarga con prune tras reemplazar el libro: filas quitadas, cambiadas y nuevas
+    sheets["Hoja1"] = sheets["Hoja1"][3:] + [_row(50, "Trigo")]
+    sheets["Hoja2"] = [{**row, "cantidad": row["cantidad"] + 1} for row in sheets["Hoja2"]]
+    replace(kept, sheets, filename="totales.xlsx")
+    assert client.post(f"/files/insert/{kept}?prune=true").status_code == 202
+    assert totals.check(db) == {}
+    assert _chart(client)["Trigo"] == 50
@@ -1 +1 @@
-// ⚠️ Este archivo ya no se usa porque la app está en modo standalone.
+// ⚠️ Este archivo ya no se usa porque la app está en modo standalone.
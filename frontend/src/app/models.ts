@@ -1,2 +1,2 @@
-export interface ExcelFile { /* ... */ }
-export interface ExcelData { /* ... */ }
+export interface ExcelFile { /* ... */ }
+export interface ExcelData { /* ... */ }
@@ -1,10 +1,10 @@
-export interface ExcelData {
-  id?: number;
-  nombre: string;
-  direccion: string;
-  telefono: string;
-  producto: string;
-  cantidad: number;
-  hoja: string;
-  archivo_id?: number;
-}
+export interface ExcelData {
+  id?: number;
+  nombre: string;
+  direccion: string;
+  telefono: string;
+  producto: string;
+  cantidad: number;
+  hoja: string;
+  archivo_id?: number;
+}
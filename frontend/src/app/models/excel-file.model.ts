@@ -1,8 +1,10 @@
-export interface ExcelFile {
-  id?: number;
-  filename: string;
-  filepath?: string;
-  filesize: number;
-  filetype: string;
-  upload_date?: string;
-}
+export interface ExcelFile {
+  id?: number;
+  filename: string;
+  filepath?: string;
+  filesize: number;
+  filetype: string;
+  sha256?: string;
+  rows_inserted?: number | null;
+  upload_date?: string;
+}